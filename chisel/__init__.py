@@ -25,7 +25,8 @@ __version__ = '0.9.37'
 from .action import \
     action, \
     Action, \
-    ActionError
+    ActionError, \
+    VALIDATE_OUTPUT_DEFERRED
 
 from .app import \
     Application, \
@@ -34,11 +35,18 @@ from .app import \
 from .app_defs import \
     ENVIRON_CTX
 
+from .cache import \
+    ResponseCache
+
 from .doc import \
     DocAction, \
     DocPage, \
     Element
 
+from .metrics import \
+    Metrics, \
+    MetricsRequest
+
 from .model import \
     ValidationError, \
     VALIDATE_DEFAULT, \
@@ -49,6 +57,9 @@ from .request import \
     request, \
     Request
 
+from .router import \
+    Router
+
 from .spec import \
     SpecParser, \
     SpecParserError
@@ -58,6 +69,7 @@ from .url import \
     encode_query_string
 
 from .util import \
+    JSONCodec, \
     JSONEncoder, \
     TZLOCAL, \
     TZUTC
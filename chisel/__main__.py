@@ -21,9 +21,12 @@
 #
 
 from argparse import ArgumentParser
+from functools import partial
+import os
 from wsgiref.simple_server import make_server
 
 from chisel import Application, DocAction, __version__ as chisel_version
+from chisel.server import serve_prefork, ThreadPoolWSGIServer
 try:
     from repoze.profile import ProfileMiddleware
 except ImportError:
@@ -40,11 +43,25 @@ def main():
                         help='the name of the WSGI application callable (default is "application")')
     parser.add_argument('-p', type=int, dest='port', default=8080,
                         help='the WSGI service port (default is 8080)')
+    parser.add_argument('--workers', type=int, dest='workers', metavar='N', default=0,
+                        help='serve from N pre-forked worker processes (default is a single process)')
+    parser.add_argument('--threads', type=int, dest='threads', metavar='N', default=0,
+                        help='serve from a pool of N threads (default is a single thread)')
+    parser.add_argument('--queue', type=int, dest='queue', metavar='N',
+                        help='the maximum number of connections waiting for a thread (default is the number of threads)')
     parser.add_argument('--profile', action='store_true', dest='profile',
                         help='enable the profiler at /__profile__')
     parser.add_argument('-v', '--version', action='store_true', dest='version',
                         help='print the chisel version')
     args = parser.parse_args()
+    if args.workers < 0:
+        parser.error('invalid number of workers: {0}'.format(args.workers))
+    if args.threads < 0:
+        parser.error('invalid number of threads: {0}'.format(args.threads))
+    if args.queue is not None and (args.queue < 1 or not args.threads):
+        parser.error('invalid connection queue size: {0}'.format(args.queue))
+    if args.workers and not hasattr(os, 'fork'):
+        parser.error('--workers is not supported on this platform')
 
     # Version?
     if args.version:
@@ -66,8 +83,17 @@ def main():
         application = ProfileMiddleware(application)
 
     # Serve the WSGI application
-    print('serving on port {0}...'.format(args.port))
-    make_server('', args.port, application).serve_forever()
+    if args.threads:
+        server = make_server('', args.port, application,
+                             server_class=partial(ThreadPoolWSGIServer, threads=args.threads, queue_size=args.queue))
+    else:
+        server = make_server('', args.port, application)
+    if args.workers:
+        print('serving on port {0} with {1} workers...'.format(args.port, args.workers))
+        serve_prefork(server, args.workers)
+    else:
+        print('serving on port {0}...'.format(args.port))
+        server.serve_forever()
 
 
 if __name__ == '__main__':
@@ -21,18 +21,40 @@
 #
 
 from cgi import parse_header
-from json import loads as json_loads
+from hashlib import sha1
+from random import random
+from time import perf_counter
 
 from .app_defs import ENVIRON_CTX
 from .model import VALIDATE_DEFAULT, VALIDATE_QUERY_STRING, VALIDATE_JSON_INPUT, ValidationError, TypeStruct, TYPE_STRING
 from .request import Request
 from .spec import SpecParser
-from .url import decode_query_string
+from .url import decode_query_string, encode_query_string
+from .validator import compile_validator
 
 
 STATUS_400 = '400 Bad Request'
+STATUS_413 = '413 Request Entity Too Large'
 STATUS_500 = '500 Internal Server Error'
 
+# Request content read size
+CONTENT_CHUNK_SIZE = 65536
+
+# Output validation policy - validate after the response is sent and only log failures. The other output validation
+# policies are True (always validate), False (never validate), and a float fraction of requests to validate.
+VALIDATE_OUTPUT_DEFERRED = 'deferred'
+
+
+def check_validate_output(validate_output, allow_none=False):
+    """
+    Check an output validation policy value - raises ValueError if the policy is invalid
+    """
+    if validate_output is True or validate_output is False or validate_output == VALIDATE_OUTPUT_DEFERRED or \
+            (validate_output is None and allow_none) or \
+            (isinstance(validate_output, (int, float)) and not isinstance(validate_output, bool) and 0 <= validate_output <= 1):
+        return validate_output
+    raise ValueError('Invalid output validation policy {0!r}'.format(validate_output))
+
 
 def action(_action_callback=None, **kwargs):
     """
@@ -68,10 +90,12 @@ class Action(Request):
     Chisel action request
     """
 
-    __slots__ = ('action_callback', 'model', 'wsgi_response', 'jsonp')
+    __slots__ = ('action_callback', 'model', 'wsgi_response', 'jsonp', '_validate_output', 'validate_output_errors',
+                 'max_content_length', 'cache', 'version', '_validators')
 
     def __init__(self, action_callback, name=None, method=('GET', 'POST'), urls=None, doc=None, doc_group=None,
-                 spec=None, wsgi_response=False, jsonp=None):
+                 spec=None, wsgi_response=False, jsonp=None, validate_output=None, max_content_length=None,
+                 cache=None, version=None):
 
         # Use the action model name, if available
         if name is None:
@@ -90,137 +114,377 @@ class Action(Request):
             if doc_group is None:
                 doc_group = model.doc_group
 
+        assert cache is None or not wsgi_response, 'response cache not supported for WSGI response actions'
+
         Request.__init__(self, name=name, method=method, urls=urls, doc=doc, doc_group=doc_group)
         self.action_callback = action_callback
         self.model = model
         self.wsgi_response = wsgi_response
         self.jsonp = jsonp
+        self.validate_output = validate_output
+        self.validate_output_errors = 0
+        self.max_content_length = max_content_length
+        self.cache = cache
+        self.version = version
+        self._validators = None
 
     @property
     def module_name(self):
         return self.action_callback.__module__
 
+    @property
+    def validate_output(self):
+        """
+        The action's output validation policy - None uses the application's policy
+        """
+        return self._validate_output
+
+    @validate_output.setter
+    def validate_output(self, validate_output):
+        self._validate_output = check_validate_output(validate_output, allow_none=True)
+
     def onload(self, app):
         Request.onload(self, app)
 
         # Get the action model, if necessary
-        if self.model is None:
-            self.model = app.specs.actions.get(self.name)
-            assert self.model is not None, "No spec defined for action '{0}'".format(self.name)
-            if self.doc is None:
-                self.doc = self.model.doc
-            if self.doc_group is None:
-                self.doc_group = self.model.doc_group
+        model = self.model
+        if model is None:
+            model = app.specs.actions.get(self.name)
+            assert model is not None, "No spec defined for action '{0}'".format(self.name)
+        self.set_model(model)
+
+    def set_model(self, model, compile_validators=True):
+        """
+        Set the action model and compile its validators (e.g. on spec reload)
+
+        The validators are replaced in a single assignment - requests read them once, so in-flight requests finish
+        using the previous model. If compile_validators is False, the model must be equivalent to the current model.
+        """
+
+        # Update the documentation, if it's from the model
+        if self.doc is None or (self.model is not None and self.doc is self.model.doc):
+            self.doc = model.doc
+        if self.doc_group is None or (self.model is not None and self.doc_group is self.model.doc_group):
+            self.doc_group = model.doc_group
+        self.model = model
+        if not compile_validators and self._validators is not None:
+            return
+
+        # Build the error response type
+        error_response_type = TypeStruct()
+        error_response_type.add_member('error', model.error_type)
+        error_response_type.add_member('message', TYPE_STRING, optional=True)
+        error_response_type.finalize()
+
+        # Compile the input, output, and error response validators
+        self._validators = _ActionValidators(
+            {mode: compile_validator(model.input_type, mode) for mode in (VALIDATE_QUERY_STRING, VALIDATE_JSON_INPUT)},
+            compile_validator(model.output_type, VALIDATE_DEFAULT),
+            compile_validator(error_response_type, VALIDATE_DEFAULT)
+        )
+
+        # Clear any cached responses of the previous model
+        if self.cache is not None:
+            self.cache.clear()
 
     def __call__(self, environ, dummy_start_response):
         ctx = environ[ENVIRON_CTX]
+        validators = self._validators
 
-        # Handle the action
-        is_get = (environ['REQUEST_METHOD'] == 'GET')
-        jsonp = None
+        # Decode and validate the request - return the cached response, if any
         try:
-            # Read the request content
-            try:
-                content = None if is_get else environ['wsgi.input'].read()
-            except:
-                ctx.log.warning("I/O error reading input for action '%s'", self.name)
-                raise _ActionErrorInternal('IOError', message='Error reading request content')
+            request, jsonp, validate_mode = self._decode_request(ctx, environ)
+            request = self._validate_request(ctx, validators, request, validate_mode)
+        except _ActionErrorInternal as exc:
+            return self._encode_response(ctx, validators, None, exc=exc)
+        cache_key, content = self._cache_get(ctx, request, jsonp)
+        if content is not None:
+            return content
 
-            # De-serialize the JSON content
-            validate_mode = VALIDATE_JSON_INPUT
-            try:
-                if content:
-                    content_type = environ.get('CONTENT_TYPE')
-                    content_charset = ('utf-8' if content_type is None else parse_header(content_type)[1].get('charset', 'utf-8'))
-                    request = json_loads(content.decode(content_charset))
-                else:
-                    request = {}
-            except Exception as exc:
-                ctx.log.warning("Error decoding JSON content for action '%s'", self.name)
-                raise _ActionErrorInternal('InvalidInput', message='Invalid request JSON: ' + str(exc), status=STATUS_400)
+        # Request version not modified?
+        if self.version is not None and self._check_version(ctx, request, jsonp):
+            return ctx.response_not_modified([('ETag', ctx.etag)])
 
-            # Decode the query string
-            query_string = environ.get('QUERY_STRING')
-            if query_string:
-                validate_mode = VALIDATE_QUERY_STRING
-                try:
-                    request_query_string = decode_query_string(query_string)
-                except Exception as exc:
-                    ctx.log.warning("Error decoding query string for action '%s': %s", self.name, environ.get('QUERY_STRING', ''))
-                    raise _ActionErrorInternal('InvalidInput', message=str(exc), status=STATUS_400)
-
-                for request_key, request_value in request_query_string.items():
-                    if request_key in request:
-                        ctx.log.warning("Duplicate query string argument member '%s' for action '%s'", request_key, self.name)
-                        raise _ActionErrorInternal('InvalidInput',
-                                                   message="Duplicate query string argument member '{0}'".format(request_key),
-                                                   status=STATUS_400)
-                    request[request_key] = request_value
-
-            # Add url arguments
-            if ctx.url_args is not None:
-                validate_mode = VALIDATE_QUERY_STRING
-                for url_arg, url_value in ctx.url_args.items():
-                    if url_arg in request:
-                        ctx.log.warning("Duplicate URL argument member '%s' for action '%s'", url_arg, self.name)
-                        raise _ActionErrorInternal('InvalidInput',
-                                                   message="Duplicate URL argument member '{0}'".format(url_arg),
-                                                   status=STATUS_400)
-                    request[url_arg] = url_value
-
-            # JSONP?
-            if is_get and self.jsonp and self.jsonp in request:
-                jsonp = str(request[self.jsonp])
-                del request[self.jsonp]
-
-            # Validate the request
-            try:
-                request = self.model.input_type.validate(request, validate_mode)
-            except ValidationError as exc:
-                ctx.log.warning("Invalid input for action '%s': %s", self.name, str(exc))
-                raise _ActionErrorInternal('InvalidInput', message=str(exc), status=STATUS_400, member=exc.member)
+        # Call the action callback - coroutine callbacks are only supported by the ASGI entry point (chisel.asgi)
+        start_time = perf_counter()
+        try:
+            response = self.action_callback(ctx, request)
+            if hasattr(response, '__await__'):
+                if hasattr(response, 'close'):
+                    response.close()
+                raise TypeError("Coroutine action '{0}' requires the ASGI entry point".format(self.name))
+            exc_callback = None
+        except Exception as exc: # pylint: disable=broad-except
+            exc_callback = exc
+        ctx.add_timing('callback', start_time)
+        if exc_callback is not None:
+            return self._encode_response(ctx, validators, jsonp, exc=exc_callback)
+        if self.wsgi_response:
+            return response
+
+        # Validate and serialize the response
+        return self._encode_response(ctx, validators, jsonp, response=response, cache_key=cache_key)
+
+    def _decode_request(self, ctx, environ):
+        is_get = (environ['REQUEST_METHOD'] == 'GET')
+        jsonp = None
 
-            # Call the action callback
+        # Read the request content
+        content = None
+        if not is_get:
+            start_time = perf_counter()
+            content = self._read_content(ctx, environ)
+            ctx.add_timing('read', start_time, len(content))
+
+        # De-serialize the JSON content
+        validate_mode = VALIDATE_JSON_INPUT
+        try:
+            if content:
+                start_time = perf_counter()
+                content_type = environ.get('CONTENT_TYPE')
+                content_charset = ('utf-8' if content_type is None else parse_header(content_type)[1].get('charset', 'utf-8'))
+                request = ctx.app.json_codec.decode(content, content_charset)
+                ctx.add_timing('json_decode', start_time, len(content))
+            else:
+                request = {}
+        except Exception as exc:
+            ctx.log.warning("Error decoding JSON content for action '%s'", self.name)
+            raise _ActionErrorInternal('InvalidInput', message='Invalid request JSON: ' + str(exc), status=STATUS_400)
+
+        # Decode the query string
+        query_string = environ.get('QUERY_STRING')
+        if query_string:
+            validate_mode = VALIDATE_QUERY_STRING
+            start_time = perf_counter()
             try:
-                status = '200 OK'
-                response = self.action_callback(ctx, request)
-                if self.wsgi_response:
-                    return response
-                elif response is None:
-                    response = {}
-                elif 'error' in response and not jsonp:
-                    status = STATUS_500
-            except ActionError as exc:
+                request_query_string = decode_query_string(query_string)
+            except Exception as exc:
+                ctx.log.warning("Error decoding query string for action '%s': %s", self.name, environ.get('QUERY_STRING', ''))
+                raise _ActionErrorInternal('InvalidInput', message=str(exc), status=STATUS_400)
+            ctx.add_timing('query_decode', start_time, len(query_string))
+
+            for request_key, request_value in request_query_string.items():
+                if request_key in request:
+                    ctx.log.warning("Duplicate query string argument member '%s' for action '%s'", request_key, self.name)
+                    raise _ActionErrorInternal('InvalidInput',
+                                               message="Duplicate query string argument member '{0}'".format(request_key),
+                                               status=STATUS_400)
+                request[request_key] = request_value
+
+        # Add url arguments
+        if ctx.url_args is not None:
+            validate_mode = VALIDATE_QUERY_STRING
+            for url_arg, url_value in ctx.url_args.items():
+                if url_arg in request:
+                    ctx.log.warning("Duplicate URL argument member '%s' for action '%s'", url_arg, self.name)
+                    raise _ActionErrorInternal('InvalidInput',
+                                               message="Duplicate URL argument member '{0}'".format(url_arg),
+                                               status=STATUS_400)
+                request[url_arg] = url_value
+
+        # JSONP?
+        if is_get and self.jsonp and self.jsonp in request:
+            jsonp = str(request[self.jsonp])
+            del request[self.jsonp]
+
+        return request, jsonp, validate_mode
+
+    def _validate_request(self, ctx, validators, request, validate_mode):
+        start_time = perf_counter()
+        try:
+            request = validators.input[validate_mode](request)
+        except ValidationError as exc:
+            ctx.log.warning("Invalid input for action '%s': %s", self.name, str(exc))
+            raise _ActionErrorInternal('InvalidInput', message=str(exc), status=STATUS_400, member=exc.member)
+        ctx.add_timing('input_validation', start_time)
+        return request
+
+    def cache_key(self, request):
+        """
+        Get the response cache key for a request object (e.g. for invalidation)
+
+        The key is the request's query string encoding, which is canonical - members are sorted and values are encoded
+        as strings, so a validated request and an equivalent request object have the same key.
+        """
+        return (self.name, encode_query_string(request))
+
+    def _check_version(self, ctx, request, jsonp):
+        # Only GET requests have entity tags
+        environ = ctx.environ
+        if not ctx.app.etag or environ['REQUEST_METHOD'] != 'GET':
+            return False
+        version = self.version(ctx, request)
+        if version is None:
+            return False
+
+        # Compute the entity tag from the request version and the request URL arguments and query string
+        etag_hash = sha1()
+        for etag_part in (self.name, str(version), str(jsonp), environ.get('QUERY_STRING', ''),
+                          repr(sorted(ctx.url_args.items())) if ctx.url_args else ''):
+            etag_hash.update(etag_part.encode('utf-8'))
+            etag_hash.update(b'\0')
+        ctx.etag = '"v' + etag_hash.hexdigest() + '"'
+        return ctx.etag_match(ctx.etag)
+
+    def _cache_get(self, ctx, request, jsonp):
+        # Only GET requests without JSONP are cached - the key is computed from the validated request like cache_key
+        if self.cache is None or jsonp is not None or ctx.environ['REQUEST_METHOD'] != 'GET':
+            return None, None
+        cache_key = self.cache_key(request)
+        cached = self.cache.get(cache_key)
+        if cached is None:
+            return cache_key, None
+
+        # Return the cached response content
+        content, headers, ctx.etag = cached
+        ctx.headers.update(headers)
+        return cache_key, ctx.response('200 OK', 'application/json', [content])
+
+    def _encode_response(self, ctx, validators, jsonp, response=None, exc=None, cache_key=None):
+        deferred_response = None
+        try:
+            # Action callback exception?
+            status = '200 OK'
+            if isinstance(exc, _ActionErrorInternal):
+                raise exc
+            elif isinstance(exc, ActionError):
                 status = exc.status or STATUS_500
                 response = {'error': exc.error}
                 if exc.message is not None:
                     response['message'] = exc.message
-            except Exception as exc:
-                ctx.log.exception("Unexpected error in action '%s'", self.name)
+            elif exc is not None:
+                ctx.log.error("Unexpected error in action '%s'", self.name, exc_info=(type(exc), exc, exc.__traceback__))
                 raise _ActionErrorInternal('UnexpectedError')
+            elif response is None:
+                response = {}
+            elif 'error' in response and not jsonp:
+                status = STATUS_500
+
+            # Validate the response?
+            validate_output = ctx.app.validate_output if self.validate_output is None else self.validate_output
+            if validate_output is not True and validate_output is not False:
+                if validate_output == VALIDATE_OUTPUT_DEFERRED:
+                    deferred_response = response
+                    validate_output = False
+                else:
+                    validate_output = random() < validate_output
+            if validate_output:
+                start_time = perf_counter()
+                try:
+                    self._validate_response(validators, response)
+                except ValidationError as exc_validate:
+                    self.validate_output_errors += 1
+                    ctx.log.error("Invalid output returned from action '%s': %s", self.name, str(exc_validate))
+                    raise _ActionErrorInternal('InvalidOutput', message=str(exc_validate), member=exc_validate.member)
+                ctx.add_timing('output_validation', start_time)
+
+        except _ActionErrorInternal as exc_internal:
+            status = exc_internal.status or STATUS_500
+            response = {'error': exc_internal.error}
+            if exc_internal.message is not None:
+                response['message'] = exc_internal.message
+            if exc_internal.member is not None:
+                response['member'] = exc_internal.member
+
+        # Serialize the response as JSON
+        content = ctx.encode_json(response, jsonp=jsonp)
+
+        # Cache the response? Cache the serialized content, not the response - it may be a "304 Not Modified" response.
+        if cache_key is not None and status == '200 OK' and deferred_response is None:
+            self.cache.set(cache_key, (b''.join(content), tuple(ctx.headers.items()), ctx.etag))
+        content = ctx.response(status, 'application/json', content)
+
+        # Deferred output validation?
+        if deferred_response is not None:
+            return _ResponseClose(content, lambda: self._validate_response_deferred(ctx, validators, deferred_response))
 
-            # Validate the response
-            if ctx.app.validate_output:
-                if hasattr(response, '__contains__') and 'error' in response:
-                    response_type = TypeStruct()
-                    response_type.add_member('error', self.model.error_type)
-                    response_type.add_member('message', TYPE_STRING, optional=True)
+        return content
+
+    def _read_content(self, ctx, environ):
+        max_content_length = ctx.app.max_content_length if self.max_content_length is None else self.max_content_length
+
+        # Content length exceeds the maximum?
+        try:
+            content_length = int(environ.get('CONTENT_LENGTH') or -1)
+        except ValueError:
+            content_length = -1
+        if content_length >= 0 and max_content_length is not None and content_length > max_content_length:
+            ctx.log.warning("Request content too large for action '%s'", self.name)
+            raise _ActionErrorInternal('RequestTooLarge', message='Request content too large', status=STATUS_413)
+
+        # Read the content in chunks, up to the content length (if provided) and the maximum content length
+        read_max = content_length if content_length >= 0 else None
+        read_limit = read_max if max_content_length is None else \
+                     max_content_length + 1 if read_max is None else min(read_max, max_content_length + 1)
+        try:
+            wsgi_input = environ['wsgi.input']
+            content = b''
+            while read_limit is None or len(content) < read_limit:
+                chunk = wsgi_input.read(CONTENT_CHUNK_SIZE if read_limit is None else min(CONTENT_CHUNK_SIZE, read_limit - len(content)))
+                if not chunk:
+                    break
+                if not content:
+                    content = chunk
                 else:
-                    response_type = self.model.output_type
+                    if not isinstance(content, bytearray):
+                        content = bytearray(content)
+                    content += chunk
+        except:
+            ctx.log.warning("I/O error reading input for action '%s'", self.name)
+            raise _ActionErrorInternal('IOError', message='Error reading request content')
+
+        # Content exceeds the maximum?
+        if max_content_length is not None and len(content) > max_content_length:
+            ctx.log.warning("Request content too large for action '%s'", self.name)
+            raise _ActionErrorInternal('RequestTooLarge', message='Request content too large', status=STATUS_413)
+
+        return content
+
+    @staticmethod
+    def _validate_response(validators, response):
+        if hasattr(response, '__contains__') and 'error' in response:
+            validators.error(response)
+        else:
+            validators.output(response)
+
+    def _validate_response_deferred(self, ctx, validators, response):
+        try:
+            self._validate_response(validators, response)
+        except ValidationError as exc:
+            self.validate_output_errors += 1
+            ctx.log.error("Invalid output returned from action '%s': %s", self.name, str(exc))
 
-                try:
-                    response_type.validate(response, mode=VALIDATE_DEFAULT)
-                except ValidationError as exc:
-                    ctx.log.error("Invalid output returned from action '%s': %s", self.name, str(exc))
-                    raise _ActionErrorInternal('InvalidOutput', message=str(exc), member=exc.member)
 
-        except _ActionErrorInternal as exc:
-            status = exc.status or STATUS_500
-            response = {'error': exc.error}
-            if exc.message is not None:
-                response['message'] = exc.message
-            if exc.member is not None:
-                response['member'] = exc.member
+class _ActionValidators(object):
+    """
+    An action model's compiled input (by validation mode), output, and error response validators
+    """
 
-        # Serialize the response as JSON
-        return ctx.response_json(status, response, jsonp=jsonp)
+    __slots__ = ('input', 'output', 'error')
+
+    def __init__(self, input_validators, output_validator, error_validator):
+        self.input = input_validators
+        self.output = output_validator
+        self.error = error_validator
+
+
+class _ResponseClose(object):
+    """
+    WSGI response iterable that calls a function once the response has been sent (closed)
+    """
+
+    __slots__ = ('content', 'close_fn')
+
+    def __init__(self, content, close_fn):
+        self.content = content
+        self.close_fn = close_fn
+
+    def __iter__(self):
+        return iter(self.content)
+
+    def close(self):
+        try:
+            if hasattr(self.content, 'close'):
+                self.content.close()
+        finally:
+            self.close_fn()
@@ -21,22 +21,27 @@
 #
 
 from collections import OrderedDict
+from hashlib import sha1
+from importlib import import_module
 from io import BytesIO
 from itertools import chain
+import json
 import logging
 import os
-import re
-from urllib.parse import quote, unquote
+from time import perf_counter
+from urllib.parse import quote
 
+from .action import check_validate_output
 from .app_defs import ENVIRON_CTX
 from .request import Request
-from .spec import SpecParser
-from .util import JSONEncoder, load_modules
+from .router import Router
+from .model import TypeArray, Typedef, TypeDict, TypeEnum, TypeStruct
+from .spec import SpecParser, spec_cache_key, spec_token_names, tokenize_spec_files
+from .util import JSONCodec, load_modules, path_stat
 
 
-# Regular expression for matching URL arguments
-RE_URL_ARG = re.compile(r'/\{([A-Za-z]\w*)\}')
-RE_URL_ARG_ESC = re.compile(r'/\\{([A-Za-z]\w*)\\}')
+# Request manifest cache file format version
+REQUEST_MANIFEST_VERSION = 1
 
 
 class Application(object):
@@ -44,35 +49,143 @@ class Application(object):
     Chisel base application
     """
 
-    __slots__ = ('log_level', 'log_format', 'pretty_output', 'validate_output', 'specs', 'requests', '__request_urls', '__request_regex')
+    __slots__ = ('log_level', 'log_format', 'pretty_output', '_validate_output', 'max_content_length', 'json_codec', 'executor',
+                 'metrics', 'timing_sink', 'server_timing', 'etag', 'spec_reload', 'specs', 'requests',
+                 'request_generation', 'router', '_spec_roots', '_spec_files', '_log_handler')
 
     def __init__(self):
         self.log_level = logging.WARNING
         self.log_format = '%(levelname)s [%(process)s / %(thread)s] %(message)s'
         self.pretty_output = False
         self.validate_output = True
+        self.max_content_length = None
+        self.json_codec = JSONCodec()
+        self.executor = None
+        self.metrics = None
+        self.timing_sink = None
+        self.server_timing = False
+        self.etag = False
+        self.spec_reload = False
         self.specs = SpecParser()
         self.requests = {}
-        self.__request_urls = {}
-        self.__request_regex = []
+        self.request_generation = 0
+        self.router = Router()
+        self._spec_roots = []
+        self._spec_files = OrderedDict()
+        self._log_handler = None
 
-    def load_specs(self, spec_path, spec_ext='.chsl', finalize=True):
+    @property
+    def validate_output(self):
         """
-        Load a spec file or directory
+        The output validation policy - True, False, VALIDATE_OUTPUT_DEFERRED, or a float fraction of requests to validate
         """
-        if os.path.isdir(spec_path):
-            for dirpath, dummy_dirnames, filenames in os.walk(spec_path):
-                for filename in filenames:
-                    (dummy_base, ext) = os.path.splitext(filename)
-                    if ext == spec_ext:
-                        with open(os.path.join(dirpath, filename), 'r') as file_spec:
-                            self.specs.parse(file_spec, finalize=False)
-        else:
-            with open(spec_path, 'r') as file_spec:
-                self.specs.parse(file_spec, finalize=False)
+        return self._validate_output
+
+    @validate_output.setter
+    def validate_output(self, validate_output):
+        self._validate_output = check_validate_output(validate_output)
+
+    def load_specs(self, spec_path, spec_ext='.chsl', finalize=True, cache_path=None, workers=None):
+        """
+        Load a spec file or directory
+
+        If cache_path is provided, the finalized spec model is loaded from the cache file if none of the spec files have
+        changed. Otherwise, the spec files are parsed and the cache file is written. The cache is only used when no other
+        specs have been loaded.
+
+        If workers is greater than one, large spec file sets are tokenized in parallel using a pool of worker processes (see
+        tokenize_spec_files).
 
+        If spec_reload is True, the spec files' tokens are kept for reload_specs.
+        """
+        spec_paths = list(_spec_paths(spec_path, spec_ext))
+        if self.spec_reload:
+            self._spec_roots.append((spec_path, spec_ext))
+
+        # Load the parsed spec cache?
+        use_cache = cache_path is not None and finalize and not self.specs.types and not self.specs.actions
+        if use_cache:
+            cache_key = spec_cache_key(spec_paths)
+            if self.specs.load_cache(cache_path, cache_key):
+                if self.spec_reload:
+                    for spec_path_ in spec_paths:
+                        self._spec_files[spec_path_] = (_spec_file_stat(spec_path_), None)
+                return
+
+        # Parse the spec files
+        spec_stats = [_spec_file_stat(spec_path_) for spec_path_ in spec_paths] if self.spec_reload else None
+        spec_tokens = tokenize_spec_files(spec_paths, workers=workers)
+        for spec_path_, tokens in zip(spec_paths, spec_tokens):
+            self.specs.parse_tokens(tokens, filename=spec_path_, finalize=False)
+        if spec_stats is not None:
+            for spec_path_, spec_stat, tokens in zip(spec_paths, spec_stats, spec_tokens):
+                self._spec_files[spec_path_] = (spec_stat, tokens)
         if finalize:
             self.specs.finalize()
+            if use_cache:
+                self.specs.save_cache(cache_path, cache_key)
+
+    def reload_specs(self, workers=None):
+        """
+        Reload the spec files loaded by load_specs that have been added, changed, or removed (requires spec_reload)
+
+        Only the changed spec files are re-tokenized. The spec model is rebuilt and swapped, and the models of the actions
+        defined by the application's specs are replaced. Only actions that reference a changed type have their validators
+        recompiled. In-flight requests finish using the previous model. If the changed specs have errors, SpecParserError
+        is raised and the application is unchanged. Returns the list of added, changed, and removed spec file paths.
+
+        The rebuilt spec model contains only the specs loaded from files. This method must not be called concurrently.
+        """
+        assert self.spec_reload, 'spec reload not enabled'
+
+        # Find the added and changed spec files
+        spec_files = OrderedDict()
+        changed_paths = []
+        for spec_path, spec_ext in self._spec_roots:
+            for spec_path_ in _spec_paths(spec_path, spec_ext):
+                spec_stat = _spec_file_stat(spec_path_)
+                spec_file = self._spec_files.get(spec_path_)
+                if spec_file is None or spec_file[0] != spec_stat:
+                    changed_paths.append(spec_path_)
+                    spec_files[spec_path_] = (spec_stat, None)
+                else:
+                    spec_files[spec_path_] = spec_file
+        removed_paths = [spec_path for spec_path in self._spec_files if spec_path not in spec_files]
+        if not changed_paths and not removed_paths:
+            return []
+
+        # Tokenize the changed spec files (and those loaded from the spec cache)
+        tokenize_paths = [spec_path for spec_path, (dummy_stat, tokens) in spec_files.items() if tokens is None]
+        for spec_path, tokens in zip(tokenize_paths, tokenize_spec_files(tokenize_paths, workers=workers)):
+            spec_files[spec_path] = (spec_files[spec_path][0], tokens)
+
+        # Rebuild the spec model
+        specs = SpecParser()
+        for spec_path, (dummy_stat, tokens) in spec_files.items():
+            specs.parse_tokens(tokens, filename=spec_path, finalize=False)
+        specs.finalize()
+
+        # Determine the new models of the spec-defined actions and whether they reference a changed type or action
+        changed_names = set(chain.from_iterable(spec_token_names(spec_files[spec_path][1]) for spec_path in changed_paths))
+        action_models = []
+        for request in self.requests.values():
+            model = getattr(request, 'model', None)
+            if model is None or model is not self.specs.actions.get(request.name):
+                continue
+            model_new = specs.actions.get(request.name)
+            if model_new is None:
+                raise Exception("No spec defined for action '{0}'".format(request.name))
+            action_models.append((request, model_new, request.name in changed_names or
+                                  not changed_names.isdisjoint(_action_type_names(model_new))))
+
+        # Swap the spec model and the action models
+        self.specs = specs
+        self._spec_files = spec_files
+        for request, model_new, compile_validators in action_models:
+            request.set_model(model_new, compile_validators=compile_validators)
+        self.request_generation += 1
+
+        return changed_paths + removed_paths
 
     def add_request(self, request):
         """
@@ -83,67 +196,68 @@ class Application(object):
         if request.name in self.requests:
             raise Exception('Redefinition of request "{0}"'.format(request.name))
         self.requests[request.name] = request
+        self.request_generation += 1
 
         # Add the request URLs
         for method, url in request.urls:
-
-            # URL with arguments?
-            if RE_URL_ARG.search(url):
-                request_regex = '^' + RE_URL_ARG_ESC.sub(r'/(?P<\1>[^/]+)', re.escape(url)) + '$'
-                self.__request_regex.append((method, re.compile(request_regex), request))
-            else:
-                request_key = (method, url)
-                if request_key in self.__request_urls:
-                    raise Exception('Redefinition of request URL "{0}"'.format(url))
-                self.__request_urls[request_key] = request
+            self.router.add(method, url, request)
 
         # Make the request app-aware at load-time
         request.onload(self)
 
-    def load_requests(self, module_path, module_ext='.py'):
+    def load_requests(self, module_path, module_ext='.py', cache_path=None):
         """
         Recursively load all requests in a directory
+
+        If cache_path is provided, the requests are loaded using the manifest cache file of module name to request names
+        if none of the module files or directories have changed. Only the modules that define requests are imported and
+        the system path search is skipped. Otherwise, all modules are loaded and the manifest cache file is written.
         """
-        for module in load_modules(module_path, module_ext=module_ext):
+
+        # Load the request manifest cache?
+        if cache_path is not None:
+            requests = _load_request_manifest(cache_path, module_path, module_ext)
+            if requests is not None:
+                for request in requests:
+                    self.add_request(request)
+                return
+
+        # Load the requests from all modules
+        module_stats = {} if cache_path is not None else None
+        manifest_modules = []
+        for module in load_modules(module_path, module_ext=module_ext, module_stats=module_stats):
+            module_requests = []
             for module_attr in dir(module):
                 request = getattr(module, module_attr)
                 if isinstance(request, Request) and request.module_name == module.__name__:
                     self.add_request(request)
+                    module_requests.append(module_attr)
+            if module_requests:
+                manifest_modules.append([module.__name__, module_requests])
+
+        # Write the request manifest cache
+        if cache_path is not None:
+            _save_request_manifest(cache_path, module_path, module_ext, module_stats, manifest_modules)
 
     def __call__(self, environ, start_response):
         """
         Chisel application WSGI entry point
         """
 
-        # Match the request by exact URL
-        path_info = environ['PATH_INFO']
-        request_method = environ['REQUEST_METHOD'].upper()
-        request, url_args = self.__request_urls.get((request_method, path_info)), None
+        # Record request metrics?
+        metrics = self.metrics
+        start_response_ctx = start_response
+        if metrics is not None:
+            start_time = perf_counter()
+            response_status = ['500']
+            def start_response_ctx(status, headers): # pylint: disable=function-redefined
+                response_status[0] = status
+                return start_response(status, headers)
+
+        # Match the request
+        request, ctx = self._match_request(environ, start_response_ctx)
         if request is None:
-            request, url_args = next((
-                (request, {unquote(url_arg): unquote(url_value) for url_arg, url_value in request_match.groupdict().items()})
-                for request, request_match in
-                ((request, regex.match(path_info)) for method, regex, request in self.__request_regex if method == request_method)
-                if request_match), (None, None))
-            if request is None:
-                request, url_args = self.__request_urls.get((None, path_info)), None
-                if request is None:
-                    request, url_args = next((
-                        (request, {unquote(url_arg): unquote(url_value) for url_arg, url_value in request_match.groupdict().items()})
-                        for request, request_match in
-                        ((request, regex.match(path_info)) for method, regex, request in self.__request_regex if method is None)
-                        if request_match), (None, None))
-
-        # Create the request context
-        ctx = Context(self, environ, start_response, url_args)
-        environ[ENVIRON_CTX] = ctx
-
-        # Request not found?
-        if request is None:
-            if next((True for _, path in self.__request_urls.keys() if path == path_info), False) or \
-               next((True for _, regex, _ in self.__request_regex if regex.match(path_info)), False):
-                return ctx.response_text('405 Method Not Allowed', 'Method Not Allowed')
-            return ctx.response_text('404 Not Found', 'Not Found')
+            return self._response_not_found(ctx)
 
         # Handle the request
         try:
@@ -151,6 +265,27 @@ class Application(object):
         except: # pylint: disable=bare-except
             ctx.log.exception('Exception raised by WSGI request "%s"', request.name)
             return ctx.response_text('500 Internal Server Error', 'Unexpected Error')
+        finally:
+            if metrics is not None:
+                metrics.record(request.name, response_status[0], perf_counter() - start_time)
+
+    def _match_request(self, environ, start_response):
+
+        # Match the request
+        request, url_args = self.router.match(environ['REQUEST_METHOD'].upper(), environ['PATH_INFO'])
+
+        # Create the request context
+        ctx = Context(self, environ, start_response, url_args)
+        environ[ENVIRON_CTX] = ctx
+
+        return request, ctx
+
+    def _response_not_found(self, ctx):
+        allowed_methods = self.router.allowed_methods(ctx.environ['PATH_INFO'])
+        if allowed_methods:
+            allow = ', '.join(sorted(method for method in allowed_methods if method is not None))
+            return ctx.response_text('405 Method Not Allowed', 'Method Not Allowed', headers=[('Allow', allow)])
+        return ctx.response_text('404 Not Found', 'Not Found')
 
     def request(self, request_method, path_info, query_string='', wsgi_input=b'', environ=None):
         """
@@ -177,7 +312,107 @@ class Application(object):
 
         # Make the request
         response = self(environ, start_response)
-        return status, headers, b''.join(response)
+        try:
+            return status, headers, b''.join(response)
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+
+
+def _spec_paths(spec_path, spec_ext):
+    if os.path.isdir(spec_path):
+        for dirpath, dummy_dirnames, filenames in os.walk(spec_path):
+            for filename in filenames:
+                (dummy_base, ext) = os.path.splitext(filename)
+                if ext == spec_ext:
+                    yield os.path.join(dirpath, filename)
+    else:
+        yield spec_path
+
+
+def _load_request_manifest(cache_path, module_path, module_ext):
+    # Load the manifest cache - returns None if it doesn't exist or is out-of-date
+    try:
+        with open(cache_path, 'r') as cache_file:
+            manifest = json.load(cache_file)
+        if manifest.get('version') != REQUEST_MANIFEST_VERSION or \
+           manifest['module_path'] != os.path.abspath(module_path) or manifest['module_ext'] != module_ext:
+            return None
+        if any(path_stat(path) != stat for path, stat in manifest['stats'].items()):
+            return None
+
+        # Import the request modules
+        requests = []
+        for module_name, request_attrs in manifest['modules']:
+            module = import_module(module_name)
+            for request_attr in request_attrs:
+                request = getattr(module, request_attr, None)
+                if not isinstance(request, Request) or request.module_name != module_name:
+                    return None
+                requests.append(request)
+    except (OSError, ValueError, KeyError, TypeError, ImportError):
+        return None
+    return requests
+
+
+def _save_request_manifest(cache_path, module_path, module_ext, module_stats, manifest_modules):
+    # Write the manifest cache (atomically) - errors are ignored
+    manifest = {
+        'version': REQUEST_MANIFEST_VERSION,
+        'module_path': os.path.abspath(module_path),
+        'module_ext': module_ext,
+        'stats': {os.path.abspath(path): stat for path, stat in module_stats.items()},
+        'modules': manifest_modules
+    }
+    cache_path_tmp = '{0}.{1}.tmp'.format(cache_path, os.getpid())
+    try:
+        with open(cache_path_tmp, 'w') as cache_file:
+            json.dump(manifest, cache_file, sort_keys=True)
+        os.replace(cache_path_tmp, cache_path)
+    except OSError:
+        if os.path.exists(cache_path_tmp):
+            os.remove(cache_path_tmp)
+
+
+def _spec_file_stat(spec_path):
+    spec_stat = os.stat(spec_path)
+    return (spec_stat.st_mtime_ns, spec_stat.st_size)
+
+
+def _action_type_names(model):
+    # The names of the user types referenced by an action model, including base types
+    type_names = set()
+    types = [model.input_type, model.output_type, model.error_type]
+    while types:
+        type_ = types.pop()
+        if isinstance(type_, (TypeArray, TypeDict)):
+            types.append(type_.type)
+            if isinstance(type_, TypeDict):
+                types.append(type_.key_type)
+        elif isinstance(type_, (Typedef, TypeStruct, TypeEnum)) and type_.type_name not in type_names:
+            type_names.add(type_.type_name)
+            if isinstance(type_, Typedef):
+                types.append(type_.type)
+            else:
+                if type_.base_types:
+                    types.extend(type_.base_types)
+                if isinstance(type_, TypeStruct):
+                    types.extend(member.type for member in type_.members(include_base_types=False))
+    return type_names
+
+
+def content_etag(content):
+    """
+    Compute the strong entity tag of response content (a sequence of bytes)
+    """
+    content_hash = sha1()
+    for chunk in content:
+        content_hash.update(chunk)
+    return '"' + content_hash.hexdigest() + '"'
+
+
+# Headers not sent with "304 Not Modified" responses
+_NOT_MODIFIED_EXCLUDE = ('Content-Type', 'Content-Length')
 
 
 class Context(object):
@@ -185,7 +420,7 @@ class Context(object):
     Chisel request context
     """
 
-    __slots__ = ('app', 'environ', '_start_response', 'url_args', 'log', 'headers')
+    __slots__ = ('app', 'environ', '_start_response', 'url_args', 'headers', 'timings', 'etag', '_log')
 
     def __init__(self, app, environ=None, start_response=None, url_args=None):
         self.app = app
@@ -193,20 +428,49 @@ class Context(object):
         self._start_response = start_response
         self.url_args = url_args
         self.headers = OrderedDict()
+        self.timings = [] if app.timing_sink is not None or app.server_timing else None
+        self.etag = None
+        self._log = None
 
-        # Create the logger
-        self.log = logging.getLoggerClass()('')
-        self.log.setLevel(self.app.log_level)
-        wsgi_errors = environ.get('wsgi.errors')
-        if wsgi_errors is None:
-            handler = logging.NullHandler()
-        else:
-            handler = logging.StreamHandler(wsgi_errors) # pylint: disable=redefined-variable-type
-        if hasattr(self.app.log_format, '__call__'):
-            handler.setFormatter(self.app.log_format(self))
-        else:
-            handler.setFormatter(logging.Formatter(self.app.log_format))
-        self.log.addHandler(handler)
+    @property
+    def log(self):
+        """
+        The request logger - created on first use
+        """
+        if self._log is None:
+            self._log = self._create_logger()
+        return self._log
+
+    def _create_logger(self):
+        app = self.app
+        wsgi_errors = self.environ.get('wsgi.errors')
+        log_format = app.log_format
+        log_format_callable = hasattr(log_format, '__call__')
+
+        # Re-use the application's log handler if the error stream and format are unchanged
+        handler = None
+        if not log_format_callable:
+            log_handler = app._log_handler # pylint: disable=protected-access
+            if log_handler is not None and log_handler[0] is wsgi_errors and log_handler[1] == log_format:
+                handler = log_handler[2]
+
+        # Create the log handler
+        if handler is None:
+            if wsgi_errors is None:
+                handler = logging.NullHandler()
+            else:
+                handler = logging.StreamHandler(wsgi_errors) # pylint: disable=redefined-variable-type
+            if log_format_callable:
+                handler.setFormatter(log_format(self))
+            else:
+                handler.setFormatter(logging.Formatter(log_format))
+                app._log_handler = (wsgi_errors, log_format, handler) # pylint: disable=protected-access
+
+        # Each request has its own logger so that changes to one request's logger don't affect other requests
+        log = logging.getLoggerClass()('')
+        log.setLevel(app.log_level)
+        log.addHandler(handler)
+        return log
 
     @property
     def reconstructed_url(self):
@@ -247,6 +511,18 @@ class Context(object):
         assert isinstance(value, str)
         self.headers[key] = value
 
+    def add_timing(self, phase, start_time, nbytes=None):
+        """
+        Record the duration of a request phase that started at start_time (from time.perf_counter)
+
+        Timings are only recorded if the application has a timing sink or emits the Server-Timing header.
+        """
+        if self.timings is not None:
+            seconds = perf_counter() - start_time
+            self.timings.append((phase, seconds, nbytes))
+            if self.app.timing_sink is not None:
+                self.app.timing_sink(self, phase, seconds, nbytes)
+
     def response(self, status, content_type, content, headers=None):
         """
         Send an HTTP response
@@ -261,11 +537,47 @@ class Context(object):
             _headers.append(('Content-Type', content_type))
         if isinstance(content, list) and 'Content-Length' not in headers_set:
             _headers.append(('Content-Length', str(sum(len(x) for x in content))))
+        if self.timings and self.app.server_timing and 'Server-Timing' not in headers_set:
+            _headers.append(('Server-Timing', ', '.join(
+                '{0};dur={1:.3f}'.format(phase, 1000 * seconds) + ('' if nbytes is None else ';desc="{0} bytes"'.format(nbytes))
+                for phase, seconds, nbytes in self.timings)))
+
+        # Entity tag? Use the context's entity tag or generate one from the content.
+        if self.app.etag and status[:3] == '200' and isinstance(content, list) and self.environ.get('REQUEST_METHOD') == 'GET':
+            if 'ETag' in headers_set:
+                etag = next(value for key, value in _headers if key == 'ETag')
+            elif 'ETag' in self.headers:
+                etag = self.headers['ETag']
+            else:
+                etag = self.etag if self.etag is not None else content_etag(content)
+                _headers.append(('ETag', etag))
+            if self.etag_match(etag):
+                return self.response_not_modified([header for header in _headers if header[0] not in _NOT_MODIFIED_EXCLUDE])
 
         # Return the response
         self.start_response(status, _headers)
         return content
 
+    def etag_match(self, etag):
+        """
+        Does the request's If-None-Match header match an entity tag?
+        """
+        if_none_match = self.environ.get('HTTP_IF_NONE_MATCH')
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == '*':
+            return True
+        etag = etag[2:] if etag.startswith('W/') else etag
+        return any((match[2:] if match.startswith('W/') else match) == etag
+                   for match in (match.strip() for match in if_none_match.split(',')))
+
+    def response_not_modified(self, headers=None):
+        """
+        Send a "304 Not Modified" response
+        """
+        self.start_response('304 Not Modified', headers or [])
+        return []
+
     def response_text(self, status, text, content_type='text/plain', encoding='utf-8', headers=None):
         """
         Send a plain-text response
@@ -276,14 +588,18 @@ class Context(object):
         """
         Send a JSON response
         """
-        encoder = JSONEncoder(check_circular=self.app.validate_output,
-                              allow_nan=False,
-                              sort_keys=True,
-                              indent=2 if self.app.pretty_output else None,
-                              separators=(',', ': ') if self.app.pretty_output else (',', ':'))
-        content = encoder.encode(response)
+        return self.response(status, content_type, self.encode_json(response, encoding=encoding, jsonp=jsonp), headers=headers)
+
+    def encode_json(self, response, encoding='utf-8', jsonp=None):
+        """
+        Serialize a JSON response to a list of content bytes
+        """
+        start_time = perf_counter()
+        content = self.app.json_codec.encode(response, pretty=self.app.pretty_output, check_circular=self.app.validate_output)
         if jsonp:
             content_list = [jsonp.encode(encoding), b'(', content.encode(encoding), b');']
         else:
             content_list = [content.encode(encoding)]
-        return self.response(status, content_type, content_list, headers=headers)
+        if self.timings is not None:
+            self.add_timing('serialize', start_time, sum(len(x) for x in content_list))
+        return content_list
@@ -0,0 +1,223 @@
+#
+# Copyright (C) 2012-2016 Craig Hobbs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from inspect import isawaitable, iscoroutinefunction
+from io import BytesIO
+import sys
+from time import perf_counter
+
+from .action import Action, _ActionErrorInternal
+
+
+def asgi_application(app):
+    """
+    Create the ASGI application callable for a Chisel application, e.g. "asgi = asgi_application(app)"
+
+    The ASGI entry point requires Python 3.7 or later - this module is not imported by the chisel package.
+    """
+    async def asgi(scope, receive, send):
+        await asgi_call(app, scope, receive, send)
+    return asgi
+
+
+def asgi_call(app, scope, receive, send):
+    """
+    Handle an ASGI request for a Chisel application
+
+    Action callbacks defined with "async def" are awaited on the event loop. All other callbacks and requests are run in
+    the application's executor (app.executor), a bounded thread pool that is created on first use if not provided.
+    """
+    if scope['type'] == 'http':
+        return _asgi_http(app, scope, receive, send)
+    elif scope['type'] == 'lifespan':
+        return _asgi_lifespan(receive, send)
+    raise ValueError('Unsupported ASGI scope type "{0}"'.format(scope['type']))
+
+
+async def _asgi_lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def _asgi_http(app, scope, receive, send):
+    loop = asyncio.get_running_loop()
+    start_time = perf_counter()
+    if app.executor is None:
+        app.executor = ThreadPoolExecutor()
+
+    # Match the request
+    response_start = []
+    def start_response(status, headers):
+        response_start[:] = (status, headers)
+    environ = _asgi_environ(scope)
+    request, ctx = app._match_request(environ, start_response) # pylint: disable=protected-access
+
+    # Request not found?
+    if request is None:
+        content = app._response_not_found(ctx) # pylint: disable=protected-access
+    else:
+        content = await _asgi_request(app, loop, request, ctx, environ, receive)
+        if app.metrics is not None:
+            app.metrics.record(request.name, response_start[0], perf_counter() - start_time)
+
+    # Send the response
+    try:
+        status, headers = response_start
+        await send({
+            'type': 'http.response.start',
+            'status': int(status.split(' ', 1)[0]),
+            'headers': [(key.lower().encode('latin-1'), value.encode('latin-1')) for key, value in headers]
+        })
+        for chunk in content:
+            if chunk:
+                await send({'type': 'http.response.body', 'body': bytes(chunk), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        if hasattr(content, 'close'):
+            content.close()
+
+
+async def _asgi_request(app, loop, request, ctx, environ, receive):
+    try:
+        # Action request?
+        if isinstance(request, Action) and not request.wsgi_response:
+            if environ['REQUEST_METHOD'] != 'GET':
+                max_content_length = app.max_content_length if request.max_content_length is None else request.max_content_length
+
+                # Don't read the content if its declared length is too large - the action responds with a 413
+                try:
+                    content_length = int(environ.get('CONTENT_LENGTH') or -1)
+                except ValueError:
+                    content_length = -1
+                if max_content_length is not None and content_length > max_content_length:
+                    environ['wsgi.input'] = BytesIO()
+                else:
+                    environ['wsgi.input'] = BytesIO(await _asgi_body(receive, max_content_length))
+            content = await _asgi_action(loop, app.executor, request, ctx, environ)
+
+        # Otherwise, run the WSGI request in the executor
+        else:
+            environ['wsgi.input'] = BytesIO(await _asgi_body(receive, None))
+            content = await loop.run_in_executor(app.executor, _wsgi_request, request, ctx)
+
+    except: # pylint: disable=bare-except
+        ctx.log.exception('Exception raised by ASGI request "%s"', request.name)
+        return ctx.response_text('500 Internal Server Error', 'Unexpected Error')
+
+    return content
+
+
+async def _asgi_action(loop, executor, action, ctx, environ):
+    validators = action._validators # pylint: disable=protected-access
+
+    # Decode and validate the request - return the cached response, if any
+    try:
+        request, jsonp, validate_mode = action._decode_request(ctx, environ) # pylint: disable=protected-access
+        request = action._validate_request(ctx, validators, request, validate_mode) # pylint: disable=protected-access
+    except _ActionErrorInternal as exc:
+        return action._encode_response(ctx, validators, None, exc=exc) # pylint: disable=protected-access
+    cache_key, content = action._cache_get(ctx, request, jsonp) # pylint: disable=protected-access
+    if content is not None:
+        return content
+
+    # Request version not modified?
+    if action.version is not None and action._check_version(ctx, request, jsonp): # pylint: disable=protected-access
+        return ctx.response_not_modified([('ETag', ctx.etag)])
+
+    # Await coroutine action callbacks - run all others in the executor
+    start_time = perf_counter()
+    try:
+        if iscoroutinefunction(action.action_callback):
+            response = await action.action_callback(ctx, request)
+        else:
+            response = await loop.run_in_executor(executor, action.action_callback, ctx, request)
+            if isawaitable(response):
+                response = await response
+        exc_callback = None
+    except Exception as exc: # pylint: disable=broad-except
+        exc_callback = exc
+    ctx.add_timing('callback', start_time)
+    if exc_callback is not None:
+        return action._encode_response(ctx, validators, jsonp, exc=exc_callback) # pylint: disable=protected-access
+
+    # Validate and serialize the response
+    return action._encode_response(ctx, validators, jsonp, response=response, cache_key=cache_key) # pylint: disable=protected-access
+
+
+def _wsgi_request(request, ctx):
+    # Read the response content in the executor, since iterating it may block (e.g. streamed doc pages)
+    content = request(ctx.environ, ctx.start_response)
+    if isinstance(content, list):
+        return content
+    try:
+        return list(content)
+    finally:
+        if hasattr(content, 'close'):
+            content.close()
+
+
+async def _asgi_body(receive, max_content_length):
+    body = bytearray()
+    while max_content_length is None or len(body) <= max_content_length:
+        message = await receive()
+        if message['type'] != 'http.request':
+            break
+        body.extend(message.get('body', b''))
+        if not message.get('more_body', False):
+            break
+    return bytes(body)
+
+
+def _asgi_environ(scope):
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.errors': sys.stderr
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+
+    # Add the request headers
+    for key, value in scope.get('headers', ()):
+        key = key.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            key = 'HTTP_' + key
+        if key in environ:
+            value = environ[key] + ',' + value
+        environ[key] = value
+
+    return environ
@@ -0,0 +1,84 @@
+#
+# Copyright (C) 2012-2016 Craig Hobbs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+"""
+Run the chisel benchmark suite
+
+Usage: python -m chisel.bench [-o results.json] [-b baseline.json] [name-prefix ...]
+"""
+
+from argparse import ArgumentParser
+import platform
+import sys
+
+from chisel import __version__ as chisel_version
+from chisel.bench.runner import compare_results, format_result, load_results, run_benchmarks, save_results
+from chisel.bench.suite import BENCHMARKS
+
+
+def main(argv=None):
+
+    # Command line arguments
+    parser = ArgumentParser(prog='python -m chisel.bench')
+    parser.add_argument('names', nargs='*', metavar='name',
+                        help='run only the benchmarks with names starting with these prefixes')
+    parser.add_argument('-n', type=int, dest='number', default=1000,
+                        help='the number of calls per timing batch (default is 1000)')
+    parser.add_argument('-r', type=int, dest='repeat', default=20,
+                        help='the number of timing batches (default is 20)')
+    parser.add_argument('-o', dest='output', metavar='FILE',
+                        help='write the results JSON to FILE')
+    parser.add_argument('-b', dest='baseline', metavar='FILE',
+                        help='compare the results to the baseline results JSON FILE')
+    parser.add_argument('-t', type=float, dest='threshold', default=0.1,
+                        help='the median slowdown fraction reported as a regression (default is 0.1)')
+    parser.add_argument('-l', '--list', action='store_true', dest='list',
+                        help='list the benchmark names')
+    args = parser.parse_args(args=argv)
+
+    # List benchmarks?
+    if args.list:
+        for name, dummy_fn_setup in BENCHMARKS:
+            print(name)
+        return 0
+
+    # Run the benchmarks
+    baseline = load_results(args.baseline) if args.baseline else {}
+    def print_result(name, result):
+        print(format_result(name, result, baseline.get(name)))
+        sys.stdout.flush()
+    results = run_benchmarks(BENCHMARKS, number=args.number, repeat=args.repeat, names=args.names,
+                             fn_progress=print_result)
+
+    # Save the results
+    if args.output:
+        save_results(args.output, results, chisel_version=chisel_version, python_version=platform.python_version())
+
+    # Report regressions
+    regressions = compare_results(results, baseline, threshold=args.threshold)
+    for name, baseline_us, result_us, slowdown in regressions:
+        print('REGRESSION: {0} {1:.3f} us -> {2:.3f} us ({3:+.1%})'.format(name, baseline_us, result_us, slowdown))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
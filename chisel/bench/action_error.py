@@ -0,0 +1,92 @@
+#
+# Copyright (C) 2012-2016 Craig Hobbs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+"""
+Benchmark action error response throughput with output validation enabled
+
+Usage: python -m chisel.bench.action_error
+"""
+
+from timeit import repeat
+
+from chisel import action, ActionError, Application
+from chisel.model import TypeStruct, TYPE_STRING, VALIDATE_DEFAULT
+
+
+def _error_app():
+
+    @action(spec='''\
+action error_return
+  input
+    int value
+  errors
+    DownstreamError
+''')
+    def error_return(dummy_ctx, dummy_req):
+        return {'error': 'DownstreamError', 'message': 'The downstream service is unavailable'}
+
+    @action(spec='''\
+action error_raise
+  input
+    int value
+  errors
+    DownstreamError
+''')
+    def error_raise(dummy_ctx, dummy_req):
+        raise ActionError('DownstreamError', message='The downstream service is unavailable')
+
+    app = Application()
+    app.add_request(error_return)
+    app.add_request(error_raise)
+    return app
+
+
+def main(number=5000):
+    app = _error_app()
+    error_model = app.requests['error_return'].model
+    error_response = {'error': 'DownstreamError', 'message': 'The downstream service is unavailable'}
+
+    def validate_uncached():
+        response_type = TypeStruct()
+        response_type.add_member('error', error_model.error_type)
+        response_type.add_member('message', TYPE_STRING, optional=True)
+        response_type.validate(error_response, mode=VALIDATE_DEFAULT)
+
+    def validate_cached():
+        app.requests['error_return']._validators.error(error_response) # pylint: disable=protected-access
+
+    def request_error_return():
+        app.request('GET', '/error_return', query_string='value=1')
+
+    def request_error_raise():
+        app.request('GET', '/error_raise', query_string='value=1')
+
+    for name, fn_bench in (('validate, uncached type', validate_uncached),
+                           ('validate, cached type', validate_cached),
+                           ('request, error returned', request_error_return),
+                           ('request, error raised', request_error_raise)):
+        seconds = min(repeat(fn_bench, number=number, repeat=5))
+        print('{0:<24} {1:8.3f} us/op {2:10.0f} ops/sec'.format(name, 1e6 * seconds / number, number / seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#
+# Copyright (C) 2012-2016 Craig Hobbs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+"""
+Benchmark ASGI vs WSGI request throughput for concurrent slow (I/O-bound) actions
+
+Usage: python -m chisel.bench.asgi (requires Python 3.7 or later)
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+from chisel import action, Application
+from chisel.asgi import asgi_application
+
+
+_SLOW_SPEC = '''\
+action {0}
+  input
+    int value
+  output
+    int result
+'''
+
+
+def _slow_app(delay, executor_workers):
+
+    @action(spec=_SLOW_SPEC.format('slow_sync'))
+    def slow_sync(dummy_ctx, req):
+        time.sleep(delay)
+        return {'result': req['value']}
+
+    @action(spec=_SLOW_SPEC.format('slow_async'))
+    async def slow_async(dummy_ctx, req):
+        await asyncio.sleep(delay)
+        return {'result': req['value']}
+
+    app = Application()
+    app.executor = ThreadPoolExecutor(max_workers=executor_workers)
+    app.add_request(slow_sync)
+    app.add_request(slow_async)
+    return app
+
+
+async def _asgi_requests(asgi, path, count):
+
+    async def asgi_request():
+        scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'value=1', 'headers': []}
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(dummy_message):
+            pass
+
+        await asgi(scope, receive, send)
+
+    await asyncio.gather(*(asgi_request() for _ in range(count)))
+
+
+def main(count=200, delay=0.01, executor_workers=16):
+    app = _slow_app(delay, executor_workers)
+    asgi = asgi_application(app)
+
+    def wsgi_sync():
+        for _ in range(count):
+            app.request('GET', '/slow_sync', query_string='value=1')
+
+    def asgi_sync():
+        asyncio.run(_asgi_requests(asgi, '/slow_sync', count))
+
+    def asgi_async():
+        asyncio.run(_asgi_requests(asgi, '/slow_async', count))
+
+    print('{0} concurrent requests, {1:.0f} ms per action, {2} executor workers'.format(count, 1e3 * delay, executor_workers))
+    for name, fn_bench in (('WSGI, sync action', wsgi_sync),
+                           ('ASGI, sync action', asgi_sync),
+                           ('ASGI, async action', asgi_async)):
+        start = time.perf_counter()
+        fn_bench()
+        seconds = time.perf_counter() - start
+        print('{0:<20} {1:8.3f} sec {2:10.0f} requests/sec'.format(name, seconds, count / seconds))
+    app.executor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
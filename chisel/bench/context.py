@@ -0,0 +1,71 @@
+#
+# Copyright (C) 2012-2016 Craig Hobbs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+"""
+Benchmark the per-request cost of creating a request context
+
+Usage: python -m chisel.bench.context
+"""
+
+from io import StringIO
+import logging
+from timeit import repeat
+
+from chisel import Application
+from chisel.app import Context
+
+
+def _context_eager(app, environ):
+    # The request context logger construction prior to lazy logging
+    ctx = Context(app, environ)
+    log = logging.getLoggerClass()('')
+    log.setLevel(app.log_level)
+    wsgi_errors = environ.get('wsgi.errors')
+    if wsgi_errors is None:
+        handler = logging.NullHandler()
+    else:
+        handler = logging.StreamHandler(wsgi_errors)
+    handler.setFormatter(logging.Formatter(app.log_format))
+    log.addHandler(handler)
+    return ctx
+
+
+def main(number=20000):
+    app = Application()
+    environ = {'wsgi.errors': StringIO()}
+
+    def context_eager():
+        _context_eager(app, environ)
+
+    def context_lazy():
+        Context(app, environ)
+
+    def context_lazy_log():
+        Context(app, environ).log.debug('Hello')
+
+    for name, fn_bench in (('eager', context_eager), ('lazy', context_lazy), ('lazy, logged', context_lazy_log)):
+        seconds = min(repeat(fn_bench, number=number, repeat=5))
+        print('{0:<14} {1:8.3f} us/request'.format(name, 1e6 * seconds / number))
+
+
+if __name__ == '__main__':
+    main()
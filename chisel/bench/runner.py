@@ -0,0 +1,129 @@
+#
+# Copyright (C) 2012-2016 Craig Hobbs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+"""
+Benchmark timing, reporting, and baseline comparison
+"""
+
+import json
+from math import ceil
+from timeit import default_timer
+
+
+def percentile(values, pct):
+    """
+    Compute a percentile (nearest-rank) of a sequence of values
+    """
+    values = sorted(values)
+    if not values:
+        return None
+    return values[max(0, int(ceil(pct / 100. * len(values))) - 1)]
+
+
+def run_benchmark(fn_bench, number=1000, repeat=20, timer=default_timer):
+    """
+    Time a benchmark function in "repeat" batches of "number" calls and return its result dict
+
+    Each call is timed individually, so the percentiles are of per-operation times. The time between calls (the timer
+    call itself) is included in each operation's time.
+    """
+    fn_bench()
+    call_times = []
+    for _ in range(repeat):
+        start = timer()
+        for _ in range(number):
+            fn_bench()
+            end = timer()
+            call_times.append(end - start)
+            start = end
+    total = sum(call_times)
+    return {
+        'ops_per_sec': len(call_times) / total if total else None,
+        'min_us': 1e6 * min(call_times),
+        'p50_us': 1e6 * percentile(call_times, 50),
+        'p90_us': 1e6 * percentile(call_times, 90),
+        'p99_us': 1e6 * percentile(call_times, 99),
+        'number': number,
+        'repeat': repeat
+    }
+
+
+def run_benchmarks(benchmarks, number=1000, repeat=20, names=None, fn_progress=None):
+    """
+    Run a sequence of (name, setup function) benchmarks and return the results dict, keyed by benchmark name
+
+    Each setup function returns the function to benchmark and a relative call count factor.
+    """
+    results = {}
+    for name, fn_setup in benchmarks:
+        if names and not any(name.startswith(prefix) for prefix in names):
+            continue
+        fn_bench, number_factor = fn_setup()
+        results[name] = result = run_benchmark(fn_bench, number=max(1, int(number * number_factor)), repeat=repeat)
+        if fn_progress is not None:
+            fn_progress(name, result)
+    return results
+
+
+def compare_results(results, baseline, threshold=0.1):
+    """
+    Compare benchmark results to baseline results and return the list of regressions
+
+    A regression is a benchmark whose median time per operation exceeds the baseline's by more than the threshold
+    fraction. Each regression is a tuple of benchmark name, baseline time (us), time (us), and slowdown fraction.
+    """
+    regressions = []
+    for name, result in sorted(results.items()):
+        result_baseline = baseline.get(name)
+        if result_baseline is None:
+            continue
+        slowdown = result['p50_us'] / result_baseline['p50_us'] - 1.
+        if slowdown > threshold:
+            regressions.append((name, result_baseline['p50_us'], result['p50_us'], slowdown))
+    return regressions
+
+
+def format_result(name, result, result_baseline=None):
+    """
+    Format a benchmark result as a report line
+    """
+    line = '{0:<36} {1:12.0f} ops/sec   p50 {2:10.3f} us   p90 {3:10.3f} us   p99 {4:10.3f} us'.format(
+        name, result['ops_per_sec'], result['p50_us'], result['p90_us'], result['p99_us'])
+    if result_baseline is not None:
+        line += '   {0:+7.1%}'.format(result['p50_us'] / result_baseline['p50_us'] - 1.)
+    return line
+
+
+def load_results(path):
+    """
+    Load benchmark results JSON
+    """
+    with open(path, 'r') as file_results:
+        return json.load(file_results)['benchmarks']
+
+
+def save_results(path, results, **info):
+    """
+    Save benchmark results JSON
+    """
+    with open(path, 'w') as file_results:
+        json.dump(dict(info, benchmarks=results), file_results, indent=2, sort_keys=True)
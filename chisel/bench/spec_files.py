@@ -0,0 +1,81 @@
+#
+# Copyright (C) 2012-2016 Craig Hobbs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+"""
+Benchmark serial vs process pool spec file tokenizing and parsing
+
+Usage: python -m chisel.bench.spec_files [file-count] [lines-per-file]
+"""
+
+from multiprocessing import cpu_count
+import os
+import re
+import sys
+from tempfile import TemporaryDirectory
+import time
+
+from chisel.bench.suite import mixed_spec
+from chisel.spec import SPEC_PARALLEL_MIN_SIZE, SpecParser, tokenize_spec_files, tokenize_spec_files_parallel
+
+
+def _best_seconds(fn_bench, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn_bench()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def main(file_count=8, file_lines=12500, repeat=3):
+    with TemporaryDirectory() as spec_dir:
+
+        # Write the spec files - type and action names are unique across files
+        spec_paths = []
+        for ix_file in range(file_count):
+            spec_path = os.path.join(spec_dir, 'spec{0}.chsl'.format(ix_file))
+            with open(spec_path, 'w') as spec_file:
+                spec_file.write(re.sub(r'\b(Struct|action)(?=\d)', r'file{0}\1'.format(ix_file), mixed_spec(file_lines)))
+            spec_paths.append(spec_path)
+        spec_size = sum(os.path.getsize(spec_path) for spec_path in spec_paths)
+        print('{0} spec files, {1} bytes ({2} parallel minimum), {3} CPUs'.format(
+            file_count, spec_size, SPEC_PARALLEL_MIN_SIZE, cpu_count()))
+
+        # Tokenize serially and in process pools of increasing size
+        benchmarks = [('tokenize, serial', lambda: tokenize_spec_files(spec_paths))]
+        worker_counts = sorted({workers for workers in (2, 4, 8, cpu_count()) if workers == 2 or 1 < workers <= cpu_count()})
+        for workers in worker_counts:
+            benchmarks.append(('tokenize, {0} workers'.format(workers),
+                               lambda workers=workers: tokenize_spec_files_parallel(spec_paths, workers)))
+
+        # Parse serially and with one worker per CPU (the process pool is used only if it's expected to be faster)
+        benchmarks.append(('parse, serial', lambda: SpecParser().parse_files(spec_paths)))
+        benchmarks.append(('parse, workers={0}'.format(cpu_count()),
+                           lambda: SpecParser().parse_files(spec_paths, workers=cpu_count())))
+
+        for name, fn_bench in benchmarks:
+            print('{0:<22} {1:8.3f} sec'.format(name, _best_seconds(fn_bench, repeat)))
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
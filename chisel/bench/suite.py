@@ -0,0 +1,277 @@
+#
+# Copyright (C) 2012-2016 Craig Hobbs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+"""
+The chisel request pipeline benchmark suite
+"""
+
+from datetime import datetime
+from io import StringIO
+
+from chisel import action, Application, Context, decode_query_string, DocAction, encode_query_string, request, ResponseCache, \
+    SpecParser, TZUTC
+from chisel.model import VALIDATE_DEFAULT, VALIDATE_JSON_INPUT, VALIDATE_QUERY_STRING
+from chisel.spec import tokenize_spec
+from chisel.validator import compile_validator
+
+
+_SPEC_STRUCT = '''\
+# A benchmark struct
+struct {name}
+  int id
+  string name
+  optional string description
+  float score
+  bool enabled
+  datetime created
+  {name}Kind kind
+  int[] values
+  optional string{{}} tags
+
+enum {name}Kind
+  Alpha
+  Beta
+  Gamma
+
+'''
+
+_SPEC_ACTION = '''\
+# A benchmark action
+action {name}
+  input
+    {struct} item
+    optional int limit
+  output
+    {struct}[] items
+  errors
+    NotFound
+
+'''
+
+
+def large_spec(count=200):
+    """
+    Generate a large benchmark spec string
+    """
+    return ''.join(_SPEC_STRUCT.format(name='Struct{0}'.format(ix)) + _SPEC_ACTION.format(name='action{0}'.format(ix),
+                                                                                          struct='Struct{0}'.format(ix))
+                   for ix in range(count))
+
+
+_SPEC_MIXED = '''\
+group "{name} Group"
+
+# A benchmark count
+typedef int(>= 0) {name}Count
+
+# A benchmark union
+union {name}Value
+  string(len > 0) text
+  float(<= 1000000) number
+
+struct {name}Ext ({name})
+  optional nullable {name}Count count
+  {name}Value[len > 0] extValues
+  string(len < 100) : {name}Value{{}} valueMap
+  optional string{{len < 10}} \\
+    labels
+
+enum {name}KindExt ({name}Kind)
+  "Delta Epsilon"
+  Zeta
+
+'''
+
+
+def mixed_spec(line_count=100000):
+    """
+    Generate a benchmark spec string of at least line_count lines using all of the spec language line kinds
+    """
+    spec_parts = []
+    spec_line_count = 0
+    ix = 0
+    while spec_line_count < line_count:
+        name = 'Struct{0}'.format(ix)
+        spec_part = _SPEC_STRUCT.format(name=name) + _SPEC_ACTION.format(name='action{0}'.format(ix), struct=name) + \
+            _SPEC_MIXED.format(name=name)
+        spec_parts.append(spec_part)
+        spec_line_count += spec_part.count('\n')
+        ix += 1
+    return ''.join(spec_parts)
+
+
+def _router_app(count=100):
+    app = Application()
+    for ix in range(count):
+        app.add_request(request(lambda environ, start_response: [], name='static{0}'.format(ix), method='GET'))
+        app.add_request(request(lambda environ, start_response: [], name='templated{0}'.format(ix), method='GET',
+                                urls='/templated{0}/{{id}}/item/{{item}}'.format(ix)))
+    return app
+
+
+def _bench_router(method, path):
+    def setup():
+        router = _router_app().router
+        return lambda: router.match(method, path), 10
+    return setup
+
+
+def _bench_router_allowed():
+    router = _router_app().router
+    return lambda: router.allowed_methods('/static50'), 10
+
+
+_QUERY_OBJECT = {
+    'id': 12345,
+    'name': 'The Name',
+    'enabled': True,
+    'values': [1, 2, 3, 4, 5],
+    'item': {'kind': 'Beta', 'score': 4.5, 'tags': {'a': 'x', 'b': 'y'}}
+}
+
+
+def _bench_query_decode():
+    query_string = encode_query_string(_QUERY_OBJECT)
+    return lambda: decode_query_string(query_string), 1
+
+
+def _bench_query_encode():
+    return lambda: encode_query_string(_QUERY_OBJECT), 1
+
+
+_STRUCT_JSON = {
+    'id': 1,
+    'name': 'Name',
+    'score': 1.5,
+    'enabled': True,
+    'created': '2016-01-01T00:00:00Z',
+    'kind': 'Beta',
+    'values': list(range(10)),
+    'tags': {'a': 'x', 'b': 'y'}
+}
+
+_STRUCT_DEFAULT = dict(_STRUCT_JSON, created=datetime(2016, 1, 1, tzinfo=TZUTC))
+
+_STRUCT_QUERY_STRING = decode_query_string(encode_query_string(_STRUCT_JSON))
+
+
+def _bench_validate(mode, value, compiled=False):
+    def setup():
+        parser = SpecParser()
+        parser.parse_string(large_spec(1))
+        struct_type = parser.types['Struct0']
+        if compiled:
+            validate_fn = compile_validator(struct_type, mode)
+            return lambda: validate_fn(value), 1
+        return lambda: struct_type.validate(value, mode=mode), 1
+    return setup
+
+
+def _response_app(cache=None):
+    @action(spec=_SPEC_STRUCT.format(name='Struct0') + _SPEC_ACTION.format(name='action0', struct='Struct0'), cache=cache)
+    def action0(dummy_ctx, dummy_req):
+        return {'items': [dict(_STRUCT_DEFAULT, id=ix) for ix in range(20)]}
+    app = Application()
+    app.add_request(action0)
+    app.add_request(DocAction())
+    return app
+
+
+def _bench_response_json():
+    app = _response_app()
+    ctx = Context(app, environ={'wsgi.errors': StringIO()})
+    response = {'items': [dict(_STRUCT_DEFAULT, id=ix) for ix in range(20)]}
+    return lambda: ctx.response_json('200 OK', response), 1
+
+
+def _bench_request_action(cache=None):
+    def setup():
+        app = _response_app(cache=cache)
+        query_string = encode_query_string({'item': _STRUCT_JSON})
+        return lambda: app.request('GET', '/action0', query_string=query_string), 1
+    return setup
+
+
+def _bench_spec_parse():
+    spec = large_spec()
+    def spec_parse():
+        parser = SpecParser()
+        parser.parse_string(spec)
+    return spec_parse, 0.002
+
+
+def _bench_spec_tokenize_100k():
+    spec_lines = mixed_spec().splitlines()
+    return lambda: tokenize_spec(spec_lines), 0.001
+
+
+def _bench_spec_parse_100k():
+    spec_lines = mixed_spec().splitlines()
+    def spec_parse():
+        parser = SpecParser()
+        parser.parse(spec_lines)
+    return spec_parse, 0.001
+
+
+def _bench_doc(query_string, cached=True):
+    def setup():
+        app = Application()
+        app.specs.parse_string(large_spec(50))
+        for name in app.specs.actions:
+            app.add_request(action(lambda ctx, req: None, name=name))
+        doc_action = DocAction()
+        app.add_request(doc_action)
+        if cached:
+            return lambda: app.request('GET', '/doc', query_string=query_string), 0.02
+        def doc_render():
+            doc_action.page_cache.clear()
+            app.request('GET', '/doc', query_string=query_string)
+        return doc_render, 0.02
+    return setup
+
+
+# The benchmark suite - tuples of benchmark name and setup function
+BENCHMARKS = (
+    ('router.static.hit', _bench_router('GET', '/static50')),
+    ('router.templated.hit', _bench_router('GET', '/templated50/123/item/abc')),
+    ('router.miss', _bench_router('GET', '/unknown/path')),
+    ('router.method_not_allowed', _bench_router('POST', '/static50')),
+    ('router.allowed_methods', _bench_router_allowed),
+    ('url.decode_query_string', _bench_query_decode),
+    ('url.encode_query_string', _bench_query_encode),
+    ('validate.default', _bench_validate(VALIDATE_DEFAULT, _STRUCT_DEFAULT)),
+    ('validate.json_input', _bench_validate(VALIDATE_JSON_INPUT, _STRUCT_JSON)),
+    ('validate.query_string', _bench_validate(VALIDATE_QUERY_STRING, _STRUCT_QUERY_STRING)),
+    ('validate.compiled.default', _bench_validate(VALIDATE_DEFAULT, _STRUCT_DEFAULT, compiled=True)),
+    ('validate.compiled.json_input', _bench_validate(VALIDATE_JSON_INPUT, _STRUCT_JSON, compiled=True)),
+    ('validate.compiled.query_string', _bench_validate(VALIDATE_QUERY_STRING, _STRUCT_QUERY_STRING, compiled=True)),
+    ('response.json', _bench_response_json),
+    ('request.action', _bench_request_action()),
+    ('request.action.cached', _bench_request_action(ResponseCache())),
+    ('spec.parse', _bench_spec_parse),
+    ('spec.tokenize.100k', _bench_spec_tokenize_100k),
+    ('spec.parse.100k', _bench_spec_parse_100k),
+    ('doc.index', _bench_doc('', cached=False)),
+    ('doc.index.cached', _bench_doc('')),
+    ('doc.request', _bench_doc('name=action25', cached=False)),
+    ('doc.request.cached', _bench_doc('name=action25'))
+)
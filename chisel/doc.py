@@ -27,18 +27,27 @@ from urllib.parse import quote
 from xml.sax.saxutils import quoteattr
 
 from .action import Action
+from .app import content_etag
+from .cache import ResponseCache
 from .model import Typedef, TypeStruct, TypeEnum, TypeArray, TypeDict
 
 
 _RE_WHITESPACE_CLEANUP = re.compile(r'\s{2,}')
 
 
+# The maximum number of rendered documentation pages cached per documentation request
+DOC_PAGE_CACHE_SIZE = 256
+
+# The approximate size of streamed documentation page content blocks
+DOC_BLOCK_SIZE = 32768
+
+
 class DocAction(Action):
     """
     Chisel documentation request
     """
 
-    __slots__ = ()
+    __slots__ = ('page_cache', '_page_cache_generation')
 
     def __init__(self, name='doc', urls=None, doc=None, doc_group=None):
         Action.__init__(self, self._action_callback, name=name, method='GET', urls=urls, doc=doc, doc_group=doc_group,
@@ -52,18 +61,18 @@ action {name}
     # Remove navigation links.
     optional bool nonav
 '''.format(name=name))
+        self.page_cache = ResponseCache(max_size=DOC_PAGE_CACHE_SIZE)
+        self._page_cache_generation = None
 
-    @staticmethod
-    def _action_callback(ctx, req):
+    def _action_callback(self, ctx, req):
         request_name = req.get('name')
         if request_name is None:
-            root = _index_html(ctx.environ, sorted(ctx.app.requests.values(), key=lambda x: x.name.lower()))
-            content = root.serialize(indent='  ' if ctx.app.pretty_output else '')
-            return ctx.response_text('200 OK', content, content_type='text/html')
+            return _doc_page_response(self, ctx, (None, None), lambda: _index_html(
+                ctx.environ, sorted(ctx.app.requests.values(), key=lambda x: x.name.lower())))
         elif request_name in ctx.app.requests:
-            root = _request_html(ctx.environ, ctx.app.requests[request_name], req.get('nonav'))
-            content = root.serialize(indent='  ' if ctx.app.pretty_output else '')
-            return ctx.response_text('200 OK', content, content_type='text/html')
+            nonav = bool(req.get('nonav'))
+            return _doc_page_response(self, ctx, (request_name, nonav), lambda: _request_html(
+                ctx.environ, ctx.app.requests[request_name], nonav))
         else:
             return ctx.response_text('404 Not Found', 'Unknown Request')
 
@@ -73,7 +82,7 @@ class DocPage(Action):
     Chisel single-request documentation request
     """
 
-    __slots__ = ('request')
+    __slots__ = ('request', 'page_cache', '_page_cache_generation')
 
     def __init__(self, request, name=None, urls=None, doc=None, doc_group=None):
         request_name = request.name
@@ -85,11 +94,46 @@ class DocPage(Action):
 action {name}
 '''.format(name=name, request_name=request_name))
         self.request = request
+        self.page_cache = ResponseCache(max_size=DOC_PAGE_CACHE_SIZE)
+        self._page_cache_generation = None
 
     def _action_callback(self, ctx, dummy_req):
-        root = _request_html(ctx.environ, self.request, nonav=True)
-        content = root.serialize(indent='  ' if ctx.app.pretty_output else '')
-        return ctx.response_text('200 OK', content, content_type='text/html')
+        return _doc_page_response(self, ctx, (self.request.name, True), lambda: _request_html(
+            ctx.environ, self.request, nonav=True))
+
+
+def _doc_page_response(doc_request, ctx, page_key, fn_root):
+    app = ctx.app
+    environ = ctx.environ
+
+    # Clear the page cache if the application's requests have changed
+    page_cache = doc_request.page_cache
+    if doc_request._page_cache_generation != app.request_generation: # pylint: disable=protected-access
+        page_cache.clear()
+        doc_request._page_cache_generation = app.request_generation # pylint: disable=protected-access
+
+    # Cached page? The page depends on the root URL and host.
+    cache_key = (page_key, app.pretty_output, environ.get('SCRIPT_NAME'), environ.get('PATH_INFO'),
+                 environ.get('HTTP_HOST') or (environ.get('SERVER_NAME'), environ.get('SERVER_PORT')))
+    # The page's entity tag is computed when the page is cached - streamed pages have no entity tag.
+    cached_page = page_cache.get(cache_key)
+    if cached_page is not None:
+        blocks, etag = cached_page
+        return ctx.response('200 OK', 'text/html', blocks, headers=[('ETag', etag)] if app.etag else None)
+
+    # Stream the rendered page
+    root = fn_root()
+    return ctx.response('200 OK', 'text/html', _doc_page_stream(page_cache, cache_key, root, '  ' if app.pretty_output else ''))
+
+
+def _doc_page_stream(page_cache, cache_key, root, indent):
+    blocks = []
+    for block in root.serialize_blocks(indent=indent):
+        blocks.append(block)
+        yield block
+
+    # Cache the completely-rendered page and its entity tag
+    page_cache.set(cache_key, (blocks, content_etag(blocks)))
 
 
 class Element(object):
@@ -112,6 +156,22 @@ class Element(object):
     def serialize(self, indent='  ', html=True):
         return ''.join(chain(['<!doctype html>\n'] if html else [], self.serialize_chunks(indent=indent)))
 
+    def serialize_blocks(self, indent='  ', html=True, encoding='utf-8', block_size=DOC_BLOCK_SIZE):
+        """
+        Generate the encoded serialization in blocks of approximately block_size characters
+        """
+        chunks = []
+        chunks_size = 0
+        for chunk in chain(['<!doctype html>\n'] if html else [], self.serialize_chunks(indent=indent)):
+            chunks.append(chunk)
+            chunks_size += len(chunk)
+            if chunks_size >= block_size:
+                yield ''.join(chunks).encode(encoding)
+                chunks = []
+                chunks_size = 0
+        if chunks:
+            yield ''.join(chunks).encode(encoding)
+
     def serialize_chunks(self, indent='  ', indent_index=0, inline=False):
 
         # Initial newline and indent as necessary...
@@ -412,14 +472,15 @@ def _typedef_section(type_):
 
 
 def _struct_section(type_, title_tag, title, empty_doc):
-    attrs_elements = {member.name: _type_attr(member.type, member.attr, member.optional, member.nullable) for member in type_.members()}
+    members = tuple(type_.members())
+    attrs_elements = {member.name: _type_attr(member.type, member.attr, member.optional, member.nullable) for member in members}
     no_attrs = not any(attrs_elements.values())
-    no_description = not any(member.doc for member in type_.members())
+    no_description = not any(member.doc for member in members)
     return [
         Element(title_tag, inline=True, _id=type_.type_name,
                 children=Element('a', _class='linktarget', children=Element(title, text=True))),
         _doc_text(type_.doc),
-        _doc_text(empty_doc) if not any(type_.members()) else Element('table', children=[
+        _doc_text(empty_doc) if not members else Element('table', children=[
             Element('tr', children=[
                 Element('th', inline=True, children=Element('Name', text=True)),
                 Element('th', inline=True, children=Element('Type', text=True)),
@@ -432,7 +493,7 @@ def _struct_section(type_, title_tag, title, empty_doc):
                     Element('td', inline=True, children=_type_decl(member.type)),
                     None if no_attrs else Element('td', children=attrs_elements[member.name]),
                     None if no_description else Element('td', children=_doc_text(member.doc))
-                ]) for member in type_.members()
+                ]) for member in members
             ]
         ])
     ]
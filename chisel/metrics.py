@@ -0,0 +1,143 @@
+#
+# Copyright (C) 2012-2016 Craig Hobbs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+from bisect import bisect_left
+from threading import Lock
+
+from .app_defs import ENVIRON_CTX
+from .request import Request
+from .url import decode_query_string
+
+
+# The default latency histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1., 2.5, 5., 10.)
+
+
+class Metrics(object):
+    """
+    Per-request count, status class, and latency histogram metrics collector
+
+    Metrics are recorded to a single dict under a lock that is only held to update a request's entry, so the metrics
+    memory is bounded by the number of request names regardless of the number of threads.
+    """
+
+    __slots__ = ('buckets', '_entries', '_lock')
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._entries = {}
+        self._lock = Lock()
+
+    def record(self, request_name, status, seconds):
+        """
+        Record a request's response status string (e.g. "200 OK") and latency
+        """
+        bucket_index = bisect_left(self.buckets, seconds)
+        status_class = status[:1] + 'xx'
+
+        # Entry is [count, latency sum, bucket counts, status class counts]
+        with self._lock:
+            entry = self._entries.get(request_name)
+            if entry is None:
+                entry = self._entries[request_name] = [0, 0., [0] * (len(self.buckets) + 1), {}]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2][bucket_index] += 1
+            entry[3][status_class] = entry[3].get(status_class, 0) + 1
+
+    def snapshot(self):
+        """
+        Get the merged metrics dict, keyed by request name
+        """
+        with self._lock:
+            entries = [(request_name, entry[0], entry[1], list(entry[2]), dict(entry[3]))
+                       for request_name, entry in self._entries.items()]
+
+        # Convert the bucket counts to cumulative (upper bound, count) pairs
+        snapshot = {}
+        for request_name, count, seconds, bucket_counts, status_counts in entries:
+            cumulative = 0
+            buckets = []
+            for bucket, bucket_count in zip(self.buckets + (None,), bucket_counts):
+                cumulative += bucket_count
+                buckets.append([bucket, cumulative])
+            snapshot[request_name] = {
+                'count': count,
+                'sum': seconds,
+                'buckets': buckets,
+                'status': status_counts
+            }
+
+        return snapshot
+
+    def prometheus(self):
+        """
+        Get the metrics in Prometheus text exposition format
+        """
+        snapshot = sorted(self.snapshot().items())
+        lines = [
+            '# HELP chisel_requests_total Total requests by request name and response status class.',
+            '# TYPE chisel_requests_total counter'
+        ]
+        for request_name, metrics in snapshot:
+            for status_class, status_count in sorted(metrics['status'].items()):
+                lines.append('chisel_requests_total{{request="{0}",status="{1}"}} {2}'.format(
+                    _prometheus_label(request_name), status_class, status_count))
+        lines.append('# HELP chisel_request_duration_seconds Request latency by request name.')
+        lines.append('# TYPE chisel_request_duration_seconds histogram')
+        for request_name, metrics in snapshot:
+            label = _prometheus_label(request_name)
+            for bucket, bucket_count in metrics['buckets']:
+                lines.append('chisel_request_duration_seconds_bucket{{request="{0}",le="{1}"}} {2}'.format(
+                    label, '+Inf' if bucket is None else repr(float(bucket)), bucket_count))
+            lines.append('chisel_request_duration_seconds_sum{{request="{0}"}} {1!r}'.format(label, metrics['sum']))
+            lines.append('chisel_request_duration_seconds_count{{request="{0}"}} {1}'.format(label, metrics['count']))
+        return '\n'.join(lines) + '\n'
+
+
+def _prometheus_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsRequest(Request):
+    """
+    Chisel metrics request - Prometheus text format by default, or JSON with the "format=json" query string
+    """
+
+    __slots__ = ()
+
+    def __init__(self, name='metrics', urls=None, doc=None, doc_group=None):
+        Request.__init__(self, name=name, method='GET', urls=urls, doc=doc, doc_group=doc_group)
+
+    def __call__(self, environ, start_response):
+        ctx = environ[ENVIRON_CTX]
+        metrics = ctx.app.metrics
+        if metrics is None:
+            return ctx.response_text('404 Not Found', 'Metrics Not Enabled')
+
+        try:
+            response_format = decode_query_string(environ.get('QUERY_STRING', '')).get('format')
+        except ValueError:
+            response_format = None
+        if response_format == 'json':
+            return ctx.response_json('200 OK', metrics.snapshot())
+        return ctx.response_text('200 OK', metrics.prometheus(), content_type='text/plain; version=0.0.4')
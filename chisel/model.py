@@ -191,24 +191,69 @@ class StructMember(object):
 
 # Struct type
 class TypeStruct(object):
-    __slots__ = ('type_name', 'union', 'base_types', '_members', 'doc')
+    __slots__ = ('type_name', 'union', 'base_types', '_members', '_members_own', '_members_flat', '_members_index',
+                 '_members_deps', '_generation', 'doc')
 
     def __init__(self, type_name=None, union=False, base_types=None, doc=None):
         self.type_name = ('union' if union else 'struct') if type_name is None else type_name
         self.union = union
         self.base_types = base_types
         self._members = []
+        self._members_own = {}
+        self._members_flat = None
+        self._members_index = None
+        self._members_deps = ()
+        self._generation = 0
         self.doc = [] if doc is None else doc
 
+    # The flattened member tables are only valid while neither this struct nor its base structs have changed
+    def _members_valid(self):
+        return self._members_flat is not None and \
+            all(struct_type._generation == generation for struct_type, generation in self._members_deps)
+
+    def _base_structs(self):
+        yield self
+        if self.base_types is not None:
+            for base_type in self.base_types:
+                if base_type:
+                    yield from Typedef.base_type(base_type)._base_structs() # pylint: disable=protected-access
+
     def members(self, include_base_types=True):
+        if include_base_types and self._members_valid():
+            return iter(self._members_flat)
         return iter(self._members) if self.base_types is None or not include_base_types else \
             chain(chain.from_iterable(Typedef.base_type(base_type).members() for base_type in self.base_types if base_type), self._members)
 
+    def member(self, name, include_base_types=True):
+        if not include_base_types:
+            return self._members_own.get(name)
+        if self._members_valid():
+            return self._members_index.get(name)
+        return next((member for member in self.members() if member.name == name), None)
+
     def add_member(self, name, type_, optional=False, nullable=False, attr=None, doc=None):
         member = StructMember(name, type_, optional or self.union, nullable, attr, doc)
         self._members.append(member)
+        self._members_own.setdefault(name, member)
+        self._members_flat = None
+        self._members_index = None
+        self._generation += 1
         return member
 
+    def finalize(self):
+        """
+        Compute the flattened member tables - call once the base types are resolved
+        """
+        self._members_flat = None
+        members_flat = tuple(self.members())
+        members_index = {}
+        for member in members_flat:
+            members_index.setdefault(member.name, member)
+        self._members_flat = members_flat
+        self._members_index = members_index
+        self._members_deps = tuple((struct_type, struct_type._generation) # pylint: disable=protected-access
+                                   for struct_type in self._base_structs())
+
     @staticmethod
     def validate_attr(attr):
         attr.validate_attr()
@@ -233,7 +278,8 @@ class TypeStruct(object):
 
         # Validate all member values
         member_count = 0
-        for member in self.members():
+        members_valid = self._members_valid()
+        for member in (self._members_flat if members_valid else self.members()):
             member_name = member.name
             if member_name not in value_x:
                 if not member.optional:
@@ -254,7 +300,7 @@ class TypeStruct(object):
 
         # Any unknown members?
         if member_count != len(value_x):
-            member_set = {member.name for member in self.members()}
+            member_set = self._members_index if members_valid else {member.name for member in self.members()}
             unknown_value_names = [value_name for value_name in value_x.keys() if value_name not in member_set]
             raise ValidationError("Unknown member '" + ValidationError.member_syntax((_member, unknown_value_names[0])) + "'")
 
@@ -373,23 +419,60 @@ class EnumValue(object):
 
 
 class TypeEnum(object):
-    __slots__ = ('type_name', 'base_types', '_values', 'doc')
+    __slots__ = ('type_name', 'base_types', '_values', '_values_own', '_values_set', '_values_deps', '_generation', 'doc')
 
     def __init__(self, type_name='enum', base_types=None, doc=None):
         self.type_name = type_name
         self.base_types = base_types
         self._values = []
+        self._values_own = set()
+        self._values_set = None
+        self._values_deps = ()
+        self._generation = 0
         self.doc = [] if doc is None else doc
 
+    def _base_enums(self):
+        yield self
+        if self.base_types is not None:
+            for base_type in self.base_types:
+                if base_type:
+                    yield from Typedef.base_type(base_type)._base_enums() # pylint: disable=protected-access
+
     def values(self, include_base_types=True):
         return iter(self._values) if self.base_types is None or not include_base_types else \
             chain(chain.from_iterable(Typedef.base_type(base_type).values() for base_type in self.base_types if base_type), self._values)
 
+    def has_value(self, value, include_base_types=True):
+        if include_base_types:
+            # The value set is only valid while neither this enum nor its base enums have changed
+            values_set = self._values_set
+            if values_set is None or any(enum_type._generation != generation # pylint: disable=protected-access
+                                         for enum_type, generation in self._values_deps):
+                values_set = self.finalize()
+        else:
+            values_set = self._values_own
+        try:
+            return value in values_set
+        except TypeError:
+            return False
+
     def add_value(self, string, doc=None):
         value = EnumValue(string, doc)
         self._values.append(value)
+        self._values_own.add(string)
+        self._values_set = None
+        self._generation += 1
         return value
 
+    def finalize(self):
+        """
+        Compute the enumeration value set, including base type values - call once the base types are resolved
+        """
+        values_set = frozenset(value.value for value in self.values())
+        self._values_deps = tuple((enum_type, enum_type._generation) for enum_type in self._base_enums()) # pylint: disable=protected-access
+        self._values_set = values_set
+        return values_set
+
     @staticmethod
     def validate_attr(attr):
         attr.validate_attr()
@@ -397,7 +480,7 @@ class TypeEnum(object):
     def validate(self, value, dummy_mode=VALIDATE_DEFAULT, _member=()):
 
         # Validate the value
-        if value not in self.values():
+        if not self.has_value(value):
             raise ValidationError.member_error(self, value, _member)
 
         return value
@@ -409,6 +492,9 @@ class _TypeString(object):
 
     type_name = 'string'
 
+    def __reduce__(self):
+        return 'TYPE_STRING'
+
     @staticmethod
     def validate_attr(attr):
         attr.validate_attr(allow_length=True)
@@ -430,6 +516,9 @@ class _TypeInt(object):
 
     type_name = 'int'
 
+    def __reduce__(self):
+        return 'TYPE_INT'
+
     @staticmethod
     def validate_attr(attr):
         attr.validate_attr(allow_value=True)
@@ -462,6 +551,9 @@ class _TypeFloat(object):
 
     type_name = 'float'
 
+    def __reduce__(self):
+        return 'TYPE_FLOAT'
+
     @staticmethod
     def validate_attr(attr):
         attr.validate_attr(allow_value=True)
@@ -494,6 +586,9 @@ class _TypeBool(object):
 
     type_name = 'bool'
 
+    def __reduce__(self):
+        return 'TYPE_BOOL'
+
     VALUES = {
         'true': True,
         'false': False
@@ -525,6 +620,9 @@ class _TypeUuid(object):
 
     type_name = 'uuid'
 
+    def __reduce__(self):
+        return 'TYPE_UUID'
+
     @staticmethod
     def validate_attr(attr):
         attr.validate_attr()
@@ -551,6 +649,9 @@ class _TypeDate(object):
 
     type_name = 'date'
 
+    def __reduce__(self):
+        return 'TYPE_DATE'
+
     @staticmethod
     def validate_attr(attr):
         attr.validate_attr()
@@ -577,6 +678,9 @@ class _TypeDatetime(object):
 
     type_name = 'datetime'
 
+    def __reduce__(self):
+        return 'TYPE_DATETIME'
+
     @staticmethod
     def validate_attr(attr):
         attr.validate_attr()
@@ -606,6 +710,9 @@ class _TypeObject(object):
 
     type_name = 'object'
 
+    def __reduce__(self):
+        return 'TYPE_OBJECT'
+
     @staticmethod
     def validate_attr(attr):
         attr.validate_attr()
@@ -0,0 +1,185 @@
+#
+# Copyright (C) 2012-2016 Craig Hobbs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+import re
+from urllib.parse import unquote
+
+
+# Regular expression for matching URL arguments
+RE_URL_ARG = re.compile(r'/\{([A-Za-z]\w*)\}')
+_RE_SEGMENT_ARG = re.compile(r'^\{([A-Za-z]\w*)\}(.*)$', re.DOTALL)
+
+
+class _RouterNode(object):
+    __slots__ = ('static', 'arg', 'patterns', 'routes')
+
+    def __init__(self):
+        self.static = {}
+        self.arg = None
+        self.patterns = None
+        self.routes = None
+
+
+class Router(object):
+    """
+    Chisel URL router
+
+    Exact URLs are matched with a single dictionary lookup. URLs with arguments (e.g. "/thing/{id}") are compiled into a
+    segment trie so that matching time is proportional to the path depth rather than the number of routes.
+    """
+
+    __slots__ = ('_urls', '_url_methods', '_root', '_route_count')
+
+    def __init__(self):
+        self._urls = {}
+        self._url_methods = {}
+        self._root = _RouterNode()
+        self._route_count = 0
+
+    def add(self, method, url, request):
+        """
+        Add a request URL - a method of None matches any request method
+        """
+
+        # URL with arguments?
+        if RE_URL_ARG.search(url):
+            node = self._root
+            arg_names = []
+            for ix_segment, segment in enumerate(url.split('/')):
+                match_arg = _RE_SEGMENT_ARG.match(segment) if ix_segment else None
+                if match_arg is None:
+                    node_next = node.static.get(segment)
+                    if node_next is None:
+                        node_next = node.static[segment] = _RouterNode()
+                    node = node_next
+                elif not match_arg.group(2):
+                    if node.arg is None:
+                        node.arg = _RouterNode()
+                    node = node.arg
+                    arg_names.append(match_arg.group(1))
+                else:
+                    if node.patterns is None:
+                        node.patterns = []
+                    suffix = match_arg.group(2)
+                    node_next = next((node_pattern for suffix_pattern, dummy_regex, node_pattern in node.patterns
+                                      if suffix_pattern == suffix), None)
+                    if node_next is None:
+                        node_next = _RouterNode()
+                        node.patterns.append((suffix, re.compile('([^/]+)' + re.escape(suffix) + r'\Z'), node_next))
+                    node = node_next
+                    arg_names.append(match_arg.group(1))
+
+            # The first request added for a method and URL takes precedence
+            if node.routes is None:
+                node.routes = {}
+            if method not in node.routes:
+                node.routes[method] = (self._route_count, request, tuple(arg_names))
+            self._route_count += 1
+
+        else:
+            request_key = (method, url)
+            if request_key in self._urls:
+                raise Exception('Redefinition of request URL "{0}"'.format(url))
+            self._urls[request_key] = request
+            self._url_methods[url] = self._url_methods.get(url, frozenset()) | {method}
+
+    def match(self, method, path):
+        """
+        Match a request method and path - returns a tuple of the matched request and the URL arguments dict (or None)
+
+        Method-specific URLs are matched before method-less URLs. Exact URLs are matched before URLs with arguments, and
+        URLs with arguments are matched in the order they were added.
+        """
+
+        # Exact method-specific match?
+        request = self._urls.get((method, path))
+        if request is not None:
+            return request, None
+
+        # Match URLs with arguments
+        route_method, route_any = None, None
+        for routes, arg_values in self._match_routes(path):
+            route = routes.get(method)
+            if route is not None and (route_method is None or route[0] < route_method[0][0]):
+                route_method = (route, arg_values)
+            route = routes.get(None)
+            if route is not None and (route_any is None or route[0] < route_any[0][0]):
+                route_any = (route, arg_values)
+        if route_method is not None:
+            return self._route_result(*route_method)
+
+        # Exact method-less match?
+        request = self._urls.get((None, path))
+        if request is not None:
+            return request, None
+
+        if route_any is not None:
+            return self._route_result(*route_any)
+        return None, None
+
+    def allowed_methods(self, path):
+        """
+        Returns the set of request methods with a URL matching the path (None matches any method)
+        """
+        methods = self._url_methods.get(path, frozenset())
+        for routes, dummy_arg_values in self._match_routes(path):
+            methods = methods.union(routes)
+        return methods
+
+    @staticmethod
+    def _route_result(route, arg_values):
+        dummy_index, request, arg_names = route
+        return request, {unquote(arg_name): unquote(arg_value) for arg_name, arg_value in zip(arg_names, arg_values)}
+
+    def _match_routes(self, path):
+        matches = []
+        if self._route_count == 0:
+            return matches
+        segments = path.split('/')
+        count_segments = len(segments)
+        arg_values = []
+
+        def match_node(node, ix_segment):
+            if ix_segment == count_segments:
+                if node.routes is not None:
+                    matches.append((node.routes, tuple(arg_values)))
+                return
+
+            segment = segments[ix_segment]
+            node_static = node.static.get(segment)
+            if node_static is not None:
+                match_node(node_static, ix_segment + 1)
+            if segment:
+                if node.arg is not None:
+                    arg_values.append(segment)
+                    match_node(node.arg, ix_segment + 1)
+                    arg_values.pop()
+                if node.patterns is not None:
+                    for dummy_suffix, regex, node_pattern in node.patterns:
+                        match_pattern = regex.match(segment)
+                        if match_pattern is not None:
+                            arg_values.append(match_pattern.group(1))
+                            match_node(node_pattern, ix_segment + 1)
+                            arg_values.pop()
+
+        match_node(self._root, 0)
+        return matches
@@ -0,0 +1,160 @@
+#
+# Copyright (C) 2012-2016 Craig Hobbs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+import os
+from queue import Full, Queue
+import signal
+import sys
+from threading import Thread
+import time
+from wsgiref.simple_server import WSGIServer
+
+
+# The minimum pre-fork worker lifetime, in seconds, before a worker is restarted without delay
+PREFORK_RESTART_DELAY = 1.0
+
+
+def serve_prefork(server, workers):
+    """
+    Serve requests from pre-forked worker processes that share the server's listening socket
+
+    Workers that exit are restarted. On SIGINT or SIGTERM the workers are stopped and the function returns once all
+    workers have exited. Workers finish their in-flight requests before exiting.
+    """
+
+    children = {}
+    stopping = False
+
+    def worker_stop(dummy_signum, dummy_frame):
+        # The server must be shutdown from another thread - serve_forever returns once the current request is handled
+        Thread(target=server.shutdown, daemon=True).start()
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            # Worker process - the parent handles interrupts
+            exit_code = 0
+            try:
+                signal.signal(signal.SIGINT, signal.SIG_IGN)
+                signal.signal(signal.SIGTERM, worker_stop)
+                server.serve_forever()
+            except: # pylint: disable=bare-except
+                exit_code = 1
+            finally:
+                os._exit(exit_code) # pylint: disable=protected-access
+        children[pid] = time.time()
+
+    def stop(dummy_signum, dummy_frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+
+    signal_int = signal.signal(signal.SIGINT, stop)
+    signal_term = signal.signal(signal.SIGTERM, stop)
+    try:
+        # Start the workers
+        for _ in range(workers):
+            spawn()
+
+        # Restart workers that exit until stopped
+        while children:
+            try:
+                pid, dummy_status = os.wait()
+            except ChildProcessError:
+                break
+            start_time = children.pop(pid, None)
+            if start_time is not None and not stopping:
+                print('worker {0} exited - restarting...'.format(pid), file=sys.stderr)
+                if time.time() - start_time < PREFORK_RESTART_DELAY:
+                    time.sleep(PREFORK_RESTART_DELAY)
+                if not stopping:
+                    spawn()
+    finally:
+        signal.signal(signal.SIGINT, signal_int)
+        signal.signal(signal.SIGTERM, signal_term)
+        server.server_close()
+
+
+class ThreadPoolWSGIServer(WSGIServer):
+    """
+    WSGI server that handles connections from a fixed-size thread pool
+
+    Accepted connections wait in a bounded queue for a free thread. When the queue is full, the connection is immediately
+    sent a "503 Service Unavailable" response and closed. The threads are started by serve_forever so that the server
+    may be shared by pre-forked worker processes.
+    """
+
+    def __init__(self, server_address, RequestHandlerClass, threads=8, queue_size=None): # pylint: disable=invalid-name
+        WSGIServer.__init__(self, server_address, RequestHandlerClass)
+        self.threads = threads
+        self.queue_size = threads if queue_size is None else queue_size
+        self.requests_shed = 0
+        self._queue = None
+        self._threads = []
+
+    def serve_forever(self, poll_interval=0.5):
+        self._queue = Queue(maxsize=self.queue_size)
+        self._threads = [Thread(target=self._worker, daemon=True) for _ in range(self.threads)]
+        for thread in self._threads:
+            thread.start()
+        try:
+            WSGIServer.serve_forever(self, poll_interval=poll_interval)
+        finally:
+            for _ in self._threads:
+                self._queue.put(None)
+            for thread in self._threads:
+                thread.join()
+            self._threads = []
+
+    def process_request(self, request, client_address):
+        try:
+            self._queue.put_nowait((request, client_address))
+        except Full:
+            self.requests_shed += 1
+            try:
+                request.sendall(b'HTTP/1.0 503 Service Unavailable\r\n'
+                                b'Content-Type: text/plain\r\n'
+                                b'Content-Length: 19\r\n'
+                                b'Retry-After: 1\r\n'
+                                b'Connection: close\r\n'
+                                b'\r\n'
+                                b'Service Unavailable')
+            except OSError:
+                pass
+            self.shutdown_request(request)
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception: # pylint: disable=broad-except
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
@@ -20,9 +20,21 @@
 # SOFTWARE.
 #
 
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import gc
+from hashlib import sha1
+from io import BytesIO
 from itertools import chain
+import logging
+import marshal
+from multiprocessing import cpu_count
+import os
+import pickle
 import re
+import stat
 
+from . import __version__ as CHISEL_VERSION
 from .model import AttributeValidationError, StructMemberAttributes, TypeArray, \
     TYPE_BOOL, TYPE_DATE, TYPE_DATETIME, Typedef, TypeDict, TypeEnum, TYPE_INT, \
     TYPE_FLOAT, TYPE_OBJECT, TYPE_STRING, TypeStruct, TYPE_UUID
@@ -83,6 +95,153 @@ _RE_MEMBER = re.compile(r'^\s+(?P<optional>optional\s+)?(?P<nullable>nullable\s+
 _RE_VALUE = re.compile(r'^\s+"?(?P<id>(?<!")' + _RE_PART_ID + r'(?!")|(?<=").*?(?="))"?\s*$')
 
 
+# Spec language token kinds
+_TOKEN_DOC = 0
+_TOKEN_GROUP = 1
+_TOKEN_ACTION = 2
+_TOKEN_DEFINITION = 3
+_TOKEN_SECTION = 4
+_TOKEN_VALUE = 5
+_TOKEN_MEMBER = 6
+_TOKEN_TYPEDEF = 7
+_TOKEN_SYNTAX_ERROR = 8
+
+# Spec language line regexes by top-level line keyword - only these regexes can match a top-level line
+_TOKEN_KEYWORD_REGEXES = {
+    'group': ((_TOKEN_GROUP, _RE_GROUP),),
+    'action': ((_TOKEN_ACTION, _RE_ACTION),),
+    'struct': ((_TOKEN_DEFINITION, _RE_DEFINITION),),
+    'union': ((_TOKEN_DEFINITION, _RE_DEFINITION),),
+    'enum': ((_TOKEN_DEFINITION, _RE_DEFINITION),),
+    'typedef': ((_TOKEN_TYPEDEF, _RE_TYPEDEF),)
+}
+
+# Spec language line regexes for indented lines (enum values and struct members are mutually exclusive)
+_TOKEN_SECTION_KEYWORDS = ('input', 'output', 'errors')
+_TOKEN_SECTION_REGEXES = ((_TOKEN_SECTION, _RE_SECTION), (_TOKEN_VALUE, _RE_VALUE), (_TOKEN_MEMBER, _RE_MEMBER))
+_TOKEN_MEMBER_REGEXES = ((_TOKEN_MEMBER, _RE_MEMBER), (_TOKEN_VALUE, _RE_VALUE))
+_TOKEN_VALUE_REGEXES = ((_TOKEN_VALUE, _RE_VALUE),)
+
+
+def tokenize_spec(lines):
+    """
+    Tokenize a collection of spec lines (e.g an input stream) into a list of (line number, token kind, token) tuples
+
+    Each line is dispatched by its leading keyword to the only line regexes that can match it. Tokenizing does not depend
+    on any other spec, so spec files may be tokenized in parallel. The token list is picklable.
+    """
+    tokens = []
+    linenum = 0
+    line_continuation = []
+    for line_part in chain(lines, ('',)):
+        linenum += 1
+
+        # Line continuation?
+        line_part_no_continuation = _RE_LINE_CONT.sub('', line_part) if '\\' in line_part else line_part
+        if line_continuation or line_part_no_continuation is not line_part:
+            line_continuation.append(line_part_no_continuation)
+        if line_part_no_continuation is not line_part:
+            continue
+        elif line_continuation:
+            line = ''.join(line_continuation)
+            del line_continuation[:]
+        else:
+            line = line_part
+
+        # Comment?
+        line_stripped = line.lstrip()
+        if not line_stripped or line_stripped[0] == '#':
+            match = _RE_COMMENT.match(line)
+            if match:
+                doc_string = match.group('doc')
+                if doc_string is not None:
+                    tokens.append((linenum, _TOKEN_DOC, doc_string.strip()))
+                continue
+
+        # Dispatch the line by its keyword
+        if len(line_stripped) == len(line):
+            line_words = line.split(None, 1)
+            token_regexes = _TOKEN_KEYWORD_REGEXES.get(line_words[0], ()) if line_words else ()
+        elif line_stripped.startswith('"'):
+            token_regexes = _TOKEN_VALUE_REGEXES
+        elif line_stripped.startswith(_TOKEN_SECTION_KEYWORDS):
+            token_regexes = _TOKEN_SECTION_REGEXES
+        else:
+            token_regexes = _TOKEN_MEMBER_REGEXES
+
+        # Match the line's token kind
+        for token_kind, token_regex in token_regexes:
+            match = token_regex.match(line)
+            if match:
+                tokens.append((linenum, token_kind, match.groupdict()))
+                break
+        else:
+            tokens.append((linenum, _TOKEN_SYNTAX_ERROR, None))
+
+    return tokens
+
+
+def tokenize_spec_file(spec_path):
+    """
+    Tokenize a spec file (see tokenize_spec)
+    """
+    with open(spec_path, 'r') as spec_file:
+        return tokenize_spec(spec_file)
+
+
+# The minimum total size of spec files tokenized in a process pool - the process pool's startup and result transfer costs
+# more than tokenizing smaller spec file sets serially (see "python -m chisel.bench.spec_files")
+SPEC_PARALLEL_MIN_SIZE = 4 << 20
+
+
+def tokenize_spec_files(spec_paths, workers=None):
+    """
+    Tokenize a sequence of spec files and return the list of token lists - if workers is greater than one, the files are
+    tokenized in a process pool of up to workers processes (one per CPU) if their total size is at least
+    SPEC_PARALLEL_MIN_SIZE
+    """
+    spec_paths = list(spec_paths)
+    workers = min(workers or 1, cpu_count(), len(spec_paths))
+    if workers > 1 and sum(os.path.getsize(spec_path) for spec_path in spec_paths) >= SPEC_PARALLEL_MIN_SIZE:
+        return tokenize_spec_files_parallel(spec_paths, workers)
+    return [tokenize_spec_file(spec_path) for spec_path in spec_paths]
+
+
+def tokenize_spec_files_parallel(spec_paths, workers):
+    """
+    Tokenize a sequence of spec files in a process pool and return the list of token lists
+    """
+
+    # Each worker tokenizes one contiguous batch of files
+    spec_paths = list(spec_paths)
+    batch_size = -(-len(spec_paths) // workers)
+    spec_batches = [spec_paths[ix:ix + batch_size] for ix in range(0, len(spec_paths), batch_size)]
+    with ProcessPoolExecutor(max_workers=len(spec_batches)) as executor:
+        gc_enabled = gc.isenabled()
+        try:
+            # Garbage collection is disabled while loading the tokens - it only slows down creating the many token objects
+            gc.disable()
+            return list(chain.from_iterable(marshal.loads(tokens_data)
+                                            for tokens_data in executor.map(_tokenize_spec_batch, spec_batches)))
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+
+def _tokenize_spec_batch(spec_paths):
+    # The tokens are returned marshalled - they are only tuples, dicts, strings, and ints, which marshal loads much faster
+    # than pickle
+    return marshal.dumps([tokenize_spec_file(spec_path) for spec_path in spec_paths])
+
+
+def spec_token_names(tokens):
+    """
+    Get the set of the type and action names defined by a list of spec tokens
+    """
+    return {token['id'] for dummy_linenum, token_kind, token in tokens
+            if token_kind == _TOKEN_ACTION or token_kind == _TOKEN_DEFINITION or token_kind == _TOKEN_TYPEDEF}
+
+
 # Built-in types
 _TYPES = {
     'bool': TYPE_BOOL,
@@ -96,13 +255,50 @@ _TYPES = {
 }
 
 
+# Parsed spec cache file format version
+SPEC_CACHE_VERSION = 1
+
+# Spec cache logger
+_LOG = logging.getLogger(__name__)
+
+
+def spec_cache_key(spec_paths):
+    """
+    Compute the parsed spec cache key for a sequence of spec file paths from each file's path, size, modification time,
+    and content hash
+    """
+    files = []
+    for spec_path in spec_paths:
+        with open(spec_path, 'rb') as spec_file:
+            spec_stat = os.fstat(spec_file.fileno())
+            content_hash = sha1(spec_file.read()).hexdigest()
+        files.append((os.path.abspath(spec_path), spec_stat.st_size, spec_stat.st_mtime_ns, content_hash))
+    return (SPEC_CACHE_VERSION, CHISEL_VERSION, tuple(files))
+
+
+# The globals that may be loaded from a parsed spec cache file
+_SPEC_CACHE_GLOBALS = frozenset(chain(
+    (('chisel.model', name) for name in ('EnumValue', 'StructMember', 'StructMemberAttributes', 'TypeArray', 'TypeDict',
+                                         'TypeEnum', 'TypeStruct', 'Typedef', 'TYPE_BOOL', 'TYPE_DATE', 'TYPE_DATETIME',
+                                         'TYPE_FLOAT', 'TYPE_INT', 'TYPE_OBJECT', 'TYPE_STRING', 'TYPE_UUID')),
+    (('chisel.spec', 'ActionModel'),)
+))
+
+
+class _SpecCacheUnpickler(pickle.Unpickler):
+    # Only the spec model classes may be loaded from a spec cache file - nothing else can be called while unpickling
+    def find_class(self, module, name):
+        if (module, name) not in _SPEC_CACHE_GLOBALS:
+            raise pickle.UnpicklingError("Unexpected global '{0}.{1}'".format(module, name))
+        return pickle.Unpickler.find_class(self, module, name)
+
+
 # Specification language parser class
 class SpecParser(object):
     __slots__ = (
         'types',
         'actions',
         'errors',
-        '_parse_lines',
         '_parse_filename',
         '_parse_linenum',
         '_action',
@@ -125,7 +321,6 @@ class SpecParser(object):
         self._type = None
         self._doc = None
         self._doc_group = None
-        self._parse_lines = None
         self._parse_filename = None
         self._parse_linenum = 0
         if spec is not None:
@@ -137,18 +332,32 @@ class SpecParser(object):
 
     # Parse a specification from a collection of spec lines (e.g an input stream)
     def parse(self, lines, filename='', finalize=True):
+        self.parse_tokens(tokenize_spec(lines), filename=filename, finalize=finalize)
+
+    # Parse a specification from a list of spec tokens (see tokenize_spec)
+    def parse_tokens(self, tokens, filename='', finalize=True):
 
         # Set the parser state
         self._action = None
         self._type = None
         self._doc = []
         self._doc_group = None
-        self._parse_lines = lines
         self._parse_filename = filename
         self._parse_linenum = 0
 
         # Do the work
-        self._parse()
+        self._parse(tokens)
+        if finalize:
+            self.finalize()
+
+    # Parse specification files - if workers is greater than one, large spec file sets are tokenized in a process pool
+    def parse_files(self, spec_paths, finalize=True, workers=None):
+        spec_paths = list(spec_paths)
+        spec_tokens = tokenize_spec_files(spec_paths, workers=workers)
+
+        # Merge the files in order so that the results (and errors) are the same as parsing serially
+        for spec_path, tokens in zip(spec_paths, spec_tokens):
+            self.parse_tokens(tokens, filename=spec_path, finalize=False)
         if finalize:
             self.finalize()
 
@@ -169,6 +378,80 @@ class SpecParser(object):
         if self.errors:
             raise SpecParserError(self.errors)
 
+        # Compute the struct member tables and enum value sets
+        for type_ in chain(self.types.values(), chain.from_iterable(
+                (action.input_type, action.output_type, action.error_type) for action in self.actions.values())):
+            if isinstance(type_, (TypeStruct, TypeEnum)):
+                type_.finalize()
+
+    # Load the finalized types and actions from a parsed spec cache file - returns True if the cache key matches
+    #
+    # The cache file must be owned by the current user and must not be writable by other users. Unreadable, unsafe, and
+    # invalid cache files are logged and ignored.
+    def load_cache(self, cache_path, cache_key):
+        try:
+            with open(cache_path, 'rb') as cache_file:
+                cache_stat = os.fstat(cache_file.fileno())
+                cache_stream = BytesIO(cache_file.read())
+        except FileNotFoundError:
+            return False
+        except OSError as exc:
+            _LOG.warning("Error reading spec cache file '%s': %s", cache_path, exc)
+            return False
+        if hasattr(os, 'getuid') and \
+                (cache_stat.st_uid != os.getuid() or cache_stat.st_mode & (stat.S_IWGRP | stat.S_IWOTH)):
+            _LOG.warning("Ignoring spec cache file '%s' - not owned by the current user or writable by other users", cache_path)
+            return False
+
+        gc_enabled = gc.isenabled()
+        try:
+            # Garbage collection is disabled while unpickling - it only slows down creating the many model objects
+            gc.disable()
+            if _SpecCacheUnpickler(cache_stream).load() != cache_key:
+                return False
+
+            # Create the (empty) named types so that type references can be resolved
+            types = OrderedDict((type_name, type_class.__new__(type_class))
+                                for type_name, type_class in _SpecCacheUnpickler(cache_stream).load())
+            unpickler = _SpecCacheUnpickler(cache_stream)
+            unpickler.persistent_load = types.__getitem__
+            type_states, actions = unpickler.load()
+            for type_, type_state in zip(types.values(), type_states):
+                for slot, value in type_state:
+                    setattr(type_, slot, value)
+        except (pickle.UnpicklingError, EOFError, KeyError, ValueError) as exc:
+            _LOG.warning("Invalid spec cache file '%s': %s", cache_path, exc)
+            return False
+        finally:
+            if gc_enabled:
+                gc.enable()
+        self.types.update(types)
+        self.actions.update(actions)
+        return True
+
+    # Save the finalized types and actions to a parsed spec cache file (written atomically)
+    def save_cache(self, cache_path, cache_key):
+        cache_path_tmp = '{0}.{1}.tmp'.format(cache_path, os.getpid())
+        try:
+            # The cache file is never writable by other users - see load_cache
+            with os.fdopen(os.open(cache_path_tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644), 'wb') as cache_file:
+                pickle.dump(cache_key, cache_file, pickle.HIGHEST_PROTOCOL)
+                pickle.dump([(type_name, type(type_)) for type_name, type_ in self.types.items()], cache_file,
+                            pickle.HIGHEST_PROTOCOL)
+
+                # Named types are pickled by name so that the pickle depth doesn't grow with the type reference depth
+                type_names = {id(type_): type_name for type_name, type_ in self.types.items()}
+                pickler = pickle.Pickler(cache_file, pickle.HIGHEST_PROTOCOL)
+                pickler.persistent_id = lambda obj: type_names.get(id(obj))
+                pickler.dump(([tuple((slot, getattr(type_, slot)) for slot in type(type_).__slots__ if hasattr(type_, slot))
+                               for type_ in self.types.values()], self.actions))
+            os.replace(cache_path_tmp, cache_path)
+        except OSError:
+            if os.path.exists(cache_path_tmp):
+                os.remove(cache_path_tmp)
+            return False
+        return True
+
     # Set a type attribute by name
     def _set_type(self, parent_type, parent_object, parent_type_attr, type_name, type_attr, validate_fn=None):
         filename = self._parse_filename
@@ -314,14 +597,14 @@ class SpecParser(object):
         return attr
 
     # Construct typedef parts
-    def _parse_typedef(self, parent, parent_type_attr, parent_attr_attr, match_typedef):
-        array_attrs_string = match_typedef.group('array')
-        dict_attrs_string = match_typedef.group('dict')
+    def _parse_typedef(self, parent, parent_type_attr, parent_attr_attr, typedef_groups):
+        array_attrs_string = typedef_groups['array']
+        dict_attrs_string = typedef_groups['dict']
 
         # Array member?
         if array_attrs_string is not None:
-            value_type_name = match_typedef.group('type')
-            value_attr = self._parse_attr(match_typedef.group('attrs'))
+            value_type_name = typedef_groups['type']
+            value_attr = self._parse_attr(typedef_groups['attrs'])
             array_type = TypeArray(None, attr=value_attr)
             self._set_type(array_type, array_type, 'type', value_type_name, value_attr)
 
@@ -333,17 +616,17 @@ class SpecParser(object):
 
         # Dictionary member?
         elif dict_attrs_string is not None:
-            value_type_name = match_typedef.group('dictValueType')
+            value_type_name = typedef_groups['dictValueType']
             if value_type_name is not None:
-                value_attr = self._parse_attr(match_typedef.group('dictValueAttrs'))
-                key_type_name = match_typedef.group('type')
-                key_attr = self._parse_attr(match_typedef.group('attrs'))
+                value_attr = self._parse_attr(typedef_groups['dictValueAttrs'])
+                key_type_name = typedef_groups['type']
+                key_attr = self._parse_attr(typedef_groups['attrs'])
                 dict_type = TypeDict(None, attr=value_attr, key_type=None, key_attr=key_attr)
                 self._set_type(dict_type, dict_type, 'type', value_type_name, value_attr)
                 self._set_type(dict_type, dict_type, 'key_type', key_type_name, key_attr, self._validate_dict_key_type)
             else:
-                value_type_name = match_typedef.group('type')
-                value_attr = self._parse_attr(match_typedef.group('attrs'))
+                value_type_name = typedef_groups['type']
+                value_attr = self._parse_attr(typedef_groups['attrs'])
                 dict_type = TypeDict(None, attr=value_attr)
                 self._set_type(dict_type, dict_type, 'type', value_type_name, value_attr)
 
@@ -355,55 +638,31 @@ class SpecParser(object):
 
         # Non-container member...
         else:
-            member_type_name = match_typedef.group('type')
-            member_attr = self._parse_attr(match_typedef.group('attrs'))
+            member_type_name = typedef_groups['type']
+            member_attr = self._parse_attr(typedef_groups['attrs'])
 
             self._set_type(parent, parent, parent_type_attr, member_type_name, member_attr)
             setattr(parent, parent_attr_attr, member_attr)
 
-    # Parse a specification from a stream
-    def _parse(self):
+    # Parse a specification from a list of spec tokens
+    def _parse(self, tokens):
 
-        # Process each line
-        self._parse_linenum = 0
-        line_continuation = []
-        for line_part in chain(self._parse_lines, ('',)):
-            self._parse_linenum += 1
-
-            # Line continuation?
-            line_part_no_continuation = _RE_LINE_CONT.sub('', line_part)
-            if line_continuation or line_part_no_continuation is not line_part:
-                line_continuation.append(line_part_no_continuation)
-            if line_part_no_continuation is not line_part:
-                continue
-            elif line_continuation:
-                line = ''.join(line_continuation)
-                del line_continuation[:]
-            else:
-                line = line_part
+        # Process each token
+        for self._parse_linenum, token_kind, token in tokens:
 
-            # Comment?
-            match = _RE_COMMENT.search(line)
-            if match:
-                doc_string = match.group('doc')
-                if doc_string is not None:
-                    self._doc.append(doc_string.strip())
-
-                continue
+            # Documentation comment?
+            if token_kind == _TOKEN_DOC:
+                self._doc.append(token)
 
             # Documentation group?
-            match = _RE_GROUP.search(line)
-            if match:
-                self._doc_group = match.group('group')
+            elif token_kind == _TOKEN_GROUP:
+                self._doc_group = token['group']
                 if self._doc_group is not None:
                     self._doc_group = self._doc_group.strip()
 
-                continue
-
             # Action?
-            match = _RE_ACTION.search(line)
-            if match:
-                action_id = match.group('id')
+            elif token_kind == _TOKEN_ACTION:
+                action_id = token['id']
 
                 # Action already defined?
                 if action_id in self.actions:
@@ -416,14 +675,11 @@ class SpecParser(object):
                 self._doc = []
                 self.actions[self._action.name] = self._action
 
-                continue
-
             # Definition?
-            match = _RE_DEFINITION.search(line)
-            if match:
-                definition_string = match.group('type')
-                definition_id = match.group('id')
-                definition_base_ids = match.group('base_ids')
+            elif token_kind == _TOKEN_DEFINITION:
+                definition_string = token['type']
+                definition_id = token['id']
+                definition_base_ids = token['base_ids']
                 if definition_base_ids is not None:
                     definition_base_ids = _RE_BASE_IDS_SPLIT.split(definition_base_ids)
 
@@ -463,13 +719,10 @@ class SpecParser(object):
                     self._doc = []
                     self.types[self._type.type_name] = self._type
 
-                continue # definition
-
             # Section?
-            match = _RE_SECTION.search(line)
-            if match:
-                section_string = match.group('type')
-                section_base_ids = match.group('base_ids')
+            elif token_kind == _TOKEN_SECTION:
+                section_string = token['type']
+                section_base_ids = token['base_ids']
                 if section_base_ids is not None:
                     section_base_ids = _RE_BASE_IDS_SPLIT.split(section_base_ids)
 
@@ -513,12 +766,9 @@ class SpecParser(object):
                                            None, self._validate_errors_base_type)
                         self._set_finalize(self._type, self._finalize_enum_base_type)
 
-                continue # section
-
             # Enum value?
-            match = _RE_VALUE.search(line)
-            if match:
-                value_string = match.group('id')
+            elif token_kind == _TOKEN_VALUE:
+                value_string = token['id']
 
                 # Not in an enum scope?
                 if not isinstance(self._type, TypeEnum):
@@ -526,21 +776,18 @@ class SpecParser(object):
                     continue
 
                 # Redefinition of enum value?
-                if value_string in self._type.values(include_base_types=False):
+                if self._type.has_value(value_string, include_base_types=False):
                     self._error("Redefinition of enumeration value '" + value_string + "'")
 
                 # Add the enum value
                 self._type.add_value(value_string, doc=self._doc)
                 self._doc = []
 
-                continue
-
             # Struct member?
-            match = _RE_MEMBER.search(line)
-            if match:
-                optional = match.group('optional') is not None
-                nullable = match.group('nullable') is not None
-                member_name = match.group('id')
+            elif token_kind == _TOKEN_MEMBER:
+                optional = token['optional'] is not None
+                nullable = token['nullable'] is not None
+                member_name = token['id']
 
                 # Not in a struct scope?
                 if not isinstance(self._type, TypeStruct):
@@ -548,20 +795,17 @@ class SpecParser(object):
                     continue
 
                 # Member name already defined?
-                if any(member.name == member_name for member in self._type.members(include_base_types=False)):
+                if self._type.member(member_name, include_base_types=False) is not None:
                     self._error("Redefinition of member '" + member_name + "'")
 
                 # Create the member
                 member = self._type.add_member(member_name, None, optional=optional, nullable=nullable, attr=None, doc=self._doc)
-                self._parse_typedef(member, 'type', 'attr', match)
+                self._parse_typedef(member, 'type', 'attr', token)
                 self._doc = []
 
-                continue
-
             # Typedef?
-            match = _RE_TYPEDEF.search(line)
-            if match:
-                typedef_name = match.group('id')
+            elif token_kind == _TOKEN_TYPEDEF:
+                typedef_name = token['id']
 
                 # Type already defined?
                 if typedef_name in _TYPES or typedef_name in self.types:
@@ -569,7 +813,7 @@ class SpecParser(object):
 
                 # Create the typedef
                 typedef = Typedef(None, attr=None, type_name=typedef_name, doc=self._doc)
-                self._parse_typedef(typedef, 'type', 'attr', match)
+                self._parse_typedef(typedef, 'type', 'attr', token)
                 self.types[typedef_name] = typedef
 
                 # Reset current action/type
@@ -577,7 +821,6 @@ class SpecParser(object):
                 self._type = None
                 self._doc = []
 
-                continue
-
             # Unrecognized line syntax
-            self._error('Syntax error')
+            else:  # token_kind == _TOKEN_SYNTAX_ERROR
+                self._error('Syntax error')
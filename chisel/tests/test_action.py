@@ -20,10 +20,12 @@
 # SOFTWARE.
 #
 
+from io import StringIO
 import re
 import unittest
 
-from chisel import action, Action, ActionError, Application, Request, SpecParser, SpecParserError
+from chisel import action, Action, ActionError, Application, Request, ResponseCache, SpecParser, SpecParserError, \
+    VALIDATE_OUTPUT_DEFERRED
 from chisel.spec import ActionModel
 
 
@@ -515,7 +517,8 @@ action my_action
 
         status, headers, response = app.request('FOO', '/my_action', wsgi_input=b'{"a": 7}')
         self.assertEqual(status, '405 Method Not Allowed')
-        self.assertEqual(sorted(headers), [('Content-Length', '18'),
+        self.assertEqual(sorted(headers), [('Allow', 'GET, POST'),
+                                           ('Content-Length', '18'),
                                            ('Content-Type', 'text/plain')])
         self.assertEqual(response.decode('utf-8'), 'Method Not Allowed')
 
@@ -563,6 +566,103 @@ action my_action
                          '{"error":"InvalidOutput","member":"a","message":"Invalid value \'asdf\' (type \'str\') '
                          'for member \'a\', expected type \'int\'"}')
 
+    # Test output validation policies
+    def test_validate_output_policy(self):
+
+        @action(spec='''\
+action my_action
+  output
+    int a
+''')
+        def my_action(dummy_app, dummy_req):
+            return {'a': 'asdf'}
+
+        app = Application()
+        app.log_format = '%(message)s'
+        app.add_request(my_action)
+
+        # Never
+        app.validate_output = False
+        status, dummy_headers, response = app.request('POST', '/my_action', wsgi_input=b'{}')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response.decode('utf-8'), '{"a":"asdf"}')
+        self.assertEqual(my_action.validate_output_errors, 0)
+
+        # Sampled - none
+        app.validate_output = 0.0
+        status, dummy_headers, response = app.request('POST', '/my_action', wsgi_input=b'{}')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(my_action.validate_output_errors, 0)
+
+        # Sampled - all
+        app.validate_output = 1.0
+        status, dummy_headers, response = app.request('POST', '/my_action', wsgi_input=b'{}')
+        self.assertEqual(status, '500 Internal Server Error')
+        self.assertTrue(response.decode('utf-8').startswith('{"error":"InvalidOutput"'))
+        self.assertEqual(my_action.validate_output_errors, 1)
+
+        # Deferred
+        app.validate_output = VALIDATE_OUTPUT_DEFERRED
+        environ = {'wsgi.errors': StringIO()}
+        status, dummy_headers, response = app.request('POST', '/my_action', wsgi_input=b'{}', environ=environ)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response.decode('utf-8'), '{"a":"asdf"}')
+        self.assertEqual(my_action.validate_output_errors, 2)
+        self.assertEqual(environ['wsgi.errors'].getvalue(),
+                         "Invalid output returned from action 'my_action': Invalid value 'asdf' (type 'str') "
+                         "for member 'a', expected type 'int'\n")
+
+        # Action policy overrides the application policy
+        my_action.validate_output = True
+        status, dummy_headers, response = app.request('POST', '/my_action', wsgi_input=b'{}')
+        self.assertEqual(status, '500 Internal Server Error')
+        self.assertEqual(my_action.validate_output_errors, 3)
+
+    # Test invalid output validation policies
+    def test_output_policy_invalid(self):
+
+        app = Application()
+        for validate_output in ('always', 1.5, -0.5, None, [True]):
+            with self.assertRaises(ValueError) as cm_exc:
+                app.validate_output = validate_output
+            self.assertEqual(str(cm_exc.exception), 'Invalid output validation policy {0!r}'.format(validate_output))
+        self.assertIs(app.validate_output, True)
+
+        with self.assertRaises(ValueError) as cm_exc:
+            action(lambda app, req: {}, validate_output='always')
+        self.assertEqual(str(cm_exc.exception), "Invalid output validation policy 'always'")
+
+        my_action = action(lambda app, req: {}, name='my_action')
+        self.assertIsNone(my_action.validate_output)
+        my_action.validate_output = 0.5
+        self.assertEqual(my_action.validate_output, 0.5)
+        with self.assertRaises(ValueError):
+            my_action.validate_output = '0.5'
+        self.assertEqual(my_action.validate_output, 0.5)
+
+    # Test deferred output validation of a valid response
+    def test_output_deferred_valid(self):
+
+        @action(validate_output=VALIDATE_OUTPUT_DEFERRED, spec='''\
+action my_action
+  output
+    int a
+''')
+        def my_action(dummy_app, dummy_req):
+            return {'a': 7}
+
+        app = Application()
+        app.add_request(my_action)
+
+        environ = {'wsgi.errors': StringIO()}
+        status, headers, response = app.request('POST', '/my_action', wsgi_input=b'{}', environ=environ)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(sorted(headers), [('Content-Length', '7'),
+                                           ('Content-Type', 'application/json')])
+        self.assertEqual(response.decode('utf-8'), '{"a":7}')
+        self.assertEqual(my_action.validate_output_errors, 0)
+        self.assertEqual(environ['wsgi.errors'].getvalue(), '')
+
     # Test action with invalid None output
     def test_error_none_output(self):
 
@@ -642,6 +742,374 @@ action my_action
                                            ('Content-Type', 'application/json')])
         self.assertEqual(response.decode('utf-8'), '{"error":"IOError","message":"Error reading request content"}')
 
+    # Test action response cache
+    def test_cache(self):
+
+        calls = []
+
+        @action(spec='''\
+action my_action
+  input
+    int value
+    optional string callback
+  output
+    int result
+  errors
+    Negative
+''', urls=(('GET', '/my_action/{value}'), ('POST', None)), jsonp='callback', cache=ResponseCache())
+        def my_action(ctx, req):
+            calls.append(req['value'])
+            ctx.add_header('MyHeader', str(req['value']))
+            if req['value'] < 0:
+                raise ActionError('Negative', status='400 Bad Request')
+            return {'result': req['value'] * 2}
+
+        app = Application()
+        app.add_request(my_action)
+        cache = my_action.cache
+
+        # Cache miss
+        status, headers, response = app.request('GET', '/my_action/4')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(sorted(headers), [('Content-Length', '12'), ('Content-Type', 'application/json'), ('MyHeader', '4')])
+        self.assertEqual(response, b'{"result":8}')
+        self.assertEqual(calls, [4])
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (0, 1, 1))
+
+        # Cache hit - the response is served without calling the action
+        status, headers, response = app.request('GET', '/my_action/4')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(sorted(headers), [('Content-Length', '12'), ('Content-Type', 'application/json'), ('MyHeader', '4')])
+        self.assertEqual(response, b'{"result":8}')
+        self.assertEqual(calls, [4])
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (1, 1, 1))
+
+        # Errors, POST requests, and JSONP requests are not cached
+        self.assertEqual(app.request('GET', '/my_action/-1')[0], '400 Bad Request')
+        self.assertEqual(app.request('GET', '/my_action/-1')[0], '400 Bad Request')
+        self.assertEqual(app.request('GET', '/my_action/abc')[0], '400 Bad Request')
+        self.assertEqual(app.request('POST', '/my_action', wsgi_input=b'{"value": 4}')[2], b'{"result":8}')
+        self.assertEqual(app.request('GET', '/my_action/4', query_string='callback=cb')[2], b'cb({"result":8});')
+        self.assertEqual(calls, [4, -1, -1, 4, 4])
+        self.assertEqual(len(cache), 1)
+
+        # Invalidation
+        self.assertTrue(cache.invalidate(my_action.cache_key({'value': 4})))
+        self.assertEqual(app.request('GET', '/my_action/4')[2], b'{"result":8}')
+        self.assertEqual(calls, [4, -1, -1, 4, 4, 4])
+
+        # Equivalent requests share a cache entry
+        self.assertEqual(app.request('GET', '/my_action/04')[2], b'{"result":8}')
+        self.assertEqual(calls, [4, -1, -1, 4, 4, 4])
+        self.assertTrue(cache.invalidate(my_action.cache_key({'value': 4})))
+        self.assertEqual(app.request('GET', '/my_action/05')[2], b'{"result":10}')
+        self.assertEqual(calls, [4, -1, -1, 4, 4, 4, 5])
+        self.assertTrue(cache.invalidate(my_action.cache_key({'value': 5})))
+        self.assertEqual(len(cache), 0)
+
+    # Test action response cache with array requests of more than ten elements
+    def test_cache_array(self):
+
+        calls = []
+
+        @action(spec='''\
+action my_action
+  input
+    int[] values
+  output
+    int sum
+''', cache=ResponseCache())
+        def my_action(dummy_ctx, req):
+            calls.append(req['values'])
+            return {'sum': sum(req['values'])}
+
+        app = Application()
+        app.add_request(my_action)
+        query_string = '&'.join('values.{0}={0}'.format(ix) for ix in range(12))
+        status, dummy_headers, response = app.request('GET', '/my_action', query_string=query_string)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response, b'{"sum":66}')
+        status, dummy_headers, response = app.request('GET', '/my_action', query_string=query_string)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response, b'{"sum":66}')
+        self.assertEqual(calls, [list(range(12))])
+        self.assertTrue(my_action.cache.invalidate(my_action.cache_key({'values': list(range(12))})))
+
+    # Test entity tags
+    def test_etag(self):
+
+        @action(spec='''\
+action my_action
+  input
+    int value
+  output
+    int result
+''')
+        def my_action(dummy_ctx, req):
+            return {'result': req['value'] * 2}
+
+        app = Application()
+        app.add_request(my_action)
+
+        # Entity tags disabled
+        status, headers, response = app.request('GET', '/my_action', query_string='value=4')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(sorted(headers), [('Content-Length', '12'), ('Content-Type', 'application/json')])
+
+        # Entity tag generated from the response content
+        app.etag = True
+        status, headers, response = app.request('GET', '/my_action', query_string='value=4')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(sorted(headers), [('Content-Length', '12'), ('Content-Type', 'application/json'),
+                                           ('ETag', '"68f47617a6a56aac9cb0a5c650869aa19e67f8be"')])
+        self.assertEqual(response, b'{"result":8}')
+
+        # Matching entity tag
+        for if_none_match in ('"68f47617a6a56aac9cb0a5c650869aa19e67f8be"', 'W/"68f47617a6a56aac9cb0a5c650869aa19e67f8be"',
+                              '"abc", "68f47617a6a56aac9cb0a5c650869aa19e67f8be"', '*'):
+            status, headers, response = app.request('GET', '/my_action', query_string='value=4',
+                                                     environ={'HTTP_IF_NONE_MATCH': if_none_match})
+            self.assertEqual(status, '304 Not Modified')
+            self.assertEqual(headers, [('ETag', '"68f47617a6a56aac9cb0a5c650869aa19e67f8be"')])
+            self.assertEqual(response, b'')
+
+        # Non-matching entity tag, errors, and non-GET requests
+        status, headers, response = app.request('GET', '/my_action', query_string='value=5',
+                                                environ={'HTTP_IF_NONE_MATCH': '"68f47617a6a56aac9cb0a5c650869aa19e67f8be"'})
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response, b'{"result":10}')
+        status, headers, response = app.request('GET', '/my_action', query_string='value=x',
+                                                environ={'HTTP_IF_NONE_MATCH': '*'})
+        self.assertEqual(status, '400 Bad Request')
+        self.assertFalse(any(header[0] == 'ETag' for header in headers))
+        status, headers, response = app.request('POST', '/my_action', wsgi_input=b'{"value": 4}',
+                                                environ={'HTTP_IF_NONE_MATCH': '*'})
+        self.assertEqual(status, '200 OK')
+        self.assertFalse(any(header[0] == 'ETag' for header in headers))
+
+    # Test entity tags of cached responses
+    def test_etag_cache(self):
+
+        calls = []
+
+        @action(spec='''\
+action my_action
+  input
+    int value
+  output
+    int result
+''', cache=ResponseCache())
+        def my_action(dummy_ctx, req):
+            calls.append(req['value'])
+            return {'result': req['value'] * 2}
+
+        app = Application()
+        app.etag = True
+        app.add_request(my_action)
+        status, headers, response = app.request('GET', '/my_action', query_string='value=4')
+        etag = dict(headers)['ETag']
+        my_action.cache.clear()
+
+        # Not modified on a cache miss - the serialized response is cached
+        status, headers, response = app.request('GET', '/my_action', query_string='value=4',
+                                                environ={'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(status, '304 Not Modified')
+        self.assertEqual(headers, [('ETag', etag)])
+        self.assertEqual(response, b'')
+        self.assertEqual(calls, [4, 4])
+
+        # Cache hit
+        status, headers, response = app.request('GET', '/my_action', query_string='value=4')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(sorted(headers), [('Content-Length', '12'), ('Content-Type', 'application/json'), ('ETag', etag)])
+        self.assertEqual(response, b'{"result":8}')
+        self.assertEqual(calls, [4, 4])
+
+        # Not modified on a cache hit
+        status, headers, response = app.request('GET', '/my_action', query_string='value=4',
+                                                environ={'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(status, '304 Not Modified')
+        self.assertEqual(headers, [('ETag', etag)])
+        self.assertEqual(calls, [4, 4])
+
+    # Test entity tags from the action version
+    def test_etag_version(self):
+
+        versions = {'a': 1}
+        calls = []
+
+        @action(spec='''\
+action my_action
+  input
+    string name
+  output
+    int version
+''', version=lambda ctx, req: versions.get(req['name']))
+        def my_action(dummy_ctx, req):
+            calls.append(req['name'])
+            return {'version': versions.get(req['name'], 0)}
+
+        app = Application()
+        app.etag = True
+        app.add_request(my_action)
+
+        status, headers, response = app.request('GET', '/my_action', query_string='name=a')
+        self.assertEqual(status, '200 OK')
+        etag = dict(headers)['ETag']
+        self.assertRegex(etag, r'^"v[0-9a-f]{40}"$')
+        self.assertEqual(response, b'{"version":1}')
+        self.assertEqual(calls, ['a'])
+
+        # Not modified - the action is not called
+        status, headers, response = app.request('GET', '/my_action', query_string='name=a',
+                                                environ={'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(status, '304 Not Modified')
+        self.assertEqual(headers, [('ETag', etag)])
+        self.assertEqual(response, b'')
+        self.assertEqual(calls, ['a'])
+
+        # Modified
+        versions['a'] = 2
+        status, headers, response = app.request('GET', '/my_action', query_string='name=a',
+                                                environ={'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(status, '200 OK')
+        self.assertNotEqual(dict(headers)['ETag'], etag)
+        self.assertEqual(response, b'{"version":2}')
+        self.assertEqual(calls, ['a', 'a'])
+
+        # No version - entity tag generated from the response content
+        status, headers, response = app.request('GET', '/my_action', query_string='name=b')
+        self.assertEqual(status, '200 OK')
+        self.assertRegex(dict(headers)['ETag'], r'^"[0-9a-f]{40}"$')
+
+    # Test request phase timing
+    def test_timing(self):
+
+        @action(spec='''\
+action my_action
+  input
+    string a
+    optional int b
+  output
+    int length
+''')
+        def my_action(dummy_app, req):
+            return {'length': len(req['a'])}
+
+        app = Application()
+        app.add_request(my_action)
+
+        # Timing disabled
+        status, headers, response = app.request('POST', '/my_action', wsgi_input=b'{"a": "abc"}')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(sorted(headers), [('Content-Length', '12'), ('Content-Type', 'application/json')])
+
+        # Timing sink
+        timings = []
+        app.timing_sink = lambda ctx, phase, seconds, nbytes: timings.append((phase, nbytes))
+        status, headers, response = app.request('POST', '/my_action', query_string='b=1', wsgi_input=b'{"a": "abc"}')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(sorted(headers), [('Content-Length', '12'), ('Content-Type', 'application/json')])
+        self.assertEqual(response.decode('utf-8'), '{"length":3}')
+        self.assertEqual(timings, [
+            ('read', 12),
+            ('json_decode', 12),
+            ('query_decode', 3),
+            ('input_validation', None),
+            ('callback', None),
+            ('output_validation', None),
+            ('serialize', 12)
+        ])
+
+        # Server-Timing header
+        app.timing_sink = None
+        app.server_timing = True
+        status, headers, response = app.request('GET', '/my_action', query_string='a=abcd')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual([header[0] for header in headers], ['Content-Type', 'Content-Length', 'Server-Timing'])
+        self.assertRegex(headers[2][1], r'^query_decode;dur=\d+\.\d{3};desc="6 bytes", input_validation;dur=\d+\.\d{3}, '
+                                        r'callback;dur=\d+\.\d{3}, output_validation;dur=\d+\.\d{3}, '
+                                        r'serialize;dur=\d+\.\d{3};desc="12 bytes"$')
+
+        # Server-Timing header on input error
+        status, headers, response = app.request('GET', '/my_action', query_string='a=abcd&b=x')
+        self.assertEqual(status, '400 Bad Request')
+        self.assertRegex(headers[2][1], r'^query_decode;dur=\d+\.\d{3};desc="10 bytes", serialize;dur=\d+\.\d{3};desc="\d+ bytes"$')
+
+    # Test maximum request content length
+    def test_max_content_length(self):
+
+        @action(spec='''\
+action my_action
+  input
+    string a
+  output
+    int length
+''')
+        def my_action(dummy_app, req):
+            return {'length': len(req['a'])}
+
+        app = Application()
+        app.add_request(my_action)
+        app.max_content_length = 20
+
+        class MyStream(object):
+            @staticmethod
+            def read(dummy_size=-1):
+                raise IOError('FAIL')
+
+        # Content length exceeds maximum - content is not read
+        status, headers, response = app.request('POST', '/my_action',
+                                                environ={'wsgi.input': MyStream(), 'CONTENT_LENGTH': '21'})
+        self.assertEqual(status, '413 Request Entity Too Large')
+        self.assertEqual(sorted(headers), [('Content-Length', '65'),
+                                           ('Content-Type', 'application/json')])
+        self.assertEqual(response.decode('utf-8'), '{"error":"RequestTooLarge","message":"Request content too large"}')
+
+        # No content length - content exceeds maximum
+        status, dummy_headers, response = app.request('POST', '/my_action', wsgi_input=b'{"a": "0123456789abcdef"}')
+        self.assertEqual(status, '413 Request Entity Too Large')
+        self.assertEqual(response.decode('utf-8'), '{"error":"RequestTooLarge","message":"Request content too large"}')
+
+        # Content within maximum
+        status, dummy_headers, response = app.request('POST', '/my_action', wsgi_input=b'{"a": "0123456789"}')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response.decode('utf-8'), '{"length":10}')
+
+        # Action maximum overrides the application maximum
+        my_action.max_content_length = 100000
+        status, dummy_headers, response = app.request('POST', '/my_action', wsgi_input=b'{"a": "0123456789abcdef"}')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response.decode('utf-8'), '{"length":16}')
+
+    # Test chunked request content reads
+    def test_content_chunked(self):
+
+        @action(spec='''\
+action my_action
+  input
+    string a
+  output
+    int length
+''')
+        def my_action(dummy_app, req):
+            return {'length': len(req['a'])}
+
+        app = Application()
+        app.add_request(my_action)
+
+        # Content larger than the read chunk size
+        content = b'{"a": "' + b'x' * 200000 + b'"}'
+        status, dummy_headers, response = app.request('POST', '/my_action', wsgi_input=content)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response.decode('utf-8'), '{"length":200000}')
+
+        # Only the content length is read
+        status, dummy_headers, response = app.request('POST', '/my_action', wsgi_input=content + b'garbage',
+                                                      environ={'CONTENT_LENGTH': str(len(content))})
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response.decode('utf-8'), '{"length":200000}')
+
     # Test action JSON serialization error handling
     def test_error_json(self):
 
@@ -20,16 +20,20 @@
 # SOFTWARE.
 #
 
+from collections import OrderedDict
 from io import BytesIO, StringIO
 import json
 import logging
 import os
+import pickle
 import re
 import sys
+from tempfile import TemporaryDirectory
+import time
 import types
 import unittest
 
-from chisel import action, Application, ENVIRON_CTX, Request
+from chisel import action, Application, ENVIRON_CTX, Request, SpecParser, SpecParserError
 
 
 class TestAppApplication(unittest.TestCase):
@@ -50,6 +54,354 @@ class TestAppApplication(unittest.TestCase):
         self.assertTrue(isinstance(sys.modules['chisel.tests.test_app_files'], types.ModuleType))
         self.assertTrue(isinstance(sys.modules['chisel.tests.test_app_files.module'], types.ModuleType))
 
+    def test_load_specs_cache(self):
+
+        class NoParseSpecParser(SpecParser):
+            __slots__ = ()
+            def parse_tokens(self, tokens, filename='', finalize=True):
+                raise Exception('Unexpected parse')
+
+        with TemporaryDirectory() as spec_dir:
+            spec_path_a = os.path.join(spec_dir, 'a.chsl')
+            spec_path_b = os.path.join(spec_dir, 'b.chsl')
+            cache_path = os.path.join(spec_dir, 'specs.cache')
+            with open(spec_path_a, 'w') as spec_file:
+                spec_file.write('''\
+# My struct
+struct MyStruct
+  MyEnum value
+  optional MyStruct next
+''')
+            with open(spec_path_b, 'w') as spec_file:
+                spec_file.write('''\
+enum MyEnum
+  A
+  B
+
+action my_action
+  input
+    MyStruct struct
+  output
+    MyEnum value
+''')
+
+            # Parse and write the cache
+            app = Application()
+            app.load_specs(spec_dir, cache_path=cache_path)
+            self.assertTrue(os.path.isfile(cache_path))
+            self.assertEqual(sorted(os.listdir(spec_dir)), ['a.chsl', 'b.chsl', 'specs.cache'])
+
+            # Load from the cache - no parsing
+            app2 = Application()
+            app2.specs = NoParseSpecParser()
+            app2.load_specs(spec_dir, cache_path=cache_path)
+            self.assertEqual(sorted(app2.specs.types.keys()), ['MyEnum', 'MyStruct'])
+            self.assertEqual(sorted(app2.specs.actions.keys()), ['my_action'])
+            my_struct = app2.specs.types['MyStruct']
+            self.assertEqual(my_struct.doc, ['My struct'])
+            self.assertIs(my_struct.member('value').type, app2.specs.types['MyEnum'])
+            self.assertIs(my_struct.member('next').type, my_struct)
+            self.assertIs(app2.specs.actions['my_action'].input_type.member('struct').type, my_struct)
+
+            @action(spec=app2.specs)
+            def my_action(dummy_ctx, req):
+                return {'value': req['struct']['next']['value']}
+            app2.add_request(my_action)
+            status, dummy_headers, response = app2.request('GET', '/my_action',
+                                                           query_string='struct.value=A&struct.next.value=B')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(response, b'{"value":"B"}')
+
+            # Changed spec file - the cache is not used
+            time.sleep(0.01)
+            with open(spec_path_b, 'w') as spec_file:
+                spec_file.write('''\
+enum MyEnum
+  A
+  B
+  C
+
+action my_action
+  input
+    MyStruct struct
+  output
+    MyEnum value
+''')
+            app3 = Application()
+            app3.specs = NoParseSpecParser()
+            with self.assertRaises(Exception):
+                app3.load_specs(spec_dir, cache_path=cache_path)
+            app3 = Application()
+            app3.load_specs(spec_dir, cache_path=cache_path)
+            self.assertEqual([value.value for value in app3.specs.types['MyEnum'].values()], ['A', 'B', 'C'])
+
+            # Spec errors - the cache is not written
+            os.remove(cache_path)
+            with open(spec_path_b, 'a') as spec_file:
+                spec_file.write('struct MyStruct\n')
+            with self.assertRaises(SpecParserError):
+                Application().load_specs(spec_dir, cache_path=cache_path)
+            self.assertFalse(os.path.exists(cache_path))
+
+    def test_load_specs_cache_unsafe(self):
+
+        class NoParseSpecParser(SpecParser):
+            __slots__ = ()
+            def parse_tokens(self, tokens, filename='', finalize=True):
+                raise Exception('Unexpected parse')
+
+        log_stream = StringIO()
+        log_handler = logging.StreamHandler(log_stream)
+        spec_logger = logging.getLogger('chisel.spec')
+        spec_logger.addHandler(log_handler)
+        try:
+            with TemporaryDirectory() as spec_dir:
+                spec_path = os.path.join(spec_dir, 'a.chsl')
+                cache_path = os.path.join(spec_dir, 'specs.cache')
+                with open(spec_path, 'w') as spec_file:
+                    spec_file.write('''\
+action my_action
+  input
+    int value
+''')
+                Application().load_specs(spec_dir, cache_path=cache_path)
+                self.assertEqual(os.stat(cache_path).st_mode & 0o777, 0o644)
+
+                # Cache file writable by other users - parsed and re-written
+                os.chmod(cache_path, 0o666)
+                app = Application()
+                app.load_specs(spec_dir, cache_path=cache_path)
+                self.assertEqual(sorted(app.specs.actions.keys()), ['my_action'])
+                self.assertRegex(log_stream.getvalue(), r"^Ignoring spec cache file '.*specs\.cache' - not owned by the current user "
+                                                        r"or writable by other users\n$")
+                self.assertEqual(os.stat(cache_path).st_mode & 0o777, 0o644)
+                app = Application()
+                app.specs = NoParseSpecParser()
+                app.load_specs(spec_dir, cache_path=cache_path)
+                self.assertEqual(sorted(app.specs.actions.keys()), ['my_action'])
+
+                # Cache file with unexpected globals - nothing is loaded
+                with open(cache_path, 'rb') as cache_file:
+                    cache_key = pickle.load(cache_file)
+                with open(cache_path, 'wb') as cache_file:
+                    pickle.dump(cache_key, cache_file)
+                    pickle.dump([('MyStruct', OrderedDict)], cache_file)
+                log_stream.seek(0)
+                log_stream.truncate()
+                app = Application()
+                app.load_specs(spec_dir, cache_path=cache_path)
+                self.assertEqual(sorted(app.specs.actions.keys()), ['my_action'])
+                self.assertRegex(log_stream.getvalue(), r"^Invalid spec cache file '.*specs\.cache': "
+                                                        r"Unexpected global 'collections\.OrderedDict'\n$")
+
+                # Truncated cache file
+                with open(cache_path, 'wb') as cache_file:
+                    pickle.dump(cache_key, cache_file)
+                log_stream.seek(0)
+                log_stream.truncate()
+                app = Application()
+                app.load_specs(spec_dir, cache_path=cache_path)
+                self.assertEqual(sorted(app.specs.actions.keys()), ['my_action'])
+                self.assertRegex(log_stream.getvalue(), r"^Invalid spec cache file '.*specs\.cache': .*\n$")
+        finally:
+            spec_logger.removeHandler(log_handler)
+
+    def test_reload_specs(self):
+
+        def write_spec(spec_path, spec, mtime_ns):
+            with open(spec_path, 'w') as spec_file:
+                spec_file.write(spec)
+            os.utime(spec_path, ns=(mtime_ns, mtime_ns))
+
+        with TemporaryDirectory() as spec_dir:
+            spec_path_a = os.path.join(spec_dir, 'a.chsl')
+            spec_path_b = os.path.join(spec_dir, 'b.chsl')
+            spec_path_c = os.path.join(spec_dir, 'c.chsl')
+            write_spec(spec_path_a, '''\
+struct MyStruct
+  int a
+''', 1000000000)
+            write_spec(spec_path_b, '''\
+action my_action
+  input
+    MyStruct struct
+''', 1000000000)
+            write_spec(spec_path_c, '''\
+# The other action
+action other_action
+  input
+    int value
+''', 1000000000)
+
+            app = Application()
+            with self.assertRaises(AssertionError):
+                app.reload_specs()
+            app.spec_reload = True
+            app.load_specs(spec_dir)
+            app.add_request(action(lambda ctx, req: {}, name='my_action'))
+            app.add_request(action(lambda ctx, req: {}, name='other_action'))
+            app.add_request(action(lambda ctx, req: {}, name='spec_action', spec='''\
+action spec_action
+'''))
+            my_action = app.requests['my_action']
+            other_action = app.requests['other_action']
+            spec_action = app.requests['spec_action']
+            my_action_validators = my_action._validators # pylint: disable=protected-access
+            other_action_validators = other_action._validators # pylint: disable=protected-access
+            spec_action_model = spec_action.model
+            self.assertEqual(other_action.doc, ['The other action'])
+            status, dummy_headers, response = app.request('GET', '/my_action', query_string='struct.a=1&struct.b=2')
+            self.assertEqual(status, '400 Bad Request')
+            self.assertEqual(response, b'{"error":"InvalidInput","message":"Unknown member \'struct.b\'"}')
+
+            # No changes
+            request_generation = app.request_generation
+            self.assertEqual(app.reload_specs(), [])
+            self.assertEqual(app.request_generation, request_generation)
+
+            # Change a type used by one action and the other action's documentation
+            specs = app.specs
+            write_spec(spec_path_a, '''\
+struct MyStruct
+  int a
+  optional string b
+''', 2000000000)
+            write_spec(spec_path_c, '''\
+# The other action, reloaded
+action other_action
+  input
+    int value
+''', 2000000000)
+            self.assertEqual(sorted(app.reload_specs()), [spec_path_a, spec_path_c])
+            self.assertEqual(app.request_generation, request_generation + 1)
+            self.assertIsNot(app.specs, specs)
+            self.assertIs(my_action.model, app.specs.actions['my_action'])
+            self.assertIs(other_action.model, app.specs.actions['other_action'])
+            self.assertIsNot(my_action._validators, my_action_validators) # pylint: disable=protected-access
+            self.assertIsNot(other_action._validators, other_action_validators) # pylint: disable=protected-access
+            self.assertIs(spec_action.model, spec_action_model)
+            self.assertEqual(other_action.doc, ['The other action, reloaded'])
+            status, dummy_headers, response = app.request('GET', '/my_action', query_string='struct.a=1&struct.b=2')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(response, b'{}')
+
+            # Change a file that doesn't affect my_action
+            my_action_validators = my_action._validators # pylint: disable=protected-access
+            write_spec(spec_path_c, '''\
+action other_action
+  input
+    int value
+    optional int value2
+''', 3000000000)
+            self.assertEqual(app.reload_specs(), [spec_path_c])
+            self.assertIs(my_action.model, app.specs.actions['my_action'])
+            self.assertIs(my_action._validators, my_action_validators) # pylint: disable=protected-access
+            status, dummy_headers, response = app.request('GET', '/other_action', query_string='value=1&value2=2')
+            self.assertEqual(status, '200 OK')
+
+            # Spec error - the application is unchanged
+            specs = app.specs
+            write_spec(spec_path_a, '''\
+struct MyStruct
+  int a
+  MyUnknown b
+''', 4000000000)
+            with self.assertRaises(SpecParserError) as cm_exc:
+                app.reload_specs()
+            self.assertEqual(cm_exc.exception.errors, [spec_path_a + ":3: error: Unknown member type 'MyUnknown'"])
+            self.assertIs(app.specs, specs)
+
+            # Removed action spec - the application is unchanged
+            write_spec(spec_path_a, '''\
+struct MyStruct
+  int a
+''', 5000000000)
+            os.remove(spec_path_c)
+            with self.assertRaises(Exception) as cm_exc:
+                app.reload_specs()
+            self.assertEqual(str(cm_exc.exception), "No spec defined for action 'other_action'")
+            self.assertIs(app.specs, specs)
+
+            # Restored spec file
+            write_spec(spec_path_c, '''\
+action other_action
+''', 6000000000)
+            self.assertEqual(sorted(app.reload_specs()), [spec_path_a, spec_path_c])
+            status, dummy_headers, response = app.request('GET', '/my_action', query_string='struct.a=1&struct.b=2')
+            self.assertEqual(status, '400 Bad Request')
+
+    def test_load_requests_cache(self):
+        with TemporaryDirectory() as module_dir:
+            package_dir = os.path.join(module_dir, 'chisel_test_manifest')
+            cache_path = os.path.join(module_dir, 'requests.json')
+            os.mkdir(package_dir)
+            with open(os.path.join(package_dir, '__init__.py'), 'w'):
+                pass
+            with open(os.path.join(package_dir, 'module_a.py'), 'w') as module_file:
+                module_file.write('''\
+import chisel
+
+@chisel.request
+def request_a(environ, start_response):
+    return []
+
+@chisel.request
+def request_a2(environ, start_response):
+    return []
+''')
+            with open(os.path.join(package_dir, 'module_b.py'), 'w') as module_file:
+                module_file.write('''\
+VALUE = 1
+''')
+
+            sys_path = sys.path
+            try:
+                sys.path = [module_dir] + sys_path
+
+                # Load all modules and write the manifest
+                app = Application()
+                app.load_requests(package_dir, cache_path=cache_path)
+                self.assertEqual(sorted(app.requests.keys()), ['request_a', 'request_a2'])
+                with open(cache_path, 'r') as cache_file:
+                    manifest = json.load(cache_file)
+                self.assertEqual(manifest['modules'], [['chisel_test_manifest.module_a', ['request_a', 'request_a2']]])
+                self.assertEqual(sorted(manifest['stats'].keys()), [
+                    package_dir,
+                    os.path.join(package_dir, 'module_a.py'),
+                    os.path.join(package_dir, 'module_b.py')
+                ])
+
+                # Load from the manifest - only the request modules are imported and the system path isn't searched
+                del sys.modules['chisel_test_manifest.module_b']
+                sys.path = sys_path
+                app = Application()
+                app.load_requests(package_dir, cache_path=cache_path)
+                self.assertEqual(sorted(app.requests.keys()), ['request_a', 'request_a2'])
+                self.assertNotIn('chisel_test_manifest.module_b', sys.modules)
+
+                # Add a module - the manifest is out-of-date
+                sys.path = [module_dir] + sys_path
+                with open(os.path.join(package_dir, 'module_c.py'), 'w') as module_file:
+                    module_file.write('''\
+import chisel
+
+@chisel.request
+def request_c(environ, start_response):
+    return []
+''')
+                os.utime(package_dir, ns=(0, 0))
+                app = Application()
+                app.load_requests(package_dir, cache_path=cache_path)
+                self.assertEqual(sorted(app.requests.keys()), ['request_a', 'request_a2', 'request_c'])
+                with open(cache_path, 'r') as cache_file:
+                    manifest = json.load(cache_file)
+                self.assertEqual(sorted(manifest['modules']), [['chisel_test_manifest.module_a', ['request_a', 'request_a2']],
+                                                               ['chisel_test_manifest.module_c', ['request_c']]])
+            finally:
+                sys.path = sys_path
+                for module_name in [module_name for module_name in sys.modules if module_name.startswith('chisel_test_manifest')]:
+                    del sys.modules[module_name]
+
     def test_load_requests_error(self):
         sys_path = sys.path
         try:
@@ -265,6 +617,66 @@ class TestAppApplication(unittest.TestCase):
         self.assertTrue(('Content-Type', 'text/plain') in headers)
         self.assertEqual(environ['wsgi.errors'].getvalue(), 'Hello log\n')
 
+    def test_log_lazy(self):
+
+        loggers = []
+
+        def my_wsgi(environ, start_response):
+            ctx = environ[ENVIRON_CTX]
+            self.assertIsNone(ctx._log) # pylint: disable=protected-access
+            ctx.log.warning('Hello log')
+            loggers.append(ctx.log)
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return ['Hello'.encode('utf-8')]
+
+        app = Application()
+        app.add_request(Request(my_wsgi))
+        app.log_format = '%(message)s'
+
+        # The log handler is shared between requests with the same error stream - each request has its own logger
+        wsgi_errors = StringIO()
+        app.request('GET', '/my_wsgi', environ={'wsgi.errors': wsgi_errors})
+        app.request('GET', '/my_wsgi', environ={'wsgi.errors': wsgi_errors})
+        self.assertEqual(wsgi_errors.getvalue(), 'Hello log\nHello log\n')
+        self.assertIsNot(loggers[0], loggers[1])
+        self.assertIs(loggers[0].handlers[0], loggers[1].handlers[0])
+
+        # A different error stream gets a new log handler
+        wsgi_errors2 = StringIO()
+        app.request('GET', '/my_wsgi', environ={'wsgi.errors': wsgi_errors2})
+        self.assertEqual(wsgi_errors2.getvalue(), 'Hello log\n')
+        self.assertIsNot(loggers[1].handlers[0], loggers[2].handlers[0])
+
+        # Changing the log format gets a new log handler
+        app.log_format = 'Format: %(message)s'
+        app.request('GET', '/my_wsgi', environ={'wsgi.errors': wsgi_errors2})
+        self.assertEqual(wsgi_errors2.getvalue(), 'Hello log\nFormat: Hello log\n')
+        self.assertIsNot(loggers[2].handlers[0], loggers[3].handlers[0])
+
+    def test_log_isolated(self):
+
+        def my_wsgi(environ, start_response):
+            ctx = environ[ENVIRON_CTX]
+            if 'extra' in ctx.environ.get('QUERY_STRING', ''):
+                ctx.log.setLevel(logging.ERROR)
+                ctx.log.addHandler(logging.StreamHandler(extra_errors))
+            ctx.log.error('Hello error')
+            ctx.log.warning('Hello log')
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return ['Hello'.encode('utf-8')]
+
+        app = Application()
+        app.add_request(Request(my_wsgi))
+        app.log_format = '%(message)s'
+
+        # Changes to one request's logger don't affect other requests
+        wsgi_errors = StringIO()
+        extra_errors = StringIO()
+        app.request('GET', '/my_wsgi', query_string='extra', environ={'wsgi.errors': wsgi_errors})
+        app.request('GET', '/my_wsgi', environ={'wsgi.errors': wsgi_errors})
+        self.assertEqual(wsgi_errors.getvalue(), 'Hello error\nHello error\nHello log\n')
+        self.assertEqual(extra_errors.getvalue(), 'Hello error\n')
+
     def test_nested_requests(self):
 
         def request1(environ, dummy_start_response):
@@ -351,12 +763,14 @@ action my_action
         self.assertEqual(status, '200 OK')
         self.assertEqual(response, b'{}')
 
-        status, dummy_headers, response = app.request('GET', '/my_action/')
+        status, headers, response = app.request('GET', '/my_action/')
         self.assertEqual(status, '405 Method Not Allowed')
+        self.assertTrue(('Allow', 'POST') in headers)
         self.assertEqual(response, b'Method Not Allowed')
 
-        status, dummy_headers, response = app.request('POST', '/my_action', wsgi_input=b'{}')
+        status, headers, response = app.request('POST', '/my_action', wsgi_input=b'{}')
         self.assertEqual(status, '405 Method Not Allowed')
+        self.assertTrue(('Allow', 'GET') in headers)
         self.assertEqual(response, b'Method Not Allowed')
 
         status, dummy_headers, response = app.request('PUT', '/my_action', wsgi_input=b'{}')
@@ -388,8 +802,9 @@ action my_action
         self.assertEqual(status, '200 OK')
         self.assertEqual(response, b'{"sum":7}')
 
-        status, dummy_headers, response = app.request('GET', '/my_action/3/4/')
+        status, headers, response = app.request('GET', '/my_action/3/4/')
         self.assertEqual(status, '405 Method Not Allowed')
+        self.assertTrue(('Allow', 'POST') in headers)
         self.assertEqual(response, b'Method Not Allowed')
 
         status, dummy_headers, response = app.request('POST', '/my_action/3/4', wsgi_input=b'{}')
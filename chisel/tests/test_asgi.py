@@ -0,0 +1,250 @@
+#
+# Copyright (C) 2012-2016 Craig Hobbs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+from io import StringIO
+import json
+import sys
+import textwrap
+import unittest
+
+from chisel import action, Application, request, Request
+
+# The ASGI entry point requires Python 3.7 or later
+if sys.version_info >= (3, 7):
+    import asyncio
+    from chisel.asgi import asgi_application
+
+
+def _async_def(name, source):
+    # Define an "async def" function from source - this module must be importable by Python versions without async syntax
+    namespace = {'asyncio': asyncio}
+    exec(textwrap.dedent(source), namespace) # pylint: disable=exec-used
+    return namespace[name]
+
+
+def _completed(result=None):
+    future = asyncio.Future()
+    future.set_result(result)
+    return future
+
+
+def _asgi_request(app, method, path, query_string=b'', body=b'', headers=(), body_chunks=None, received=None):
+    scope = {
+        'type': 'http',
+        'method': method,
+        'path': path,
+        'query_string': query_string,
+        'headers': list(headers),
+        'server': ('localhost', 8080)
+    }
+    chunks = [body] if body_chunks is None else body_chunks
+    messages = [{'type': 'http.request', 'body': chunk, 'more_body': ix < len(chunks) - 1} for ix, chunk in enumerate(chunks)]
+    sent = []
+
+    def receive():
+        message = messages.pop(0) if messages else {'type': 'http.disconnect'}
+        if received is not None:
+            received.append(message)
+        return _completed(message)
+
+    def send(message):
+        sent.append(message)
+        return _completed()
+
+    asyncio.run(asgi_application(app)(scope, receive, send))
+    assert sent[0]['type'] == 'http.response.start'
+    return sent[0]['status'], sent[0]['headers'], b''.join(message.get('body', b'') for message in sent[1:])
+
+
+@unittest.skipIf(sys.version_info < (3, 7), 'requires Python 3.7 or later')
+class TestAsgi(unittest.TestCase):
+
+    def setUp(self):
+        self.app = Application()
+        self.app.pretty_output = False
+        self.app.specs.parse_string('''\
+action my_action
+  input
+    int value
+  output
+    int result
+
+action my_async_action
+  input
+    int value
+  output
+    int result
+  errors
+    MyError
+''')
+
+    def test_action(self):
+        @action
+        def my_action(dummy_ctx, req):
+            return {'result': req['value'] * 2}
+        self.app.add_request(my_action)
+
+        status, headers, content = _asgi_request(self.app, 'GET', '/my_action', query_string=b'value=7')
+        self.assertEqual(status, 200)
+        self.assertEqual(headers, [(b'content-type', b'application/json'), (b'content-length', b'13')])
+        self.assertEqual(content, b'{"result":14}')
+        self.assertEqual(json.loads(content.decode('utf-8')), {'result': 14})
+
+        status, headers, content = _asgi_request(self.app, 'POST', '/my_action', body_chunks=[b'{"val', b'ue": 3}'],
+                                                 headers=[(b'content-type', b'application/json')])
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(content.decode('utf-8')), {'result': 6})
+
+    def test_action_async(self):
+        my_async_action = action(_async_def('my_async_action', '''\
+            async def my_async_action(ctx, req):
+                await asyncio.sleep(0)
+                ctx.add_header('MyHeader', 'MyValue')
+                return {'result': req['value'] + 1}
+        '''))
+        self.app.add_request(my_async_action)
+
+        status, headers, content = _asgi_request(self.app, 'POST', '/my_async_action', body=b'{"value": 1}')
+        self.assertEqual(status, 200)
+        self.assertIn((b'myheader', b'MyValue'), headers)
+        self.assertEqual(content, b'{"result":2}')
+
+        # Coroutine callbacks are not supported by the WSGI interface
+        environ = {'wsgi.errors': StringIO()}
+        status, dummy_headers, content = self.app.request('POST', '/my_async_action', wsgi_input=b'{"value": 2}',
+                                                          environ=environ)
+        self.assertEqual(status, '500 Internal Server Error')
+        self.assertEqual(content, b'{"error":"UnexpectedError"}')
+        self.assertIn("Coroutine action 'my_async_action' requires the ASGI entry point", environ['wsgi.errors'].getvalue())
+
+    def test_action_error(self):
+        my_async_action = action(_async_def('my_async_action', '''\
+            from chisel import ActionError
+            async def my_async_action(dummy_ctx, dummy_req):
+                raise ActionError('MyError')
+        '''))
+        self.app.add_request(my_async_action)
+
+        status, dummy_headers, content = _asgi_request(self.app, 'GET', '/my_async_action', query_string=b'value=1')
+        self.assertEqual(status, 500)
+        self.assertEqual(content, b'{"error":"MyError"}')
+
+    def test_action_invalid_input(self):
+        @action
+        def my_action(dummy_ctx, dummy_req):
+            return {'result': 0}
+        self.app.add_request(my_action)
+
+        status, dummy_headers, content = _asgi_request(self.app, 'GET', '/my_action', query_string=b'value=abc')
+        self.assertEqual(status, 400)
+        self.assertEqual(json.loads(content.decode('utf-8')),
+                         {'error': 'InvalidInput', 'member': 'value',
+                          'message': "Invalid value 'abc' (type 'str') for member 'value', expected type 'int'"})
+
+    def test_action_max_content_length(self):
+        @action(max_content_length=10)
+        def my_action(dummy_ctx, dummy_req):
+            return {'result': 0}
+        self.app.add_request(my_action)
+
+        status, dummy_headers, content = _asgi_request(self.app, 'POST', '/my_action',
+                                                       body_chunks=[b'{"value": ', b'1', b'0000}'])
+        self.assertEqual(status, 413)
+        self.assertEqual(json.loads(content.decode('utf-8')),
+                         {'error': 'RequestTooLarge', 'message': 'Request content too large'})
+
+    def test_action_content_too_large(self):
+        @action(max_content_length=10)
+        def my_action(dummy_ctx, dummy_req):
+            return {'result': 0}
+        self.app.add_request(my_action)
+
+        # The declared content length is too large - the content is not read
+        received = []
+        status, dummy_headers, content = _asgi_request(self.app, 'POST', '/my_action', headers=[(b'content-length', b'15')],
+                                                       body_chunks=[b'{"value": ', b'10000}'], received=received)
+        self.assertEqual(status, 413)
+        self.assertEqual(json.loads(content.decode('utf-8')),
+                         {'error': 'RequestTooLarge', 'message': 'Request content too large'})
+        self.assertEqual(received, [])
+
+    def test_action_unexpected_error(self):
+        my_async_action = action(_async_def('my_async_action', '''\
+            async def my_async_action(dummy_ctx, dummy_req):
+                raise Exception('BOOM')
+        '''))
+        self.app.add_request(my_async_action)
+
+        status, dummy_headers, content = _asgi_request(self.app, 'GET', '/my_async_action', query_string=b'value=1')
+        self.assertEqual(status, 500)
+        self.assertEqual(content, b'{"error":"UnexpectedError"}')
+
+    def test_request(self):
+        @request
+        def my_request(environ, start_response):
+            content = environ['wsgi.input'].read()
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return iter([b'Hello, ', content])
+        self.app.add_request(my_request)
+
+        status, headers, content = _asgi_request(self.app, 'POST', '/my_request', body=b'World')
+        self.assertEqual(status, 200)
+        self.assertEqual(headers, [(b'content-type', b'text/plain')])
+        self.assertEqual(content, b'Hello, World')
+
+    def test_request_exception(self):
+        @request
+        def my_request(dummy_environ, dummy_start_response):
+            raise Exception('BOOM')
+        self.app.add_request(my_request)
+
+        status, dummy_headers, content = _asgi_request(self.app, 'GET', '/my_request')
+        self.assertEqual(status, 500)
+        self.assertEqual(content, b'Unexpected Error')
+
+    def test_not_found(self):
+        def my_request(dummy_environ, dummy_start_response):
+            pass
+        self.app.add_request(Request(my_request, method='GET'))
+
+        status, dummy_headers, content = _asgi_request(self.app, 'GET', '/unknown')
+        self.assertEqual(status, 404)
+        self.assertEqual(content, b'Not Found')
+
+        status, headers, content = _asgi_request(self.app, 'POST', '/my_request')
+        self.assertEqual(status, 405)
+        self.assertIn((b'allow', b'GET'), headers)
+        self.assertEqual(content, b'Method Not Allowed')
+
+    def test_lifespan(self):
+        messages = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+        sent = []
+
+        def receive():
+            return _completed(messages.pop(0))
+
+        def send(message):
+            sent.append(message)
+            return _completed()
+
+        asyncio.run(asgi_application(self.app)({'type': 'lifespan'}, receive, send))
+        self.assertEqual(sent, [{'type': 'lifespan.startup.complete'}, {'type': 'lifespan.shutdown.complete'}])
@@ -0,0 +1,100 @@
+#
+# Copyright (C) 2012-2016 Craig Hobbs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+from io import StringIO
+import json
+import os
+import sys
+from tempfile import TemporaryDirectory
+import unittest
+
+from chisel.bench.__main__ import main
+from chisel.bench.runner import compare_results, percentile, run_benchmark
+from chisel.bench.suite import BENCHMARKS
+
+
+def _main_output(argv):
+    stdout = sys.stdout
+    sys.stdout = output = StringIO()
+    try:
+        return main(argv), output.getvalue()
+    finally:
+        sys.stdout = stdout
+
+
+class TestBench(unittest.TestCase):
+
+    def test_percentile(self):
+        values = [5, 1, 4, 2, 3]
+        self.assertEqual(percentile(values, 0), 1)
+        self.assertEqual(percentile(values, 50), 3)
+        self.assertEqual(percentile(values, 90), 5)
+        self.assertEqual(percentile(values, 100), 5)
+        self.assertEqual(percentile([], 50), None)
+
+    def test_run_benchmark(self):
+        calls = []
+        times = iter([0, 1, 3, 10, 13, 17, 20, 25, 35])
+        result = run_benchmark(lambda: calls.append(1), number=2, repeat=3, timer=lambda: next(times))
+        self.assertEqual(len(calls), 7)
+        self.assertEqual(result, {
+            'ops_per_sec': 0.24,
+            'min_us': 1000000.,
+            'p50_us': 3000000.,
+            'p90_us': 10000000.,
+            'p99_us': 10000000.,
+            'number': 2,
+            'repeat': 3
+        })
+
+    def test_compare_results(self):
+        baseline = {'a': {'p50_us': 10.}, 'b': {'p50_us': 10.}, 'c': {'p50_us': 10.}}
+        results = {'a': {'p50_us': 10.5}, 'b': {'p50_us': 12.}, 'c': {'p50_us': 8.}, 'd': {'p50_us': 100.}}
+        self.assertEqual(compare_results(results, baseline), [('b', 10., 12., 0.19999999999999996)])
+        self.assertEqual(compare_results(results, baseline, threshold=0.01), [('a', 10., 10.5, 0.050000000000000044),
+                                                                              ('b', 10., 12., 0.19999999999999996)])
+
+    def test_suite(self):
+        for name, fn_setup in BENCHMARKS:
+            fn_bench, number_factor = fn_setup()
+            self.assertTrue(number_factor > 0, name)
+            fn_bench()
+
+    def test_main(self):
+        with TemporaryDirectory() as temp_dir:
+            path_results = os.path.join(temp_dir, 'results.json')
+            status, output = _main_output(['-n', '1', '-r', '2', '-o', path_results, 'router.static', 'url.'])
+            self.assertEqual(status, 0)
+            with open(path_results, 'r') as file_results:
+                results = json.load(file_results)
+            self.assertEqual(sorted(results['benchmarks']), ['router.static.hit', 'url.decode_query_string',
+                                                             'url.encode_query_string'])
+            self.assertEqual(len(output.splitlines()), 3)
+
+            # Compare to a much faster baseline
+            for result in results['benchmarks'].values():
+                result['p50_us'] /= 100
+            with open(path_results, 'w') as file_results:
+                json.dump(results, file_results)
+            status, output = _main_output(['-n', '1', '-r', '2', '-b', path_results, 'router.static'])
+            self.assertEqual(status, 1)
+            self.assertIn('REGRESSION: router.static.hit', output)
@@ -0,0 +1,75 @@
+#
+# Copyright (C) 2012-2016 Craig Hobbs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+import unittest
+
+from chisel import ResponseCache
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def test_get_set(self):
+        cache = ResponseCache()
+        self.assertEqual(cache.get('a'), None)
+        cache.set('a', b'A')
+        self.assertEqual(cache.get('a'), b'A')
+        self.assertTrue('a' in cache)
+        self.assertFalse('b' in cache)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_lru(self):
+        cache = ResponseCache(max_size=2)
+        cache.set('a', b'A')
+        cache.set('b', b'B')
+        self.assertEqual(cache.get('a'), b'A')
+        cache.set('c', b'C')
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('a'), b'A')
+        self.assertEqual(cache.get('c'), b'C')
+
+    def test_ttl(self):
+        now = [0.]
+        cache = ResponseCache(ttl=10., timer=lambda: now[0])
+        cache.set('a', b'A')
+        cache.set('b', b'B', ttl=20.)
+        now[0] = 9.
+        self.assertEqual(cache.get('a'), b'A')
+        now[0] = 10.
+        self.assertEqual(cache.get('a'), None)
+        self.assertEqual(cache.get('b'), b'B')
+        self.assertEqual(len(cache), 1)
+        now[0] = 20.
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(len(cache), 0)
+
+    def test_invalidate(self):
+        cache = ResponseCache()
+        cache.set('a', b'A')
+        cache.set('b', b'B')
+        self.assertTrue(cache.invalidate('a'))
+        self.assertFalse(cache.invalidate('a'))
+        self.assertEqual(cache.get('a'), None)
+        self.assertEqual(cache.get('b'), b'B')
+        cache.clear()
+        self.assertEqual(len(cache), 0)
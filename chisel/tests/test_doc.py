@@ -20,6 +20,7 @@
 # SOFTWARE.
 #
 
+import hashlib
 import unittest
 
 from chisel import action, request, Action, Application, DocAction, DocPage, Element, Request
@@ -1302,6 +1303,17 @@ This is the request documentation.
         self.assertEqual(root.serialize(indent=None), '<!doctype html>\n' + ''.join(expected_chunks))
         self.assertEqual(root.serialize(indent=None, html=False), ''.join(expected_chunks))
 
+    def test_element_serialize_blocks(self):
+        root = Element('html', children=[Element('p', inline=True, children=Element('Hello \u00e9 ' + str(ix), text=True))
+                                         for ix in range(100)])
+        html = root.serialize(indent='')
+        blocks = list(root.serialize_blocks(indent='', block_size=100))
+        self.assertEqual(b''.join(blocks), html.encode('utf-8'))
+        self.assertEqual(len(blocks), 17)
+        self.assertTrue(all(len(block) >= 100 for block in blocks[:-1]))
+        self.assertTrue(all(len(block) < 200 for block in blocks))
+        self.assertEqual(list(root.serialize_blocks(indent='', html=False)), [html[len('<!doctype html>\n'):].encode('utf-8')])
+
     def test_page(self):
 
         app = Application()
@@ -1779,3 +1791,91 @@ The action returns no custom error codes.
   </body>
 </html>'''
         self.assertEqual(html_expected, html)
+
+    def test_page_cache(self):
+
+        environ = {'SCRIPT_NAME': '', 'HTTP_HOST': 'localhost:8080'}
+        doc_action = self.app.requests['doc']
+        page_cache = doc_action.page_cache
+
+        # Cache miss (streamed), then cache hit
+        status, headers, response = self.app.request('GET', '/doc', environ=dict(environ))
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers, [('Content-Type', 'text/html')])
+        self.assertEqual((page_cache.hits, page_cache.misses, len(page_cache)), (0, 1, 1))
+        status, headers, response2 = self.app.request('GET', '/doc', environ=dict(environ))
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(sorted(headers), [('Content-Length', str(len(response))), ('Content-Type', 'text/html')])
+        self.assertEqual(response2, response)
+        self.assertEqual((page_cache.hits, page_cache.misses, len(page_cache)), (1, 1, 1))
+
+        # Request pages, nonav, host, and output format are cached separately
+        self.app.request('GET', '/doc', query_string='name=my_action1', environ=dict(environ))
+        self.app.request('GET', '/doc', query_string='name=my_action1&nonav=true', environ=dict(environ))
+        status, dummy_headers, response_host = self.app.request('GET', '/doc', environ=dict(environ, HTTP_HOST='myhost'))
+        self.assertIn(b'<title>myhost</title>', response_host)
+        self.app.pretty_output = False
+        status, dummy_headers, response_ugly = self.app.request('GET', '/doc', environ=dict(environ))
+        self.assertEqual(response_ugly.replace(b'\n', b'').replace(b' ', b''), response.replace(b'\n', b'').replace(b' ', b''))
+        self.assertNotEqual(response_ugly, response)
+        self.assertEqual((page_cache.hits, page_cache.misses, len(page_cache)), (1, 5, 5))
+
+        # Unknown requests are not cached
+        self.assertEqual(self.app.request('GET', '/doc', query_string='name=unknown', environ=dict(environ))[0],
+                         '404 Not Found')
+        self.assertEqual(len(page_cache), 5)
+
+        # Adding a request invalidates the cache
+        self.app.pretty_output = True
+        self.app.specs.parse_string('action my_action3')
+        self.app.add_request(Action(lambda app, req: {}, name='my_action3'))
+        status, dummy_headers, response3 = self.app.request('GET', '/doc', environ=dict(environ))
+        self.assertEqual(status, '200 OK')
+        self.assertIn(b'my_action3', response3)
+        self.assertNotIn(b'my_action3', response)
+        self.assertEqual((page_cache.hits, page_cache.misses, len(page_cache)), (1, 6, 1))
+
+    def test_page_cache_etag(self):
+
+        environ = {'SCRIPT_NAME': '', 'HTTP_HOST': 'localhost:8080'}
+        self.app.etag = True
+
+        # Streamed doc pages have no entity tag
+        status, headers, response = self.app.request('GET', '/doc', environ=dict(environ, HTTP_IF_NONE_MATCH='*'))
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers, [('Content-Type', 'text/html')])
+
+        # Cached doc pages have the entity tag computed when the page was cached
+        etag = '"{0}"'.format(hashlib.sha1(response).hexdigest())
+        status, headers, response2 = self.app.request('GET', '/doc', environ=dict(environ))
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(sorted(headers), [('Content-Length', str(len(response))), ('Content-Type', 'text/html'), ('ETag', etag)])
+        self.assertEqual(response2, response)
+        status, headers, response3 = self.app.request('GET', '/doc', environ=dict(environ, HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(status, '304 Not Modified')
+        self.assertEqual(headers, [('ETag', etag)])
+        self.assertEqual(response3, b'')
+        self.assertEqual((self.app.requests['doc'].page_cache.hits, self.app.requests['doc'].page_cache.misses), (2, 1))
+
+        # No entity tag if entity tags are disabled
+        self.app.etag = False
+        status, headers, response4 = self.app.request('GET', '/doc', environ=dict(environ, HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(sorted(headers), [('Content-Length', str(len(response))), ('Content-Type', 'text/html')])
+        self.assertEqual(response4, response)
+
+    def test_page_cache_doc_page(self):
+
+        @action(spec='''\
+action my_action
+''')
+        def my_action(dummy_ctx, dummy_req):
+            pass
+
+        environ = {'SCRIPT_NAME': '', 'HTTP_HOST': 'localhost:8080'}
+        app = Application()
+        doc_page = DocPage(my_action)
+        app.add_request(doc_page)
+        response = app.request('GET', '/doc_my_action', environ=dict(environ))[2]
+        self.assertEqual(app.request('GET', '/doc_my_action', environ=dict(environ))[2], response)
+        self.assertEqual((doc_page.page_cache.hits, doc_page.page_cache.misses), (1, 1))
@@ -0,0 +1,131 @@
+#
+# Copyright (C) 2012-2016 Craig Hobbs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+import json
+from threading import Thread
+import unittest
+
+from chisel import action, Application, Metrics, MetricsRequest, request
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_record(self):
+        metrics = Metrics(buckets=(0.1, 1.))
+        metrics.record('a', '200 OK', 0.05)
+        metrics.record('a', '404 Not Found', 0.1)
+        metrics.record('a', '200 OK', 0.5)
+        metrics.record('b', '500 Internal Server Error', 5.)
+        self.assertEqual(metrics.snapshot(), {
+            'a': {
+                'count': 3,
+                'sum': 0.65,
+                'buckets': [[0.1, 2], [1., 3], [None, 3]],
+                'status': {'2xx': 2, '4xx': 1}
+            },
+            'b': {
+                'count': 1,
+                'sum': 5.,
+                'buckets': [[0.1, 0], [1., 0], [None, 1]],
+                'status': {'5xx': 1}
+            }
+        })
+
+    def test_record_threads(self):
+        metrics = Metrics()
+
+        def record():
+            for _ in range(1000):
+                metrics.record('a', '200 OK', 0.002)
+
+        threads = [Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['a']['count'], 4000)
+        self.assertEqual(snapshot['a']['status'], {'2xx': 4000})
+        self.assertEqual(snapshot['a']['buckets'][0], [0.001, 0])
+        self.assertEqual(snapshot['a']['buckets'][1], [0.0025, 4000])
+
+    def test_prometheus(self):
+        metrics = Metrics(buckets=(0.5,))
+        metrics.record('my_"action"', '200 OK', 0.25)
+        self.assertEqual(metrics.prometheus(), '''\
+# HELP chisel_requests_total Total requests by request name and response status class.
+# TYPE chisel_requests_total counter
+chisel_requests_total{request="my_\\"action\\"",status="2xx"} 1
+# HELP chisel_request_duration_seconds Request latency by request name.
+# TYPE chisel_request_duration_seconds histogram
+chisel_request_duration_seconds_bucket{request="my_\\"action\\"",le="0.5"} 1
+chisel_request_duration_seconds_bucket{request="my_\\"action\\"",le="+Inf"} 1
+chisel_request_duration_seconds_sum{request="my_\\"action\\""} 0.25
+chisel_request_duration_seconds_count{request="my_\\"action\\""} 1
+''')
+
+    def test_request(self):
+
+        @action(spec='''\
+action my_action
+  output
+    int value
+''')
+        def my_action(dummy_ctx, dummy_req):
+            return {'value': 1}
+
+        @request
+        def my_error(dummy_environ, dummy_start_response):
+            raise Exception('BOOM')
+
+        app = Application()
+        app.add_request(my_action)
+        app.add_request(my_error)
+        app.add_request(MetricsRequest())
+
+        # Metrics disabled
+        status, dummy_headers, content = app.request('GET', '/metrics')
+        self.assertEqual(status, '404 Not Found')
+        self.assertEqual(content, b'Metrics Not Enabled')
+
+        # Metrics enabled
+        app.metrics = Metrics(buckets=(10.,))
+        self.assertEqual(app.request('GET', '/my_action')[0], '200 OK')
+        self.assertEqual(app.request('GET', '/my_action')[0], '200 OK')
+        self.assertEqual(app.request('GET', '/my_error')[0], '500 Internal Server Error')
+        self.assertEqual(app.request('GET', '/unknown')[0], '404 Not Found')
+
+        status, headers, content = app.request('GET', '/metrics', query_string='format=json')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers[0], ('Content-Type', 'application/json'))
+        snapshot = json.loads(content.decode('utf-8'))
+        self.assertEqual(sorted(snapshot), ['my_action', 'my_error'])
+        self.assertEqual(snapshot['my_action']['count'], 2)
+        self.assertEqual(snapshot['my_action']['status'], {'2xx': 2})
+        self.assertEqual(snapshot['my_action']['buckets'], [[10., 2], [None, 2]])
+        self.assertEqual(snapshot['my_error']['status'], {'5xx': 1})
+
+        status, headers, content = app.request('GET', '/metrics')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers[0], ('Content-Type', 'text/plain; version=0.0.4'))
+        self.assertIn('chisel_requests_total{request="my_action",status="2xx"} 2\n', content.decode('utf-8'))
+        self.assertIn('chisel_requests_total{request="metrics",status="2xx"} 1\n', content.decode('utf-8'))
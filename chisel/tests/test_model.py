@@ -22,6 +22,7 @@
 
 from datetime import date, datetime
 from decimal import Decimal
+import pickle
 import unittest
 from uuid import UUID
 
@@ -35,6 +36,13 @@ from chisel.util import TZUTC, TZLOCAL
 ALL_VALIDATION_MODES = (VALIDATE_DEFAULT, VALIDATE_QUERY_STRING, VALIDATE_JSON_INPUT)
 
 
+class TestModelBuiltinTypes(unittest.TestCase):
+
+    def test_pickle(self):
+        for builtin_type in (TYPE_STRING, TYPE_INT, TYPE_FLOAT, TYPE_BOOL, TYPE_UUID, TYPE_DATE, TYPE_DATETIME, TYPE_OBJECT):
+            self.assertIs(pickle.loads(pickle.dumps(builtin_type)), builtin_type)
+
+
 class TestModelValidationError(unittest.TestCase):
 
     def test_member_syntax_dict_single(self):
@@ -348,6 +356,52 @@ class TestModelStructValidation(unittest.TestCase):
             ('f', 'datetime', False, False, [])
         ])
 
+    # Test struct member lookup and flattened member tables
+    def test_finalize(self):
+
+        base_type = TypeStruct()
+        base_type.add_member('a', TYPE_INT)
+        base_type2 = TypeStruct(base_types=[base_type])
+        base_type2.add_member('b', TYPE_FLOAT)
+        type_ = TypeStruct(base_types=[Typedef(base_type2)])
+        type_.add_member('c', TYPE_STRING)
+
+        # Before finalize
+        self.assertEqual([m.name for m in type_.members()], ['a', 'b', 'c'])
+        self.assertEqual(type_.member('a').type, TYPE_INT)
+        self.assertIsNone(type_.member('a', include_base_types=False))
+        self.assertEqual(type_.member('c', include_base_types=False).type, TYPE_STRING)
+        self.assertIsNone(type_.member('d'))
+
+        # After finalize
+        type_.finalize()
+        self.assertEqual([m.name for m in type_.members()], ['a', 'b', 'c'])
+        self.assertEqual([m.name for m in type_.members(include_base_types=False)], ['c'])
+        self.assertEqual(type_.member('b').type, TYPE_FLOAT)
+        self.assertIsNone(type_.member('b', include_base_types=False))
+        self.assertIsNone(type_.member('d'))
+        self.assertEqual(type_.validate({'a': 1, 'b': 2.5, 'c': 'x'}), {'a': 1, 'b': 2.5, 'c': 'x'})
+        with self.assertRaises(ValidationError) as cm_exc:
+            type_.validate({'a': 1, 'b': 2.5, 'c': 'x', 'd': 1})
+        self.assertEqual(str(cm_exc.exception), "Unknown member 'd'")
+
+        # Adding a member invalidates the member tables
+        type_.add_member('d', TYPE_BOOL)
+        self.assertEqual([m.name for m in type_.members()], ['a', 'b', 'c', 'd'])
+        self.assertEqual(type_.member('d').type, TYPE_BOOL)
+        self.assertEqual(type_.validate({'a': 1, 'b': 2.5, 'c': 'x', 'd': True}), {'a': 1, 'b': 2.5, 'c': 'x', 'd': True})
+
+        # Adding a member to a base type invalidates the derived member tables
+        type_.finalize()
+        base_type.add_member('e', TYPE_INT)
+        self.assertEqual([m.name for m in type_.members()], ['a', 'e', 'b', 'c', 'd'])
+        self.assertEqual(type_.member('e').type, TYPE_INT)
+        self.assertEqual(type_.validate({'a': 1, 'b': 2.5, 'c': 'x', 'd': True, 'e': 3}),
+                         {'a': 1, 'b': 2.5, 'c': 'x', 'd': True, 'e': 3})
+        with self.assertRaises(ValidationError) as cm_exc:
+            type_.validate({'a': 1, 'b': 2.5, 'c': 'x', 'd': True})
+        self.assertEqual(str(cm_exc.exception), "Required member 'e' missing")
+
     # All validation modes - success
     def test_validation(self):
 
@@ -1197,6 +1251,41 @@ class TestModelEnumValidation(unittest.TestCase):
             ('f', [])
         ])
 
+    # Test enum value set
+    def test_has_value(self):
+
+        base_type = TypeEnum()
+        base_type.add_value('a')
+
+        type_ = TypeEnum(base_types=[base_type])
+        type_.add_value('b')
+
+        self.assertTrue(type_.has_value('a'))
+        self.assertTrue(type_.has_value('b'))
+        self.assertFalse(type_.has_value('c'))
+        self.assertFalse(type_.has_value('a', include_base_types=False))
+        self.assertTrue(type_.has_value('b', include_base_types=False))
+        self.assertFalse(type_.has_value(['a']))
+        self.assertFalse(type_.has_value({'a': 1}))
+
+        # Base type values added later are included
+        type_.finalize()
+        base_type.add_value('c')
+        self.assertTrue(type_.has_value('c'))
+        self.assertEqual(type_.validate('c'), 'c')
+        self.assertFalse(type_.has_value('c', include_base_types=False))
+
+    # Unhashable values are invalid
+    def test_validate_unhashable(self):
+
+        type_ = TypeEnum()
+        type_.add_value('a')
+
+        for obj in (['a'], {'a': 1}):
+            for mode in ALL_VALIDATION_MODES:
+                with self.assertRaises(ValidationError):
+                    type_.validate(obj, mode)
+
     # All validation modes - valid enumeration value
     def test_validate(self):
 
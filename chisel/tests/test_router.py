@@ -0,0 +1,95 @@
+#
+# Copyright (C) 2012-2016 Craig Hobbs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+import unittest
+
+from chisel import Router
+
+
+class TestRouter(unittest.TestCase):
+
+    def test_exact(self):
+        router = Router()
+        router.add('GET', '/a', 'a_get')
+        router.add(None, '/a', 'a_any')
+        router.add(None, '/b', 'b_any')
+
+        self.assertEqual(router.match('GET', '/a'), ('a_get', None))
+        self.assertEqual(router.match('POST', '/a'), ('a_any', None))
+        self.assertEqual(router.match('POST', '/b'), ('b_any', None))
+        self.assertEqual(router.match('GET', '/c'), (None, None))
+        self.assertEqual(router.match('GET', '/a/'), (None, None))
+
+    def test_exact_redefinition(self):
+        router = Router()
+        router.add('GET', '/a', 'a')
+        with self.assertRaises(Exception) as cm_exc:
+            router.add('GET', '/a', 'a2')
+        self.assertEqual(str(cm_exc.exception), 'Redefinition of request URL "/a"')
+
+    def test_args(self):
+        router = Router()
+        router.add('GET', '/thing/{id}', 'thing')
+        router.add('GET', '/thing/{id}/sub/{sub_id}', 'sub')
+        router.add('GET', '/file/{name}.json', 'file')
+
+        self.assertEqual(router.match('GET', '/thing/1'), ('thing', {'id': '1'}))
+        self.assertEqual(router.match('GET', '/thing/a%20b'), ('thing', {'id': 'a b'}))
+        self.assertEqual(router.match('GET', '/thing/1/sub/2'), ('sub', {'id': '1', 'sub_id': '2'}))
+        self.assertEqual(router.match('GET', '/file/abc.json'), ('file', {'name': 'abc'}))
+        self.assertEqual(router.match('GET', '/file/.json'), (None, None))
+        self.assertEqual(router.match('GET', '/file/abc.jsonx'), (None, None))
+        self.assertEqual(router.match('GET', '/file/abc.json\n'), (None, None))
+        self.assertEqual(router.match('GET', '/thing/'), (None, None))
+        self.assertEqual(router.match('GET', '/thing/1/'), (None, None))
+        self.assertEqual(router.match('GET', '/thing/1/sub'), (None, None))
+        self.assertEqual(router.match('POST', '/thing/1'), (None, None))
+
+    def test_precedence(self):
+        router = Router()
+        router.add(None, '/a/{x}', 'a_any_arg')
+        router.add(None, '/a/1', 'a_any_exact')
+        router.add('GET', '/{y}/1', 'get_arg_first')
+        router.add('GET', '/a/{z}', 'get_arg_second')
+        router.add('GET', '/a/{z}', 'get_arg_duplicate')
+
+        # Method-specific URLs with arguments match before method-less exact URLs
+        self.assertEqual(router.match('GET', '/a/1'), ('get_arg_first', {'y': 'a'}))
+        self.assertEqual(router.match('GET', '/a/2'), ('get_arg_second', {'z': '2'}))
+
+        # Method-less exact URLs match before method-less URLs with arguments
+        self.assertEqual(router.match('POST', '/a/1'), ('a_any_exact', None))
+        self.assertEqual(router.match('POST', '/a/2'), ('a_any_arg', {'x': '2'}))
+
+    def test_allowed_methods(self):
+        router = Router()
+        router.add('GET', '/a', 'a_get')
+        router.add('POST', '/a', 'a_post')
+        router.add('PUT', '/{x}', 'x_put')
+        router.add('POST', '/b/{x}', 'b')
+        router.add(None, '/c', 'c')
+
+        self.assertEqual(router.allowed_methods('/a'), {'GET', 'POST', 'PUT'})
+        self.assertEqual(router.allowed_methods('/b'), {'PUT'})
+        self.assertEqual(router.allowed_methods('/b/1'), {'POST'})
+        self.assertEqual(router.allowed_methods('/c'), {None, 'PUT'})
+        self.assertEqual(router.allowed_methods('/d/e'), set())
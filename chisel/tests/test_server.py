@@ -0,0 +1,176 @@
+#
+# Copyright (C) 2012-2016 Craig Hobbs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+from functools import partial
+from http.client import HTTPConnection
+import os
+import signal
+from threading import Event, Thread
+import time
+import unittest
+from urllib.request import urlopen
+from wsgiref.simple_server import make_server, WSGIRequestHandler
+
+from chisel.server import serve_prefork, ThreadPoolWSGIServer
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args): # pylint: disable=arguments-differ
+        pass
+
+
+def _pid_application(dummy_environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [str(os.getpid()).encode('utf-8')]
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), 'requires os.fork')
+class TestServerPrefork(unittest.TestCase):
+
+    def _request_pid(self, port):
+        for _ in range(50):
+            try:
+                with urlopen('http://127.0.0.1:{0}/'.format(port), timeout=5) as response:
+                    return int(response.read())
+            except OSError:
+                time.sleep(0.1)
+        self.fail('request failed')
+
+    def test_prefork(self):
+        server = make_server('127.0.0.1', 0, _pid_application, handler_class=_QuietHandler)
+        port = server.server_address[1]
+        master_pid = os.fork()
+        if master_pid == 0:
+            try:
+                serve_prefork(server, 2)
+            finally:
+                os._exit(0) # pylint: disable=protected-access
+        server.server_close()
+        try:
+            # Requests are served by worker processes
+            worker_pid = self._request_pid(port)
+            self.assertNotEqual(worker_pid, master_pid)
+            self.assertNotEqual(worker_pid, os.getpid())
+
+            # Killed workers are restarted
+            os.kill(worker_pid, signal.SIGKILL)
+            time.sleep(0.2)
+            for _ in range(4):
+                self.assertNotEqual(self._request_pid(port), worker_pid)
+        finally:
+            os.kill(master_pid, signal.SIGTERM)
+            dummy_pid, status = os.waitpid(master_pid, 0)
+        self.assertTrue(os.WIFEXITED(status))
+        self.assertEqual(os.WEXITSTATUS(status), 0)
+
+    def test_prefork_stop(self):
+        def slow_application(dummy_environ, start_response):
+            time.sleep(1)
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return [b'Done']
+
+        server = make_server('127.0.0.1', 0, slow_application, handler_class=_QuietHandler)
+        port = server.server_address[1]
+        master_pid = os.fork()
+        if master_pid == 0:
+            try:
+                serve_prefork(server, 1)
+            finally:
+                os._exit(0) # pylint: disable=protected-access
+        server.server_close()
+        results = []
+        try:
+            # Start a request and stop the server while it's in-flight
+            time.sleep(0.2)
+            thread = Thread(target=TestServerThreadPool._request, args=(port, results)) # pylint: disable=protected-access
+            thread.start()
+            time.sleep(0.4)
+        finally:
+            os.kill(master_pid, signal.SIGTERM)
+            dummy_pid, status = os.waitpid(master_pid, 0)
+        thread.join()
+
+        # The in-flight request completes before the worker exits
+        self.assertEqual(results, [(200, b'Done')])
+        self.assertTrue(os.WIFEXITED(status))
+        self.assertEqual(os.WEXITSTATUS(status), 0)
+
+
+class TestServerThreadPool(unittest.TestCase):
+
+    @staticmethod
+    def _request(port, results):
+        connection = HTTPConnection('127.0.0.1', port, timeout=10)
+        try:
+            connection.request('GET', '/')
+            response = connection.getresponse()
+            results.append((response.status, response.read()))
+        finally:
+            connection.close()
+
+    def test_thread_pool(self):
+        entered = Event()
+        release = Event()
+
+        def application(dummy_environ, start_response):
+            entered.set()
+            release.wait(10)
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return [b'Hello']
+
+        server = make_server('127.0.0.1', 0, application, handler_class=_QuietHandler,
+                             server_class=partial(ThreadPoolWSGIServer, threads=1, queue_size=1))
+        port = server.server_address[1]
+        server_thread = Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05})
+        server_thread.start()
+        try:
+            # Occupy the only thread
+            results = []
+            request_threads = [Thread(target=self._request, args=(port, results))]
+            request_threads[0].start()
+            self.assertTrue(entered.wait(10))
+
+            # Fill the connection queue
+            request_threads.append(Thread(target=self._request, args=(port, results)))
+            request_threads[1].start()
+            for _ in range(100):
+                if server._queue.qsize() == 1: # pylint: disable=protected-access
+                    break
+                time.sleep(0.05)
+            self.assertEqual(server._queue.qsize(), 1) # pylint: disable=protected-access
+
+            # Connections are shed when the queue is full
+            results_shed = []
+            self._request(port, results_shed)
+            self.assertEqual(results_shed, [(503, b'Service Unavailable')])
+            self.assertEqual(server.requests_shed, 1)
+
+            # Queued connections are served once a thread is available
+            release.set()
+            for request_thread in request_threads:
+                request_thread.join()
+            self.assertEqual(results, [(200, b'Hello'), (200, b'Hello')])
+        finally:
+            release.set()
+            server.shutdown()
+            server_thread.join()
+            server.server_close()
@@ -20,13 +20,30 @@
 # SOFTWARE.
 #
 
+from contextlib import contextmanager
+import os
+from tempfile import TemporaryDirectory
 import unittest
 
+import chisel.spec
 from chisel import SpecParser, SpecParserError
+from chisel.spec import tokenize_spec, tokenize_spec_files
 from chisel.model import TypeArray, Typedef, TypeDict, TypeEnum, TypeStruct, \
     TYPE_BOOL, TYPE_DATE, TYPE_DATETIME, TYPE_INT, TYPE_FLOAT, TYPE_OBJECT, TYPE_STRING, TYPE_UUID
 
 
+@contextmanager
+def _parallel_tokenize(cpus):
+    # Tokenize spec files in a process pool regardless of their size (and the number of CPUs)
+    cpu_count, min_size = chisel.spec.cpu_count, chisel.spec.SPEC_PARALLEL_MIN_SIZE
+    chisel.spec.cpu_count = lambda: cpus
+    chisel.spec.SPEC_PARALLEL_MIN_SIZE = 0
+    try:
+        yield
+    finally:
+        chisel.spec.cpu_count, chisel.spec.SPEC_PARALLEL_MIN_SIZE = cpu_count, min_size
+
+
 class TestSpecParseSpec(unittest.TestCase):
 
     # Helper method to assert struct type member properties
@@ -301,6 +318,11 @@ struct MyStruct5 (MyStruct2, MyTypedef)
             ('e', 'datetime', False, False, [])
         ])
 
+        # Finalized member lookup
+        self.assertEqual(parser.types['MyStruct5'].member('d').type.type_name, 'bool')
+        self.assertIsNone(parser.types['MyStruct5'].member('c'))
+        self.assertIsNone(parser.types['MyStruct5'].member('d', include_base_types=False))
+
     # Struct with base types error cases
     def test_struct_base_types_error(self):
 
@@ -623,6 +645,141 @@ enum MyEnum2
                                     ('b', parser.types['MyEnum'], False),
                                     ('c', parser.types['MyEnum2'], False)))
 
+    def test_parse_files(self):
+        with TemporaryDirectory() as spec_dir:
+            spec_path_a = os.path.join(spec_dir, 'a.chsl')
+            spec_path_b = os.path.join(spec_dir, 'b.chsl')
+            with open(spec_path_a, 'w') as spec_file:
+                spec_file.write("""\
+struct MyStruct
+    MyEnum a
+    MyStruct2 b
+""")
+            with open(spec_path_b, 'w') as spec_file:
+                spec_file.write("""\
+# My enum
+enum MyEnum
+    A
+    B
+
+struct MyStruct2 \\
+  (MyStruct)
+    int c
+""")
+
+            for workers in (None, 2):
+                parser = SpecParser()
+                with _parallel_tokenize(2):
+                    parser.parse_files([spec_path_a, spec_path_b], workers=workers)
+                self.assert_enum_by_name(parser, 'MyEnum',
+                                         ('A',
+                                          'B'))
+                self.assertEqual(parser.types['MyEnum'].doc, ['My enum'])
+                self.assert_struct_by_name(parser, 'MyStruct',
+                                           (('a', parser.types['MyEnum'], False),
+                                            ('b', parser.types['MyStruct2'], False)))
+                self.assert_struct_by_name(parser, 'MyStruct2',
+                                           (('a', parser.types['MyEnum'], False),
+                                            ('b', parser.types['MyStruct2'], False),
+                                            ('c', type(TYPE_INT), False)))
+
+    def test_parse_files_error(self):
+        with TemporaryDirectory() as spec_dir:
+            spec_path_a = os.path.join(spec_dir, 'a.chsl')
+            spec_path_b = os.path.join(spec_dir, 'b.chsl')
+            with open(spec_path_a, 'w') as spec_file:
+                spec_file.write("""\
+struct MyStruct
+    MyBadType a
+""")
+            with open(spec_path_b, 'w') as spec_file:
+                spec_file.write("""\
+struct MyStruct
+    int a
+    asdf asdf asdf
+""")
+
+            for workers in (None, 2):
+                parser = SpecParser()
+                with _parallel_tokenize(2), self.assertRaises(SpecParserError) as cm_exc:
+                    parser.parse_files([spec_path_a, spec_path_b], workers=workers)
+                self.assertEqual(cm_exc.exception.errors, [
+                    spec_path_b + ":1: error: Redefinition of type 'MyStruct'",
+                    spec_path_b + ':3: error: Syntax error',
+                    spec_path_a + ":2: error: Unknown member type 'MyBadType'"
+                ])
+
+    def test_tokenize_spec_files(self):
+        with TemporaryDirectory() as spec_dir:
+            spec_paths = []
+            spec_tokens = []
+            for ix_file in range(5):
+                spec_path = os.path.join(spec_dir, 'spec{0}.chsl'.format(ix_file))
+                spec = '''\
+# Struct {0}
+struct Struct{0}
+  int(> {0}) value
+'''.format(ix_file)
+                with open(spec_path, 'w') as spec_file:
+                    spec_file.write(spec)
+                spec_paths.append(spec_path)
+                spec_tokens.append(tokenize_spec(spec.splitlines()))
+
+            tokens = tokenize_spec_files(spec_paths)
+            self.assertEqual(tokens, spec_tokens)
+            for workers in (2, 3, 8):
+                with _parallel_tokenize(8):
+                    self.assertEqual(tokenize_spec_files(spec_paths, workers=workers), spec_tokens)
+
+    def test_tokenize_spec(self):
+        tokens = tokenize_spec('''\
+# Doc
+#- Not doc
+group "My Group"
+group
+action my_action
+  input (MyInput)
+    input a
+  errors
+    errors
+    "Error Value"
+struct MyStruct (MyBase)
+  optional nullable int(> 0)[len < 10] \\
+    values
+enum	MyEnum
+  A
+typedef string{} MyDict
+  	
+structure Foo
+  int
+action(MyAction)
+'''.splitlines())
+        self.assertEqual([(linenum, token_kind) for linenum, token_kind, dummy_token in tokens], [
+            (1, 0),
+            (3, 1),
+            (4, 1),
+            (5, 2),
+            (6, 4),
+            (7, 6),
+            (8, 4),
+            (9, 4),
+            (10, 5),
+            (11, 3),
+            (13, 6),
+            (14, 3),
+            (15, 5),
+            (16, 7),
+            (18, 8),
+            (19, 5),
+            (20, 8)
+        ])
+        self.assertEqual(tokens[0][2], 'Doc')
+        self.assertEqual(tokens[1][2]['group'], 'My Group')
+        self.assertEqual(tokens[8][2]['id'], 'Error Value')
+        self.assertEqual(tokens[9][2]['base_ids'], 'MyBase')
+        self.assertEqual((tokens[10][2]['optional'], tokens[10][2]['attrs'], tokens[10][2]['array'], tokens[10][2]['id']),
+                         ('optional ', '> 0', 'len < 10', 'values'))
+
     def test_typeref_array_attr(self):
 
         parser = SpecParser()
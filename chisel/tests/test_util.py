@@ -25,7 +25,7 @@ from decimal import Decimal
 import unittest
 from uuid import UUID
 
-from chisel.util import JSONEncoder, TZLOCAL, TZUTC
+from chisel.util import JSONCodec, JSONEncoder, TZLOCAL, TZUTC
 
 
 class TestJSONEncoder(unittest.TestCase):
@@ -61,3 +61,50 @@ class TestJSONEncoder(unittest.TestCase):
   "decimal": 7.57,
   "uuid": "127ff2eb-3e1e-42a6-ab8a-f03b6eeb33e7"
 }}'''.format(datetime(2016, 7, 1, 7, 56, tzinfo=TZLOCAL).isoformat()))
+
+
+class TestJSONCodec(unittest.TestCase):
+
+    def test_encode(self):
+        codec = JSONCodec()
+        obj = {'b': [1, 2], 'a': date(2016, 7, 1), 'c': Decimal('7.5')}
+        self.assertEqual(codec.encode(obj), '{"a":"2016-07-01","b":[1,2],"c":7.5}')
+        self.assertEqual(codec.encode(obj, pretty=True), '''\
+{
+  "a": "2016-07-01",
+  "b": [
+    1,
+    2
+  ],
+  "c": 7.5
+}''')
+
+    def test_encoder_cached(self):
+        codec = JSONCodec()
+        self.assertIs(codec.encoder(), codec.encoder())
+        self.assertIs(codec.encoder(pretty=True), codec.encoder(pretty=True))
+        self.assertIsNot(codec.encoder(), codec.encoder(pretty=True))
+        self.assertIsNot(codec.encoder(), codec.encoder(check_circular=False))
+        self.assertFalse(codec.encoder(check_circular=False).check_circular)
+
+    def test_encode_nan(self):
+        codec = JSONCodec()
+        with self.assertRaises(ValueError):
+            codec.encode({'a': float('nan')})
+
+    def test_decode(self):
+        codec = JSONCodec()
+        self.assertEqual(codec.decode(b'{"a": [1, "\xc3\xa9"]}'), {'a': [1, '\u00e9']})
+        self.assertEqual(codec.decode('{"a": 1}'), {'a': 1})
+        self.assertEqual(codec.decode('{"a": "\u00e9"}'.encode('latin-1'), encoding='latin-1'), {'a': '\u00e9'})
+        with self.assertRaises(ValueError):
+            codec.decode(b'{"a": ')
+
+    def test_backend(self):
+        self.assertEqual(JSONCodec().backend, 'json')
+        self.assertEqual(JSONCodec(backend='json').backend, 'json')
+
+        # Unavailable backends fall back to the standard library
+        codec = JSONCodec(backend='chisel_unknown_json_backend')
+        self.assertEqual(codec.backend, 'json')
+        self.assertEqual(codec.decode(b'{"a": 1}'), {'a': 1})
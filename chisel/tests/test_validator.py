@@ -0,0 +1,216 @@
+#
+# Copyright (C) 2012-2016 Craig Hobbs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+from datetime import date, datetime
+from decimal import Decimal
+import unittest
+from uuid import UUID
+
+from chisel.model import StructMemberAttributes, ValidationError, VALIDATE_DEFAULT, VALIDATE_QUERY_STRING, \
+    VALIDATE_JSON_INPUT, Typedef, TypeStruct, TypeArray, TypeDict, TypeEnum, _TypeString, _TypeInt, _TypeFloat, \
+    _TypeBool, _TypeObject
+from chisel.spec import SpecParser
+from chisel.validator import compile_attr, compile_validator
+
+from . import test_model
+
+
+ALL_VALIDATION_MODES = (VALIDATE_DEFAULT, VALIDATE_QUERY_STRING, VALIDATE_JSON_INPUT)
+
+
+def _validate_result(validate_fn, value):
+    try:
+        return ('ok', validate_fn(value))
+    except ValidationError as exc:
+        return ('error', str(exc), exc.member)
+
+
+class TestValidatorDifferential(unittest.TestCase):
+
+    SPEC = '''\
+enum Color
+  red
+  green
+  "blue sky"
+
+enum MoreColor (Color)
+  purple
+
+typedef int(>= 0, < 100) Percent
+typedef string(len > 0) NonEmpty
+typedef Color{len < 3} ColorDict
+
+struct Base
+  optional string name
+  nullable int count
+
+struct Node (Base)
+  float(> 0) weight
+  optional Node[] children
+  optional nullable Node parent
+
+union Choice
+  int a
+  NonEmpty b
+
+struct Everything
+  optional bool b
+  optional int(> -5, <= 5) i
+  optional float f
+  optional Percent p
+  optional uuid u
+  optional date d
+  optional datetime dt
+  optional object o
+  optional MoreColor c
+  optional ColorDict cd
+  optional MoreColor : int(>= 0) ecd
+  optional nullable string ns
+  optional nullable Percent np
+  optional Choice ch
+  optional Node n
+  optional string(len == 2)[len <= 2] sa
+  optional Everything[] rec
+'''
+
+    VALUES = (
+        None, '', 'null', 'abc', 0, 1, -7, 7, 99, 100, 1.5, -0.5, float('nan'), True, False, Decimal('4'), Decimal('4.5'),
+        '7', '7.5', 'true', 'false', 'nan', [], (), {}, [1, 2], {'a': 1},
+        UUID('127FF2EB-3E1E-42A6-AB8A-F03B6EEB33E7'), '127FF2EB-3E1E-42A6-AB8A-F03B6EEB33E7',
+        date(2016, 7, 1), '2016-07-01', datetime(2016, 7, 1, 7, 56), '2016-07-01T07:56:00Z',
+        {'b': True}, {'b': 'true'}, {'b': 1}, {'i': 5}, {'i': 6}, {'i': '-4'}, {'i': 1.0}, {'i': 1.5}, {'f': '1e3'},
+        {'p': 50}, {'p': 100}, {'p': '-1'}, {'u': '127FF2EB-3E1E-42A6-AB8A-F03B6EEB33E7'}, {'u': 'x'},
+        {'d': '2016-07-01'}, {'dt': '2016-07-01T07:56:00+01:00'}, {'dt': datetime(2016, 7, 1, 7, 56)},
+        {'o': None}, {'o': {'x': [1]}}, {'c': 'purple'}, {'c': 'blue sky'}, {'c': 'orange'}, {'c': ['red']},
+        {'cd': {'red': 'green'}}, {'cd': {'red': 'red', 'green': 'red', 'blue sky': 'red'}}, {'cd': {'orange': 'red'}},
+        {'cd': ''}, {'ecd': {'purple': 1}}, {'ecd': {'purple': -1}}, {'ecd': {'x': 1}},
+        {'ns': None}, {'ns': 'null'}, {'np': 'null'}, {'np': None}, {'np': 200},
+        {'ch': {'a': 1}}, {'ch': {'b': ''}}, {'ch': {'a': 1, 'b': 'x'}}, {'ch': {}}, {'ch': {'c': 1}},
+        {'n': {'weight': 1, 'count': None}}, {'n': {'weight': '2.5', 'count': 'null', 'name': 'x'}},
+        {'n': {'weight': 0, 'count': 1}}, {'n': {'weight': 1}},
+        {'n': {'weight': 1, 'count': 1, 'children': [{'weight': 2, 'count': 2, 'children': [{'weight': -1, 'count': 3}]}]}},
+        {'n': {'weight': 1, 'count': 1, 'parent': None, 'children': ''}},
+        {'sa': ['ab', 'cd']}, {'sa': ['ab', 'cd', 'ef']}, {'sa': ['abc']}, {'sa': ''},
+        {'rec': [{'i': 1}, {'rec': [{'c': 'red'}, {'unknown': 1}]}]}, {'unknown': 1, 'b': True},
+    )
+
+    def setUp(self):
+        self.parser = SpecParser(spec=self.SPEC)
+
+    def test_types(self):
+        for type_name, type_ in sorted(self.parser.types.items()):
+            for mode in ALL_VALIDATION_MODES:
+                validate_fn = compile_validator(type_, mode)
+                for value in self.VALUES:
+                    try:
+                        expected = _validate_result(lambda value_, type_=type_, mode=mode: type_.validate(value_, mode), value)
+                    except Exception as exc: # pylint: disable=broad-except
+                        with self.assertRaises(type(exc)):
+                            validate_fn(value)
+                        continue
+                    actual = _validate_result(validate_fn, value)
+                    self.assertEqual(actual, expected, msg='{0!r} {1!r} {2!r}'.format(type_name, mode, value))
+                    if actual[0] == 'ok' and mode == VALIDATE_DEFAULT:
+                        self.assertIs(actual[1], value)
+
+    def test_member_path(self):
+        validate_fn = compile_validator(self.parser.types['Everything'], VALIDATE_DEFAULT)
+        with self.assertRaises(ValidationError) as cm_exc:
+            validate_fn({'rec': [{'n': {'weight': 1, 'count': 1, 'children': [{'weight': 0, 'count': 1}]}}]})
+        self.assertEqual(str(cm_exc.exception), "Invalid value 0 (type 'int') for member 'rec[0].n.children[0].weight' [> 0]")
+        self.assertEqual(cm_exc.exception.member, 'rec[0].n.children[0].weight')
+
+    def test_compile_attr(self):
+        self.assertIsNone(compile_attr(None))
+        self.assertIsNone(compile_attr(StructMemberAttributes()))
+
+        attr = StructMemberAttributes(op_gt=1, op_lte=5)
+        validate_attr = compile_attr(attr)
+        for value in (0, 1, 2, 5, 6):
+            try:
+                attr.validate(value, ('a',))
+            except ValidationError as exc:
+                with self.assertRaises(ValidationError) as cm_exc:
+                    validate_attr(value, ('a',))
+                self.assertEqual(str(cm_exc.exception), str(exc))
+            else:
+                validate_attr(value, ('a',))
+
+
+# Run the model validation tests against the compiled validators
+_COMPILED_TYPES = (Typedef, TypeStruct, TypeArray, TypeDict, TypeEnum, _TypeString, _TypeInt, _TypeFloat, _TypeBool, _TypeObject)
+
+
+def _validate_compiled(self, value, mode=VALIDATE_DEFAULT, _member=()):
+    return compile_validator(self, mode)(value, _member)
+
+
+class _CompiledModelTestMixin(object):
+
+    def setUp(self): # pylint: disable=invalid-name
+        self.validate_interpreted = {type_class: type_class.validate for type_class in _COMPILED_TYPES}
+        for type_class in _COMPILED_TYPES:
+            type_class.validate = _validate_compiled
+
+    def tearDown(self): # pylint: disable=invalid-name
+        for type_class, validate in self.validate_interpreted.items():
+            type_class.validate = validate
+
+
+class TestValidatorModelTypedef(_CompiledModelTestMixin, test_model.TestModelTypedefValidation):
+    pass
+
+
+class TestValidatorModelStruct(_CompiledModelTestMixin, test_model.TestModelStructValidation):
+    pass
+
+
+class TestValidatorModelArray(_CompiledModelTestMixin, test_model.TestModelArrayValidation):
+    pass
+
+
+class TestValidatorModelDict(_CompiledModelTestMixin, test_model.TestModelDictValidation):
+    pass
+
+
+class TestValidatorModelEnum(_CompiledModelTestMixin, test_model.TestModelEnumValidation):
+    pass
+
+
+class TestValidatorModelString(_CompiledModelTestMixin, test_model.TestModelStringValidation):
+    pass
+
+
+class TestValidatorModelInt(_CompiledModelTestMixin, test_model.TestModelIntValidation):
+    pass
+
+
+class TestValidatorModelFloat(_CompiledModelTestMixin, test_model.TestModelFloatValidation):
+    pass
+
+
+class TestValidatorModelBool(_CompiledModelTestMixin, test_model.TestModelBoolValidation):
+    pass
+
+
+class TestValidatorModelObject(_CompiledModelTestMixin, test_model.TestModelObjectValidation):
+    pass
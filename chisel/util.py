@@ -22,8 +22,9 @@
 
 from datetime import date, datetime, timedelta, tzinfo
 from decimal import Decimal
+from importlib import import_module
 from itertools import islice
-from json import JSONEncoder as json_JSONEncoder
+from json import JSONEncoder as json_JSONEncoder, loads as json_loads
 import os
 import re
 import sys
@@ -49,6 +50,61 @@ class JSONEncoder(json_JSONEncoder):
         return json_JSONEncoder.default(self, obj)
 
 
+class JSONCodec(object):
+    """
+    JSON codec with cached encoders and an optional alternate decoder backend.
+
+    Encoding always uses JSONEncoder so that response content is identical regardless of backend. The backend (e.g.
+    "orjson", "ujson", or "simplejson") is used for decoding if it is installed - otherwise the standard library's json
+    module is used.
+    """
+
+    __slots__ = ('backend', '_loads', '_loads_bytes', '_encoders')
+
+    def __init__(self, backend=None):
+        self.backend = 'json'
+        self._loads = json_loads
+        self._encoders = {}
+        if backend is not None and backend != 'json':
+            try:
+                self._loads = import_module(backend).loads
+                self.backend = backend
+            except ImportError:
+                pass
+
+        # The json module only decodes UTF-8 bytes in Python 3.6 and later
+        self._loads_bytes = self.backend != 'json' or sys.version_info >= (3, 6)
+
+    def encoder(self, pretty=False, check_circular=True):
+        """
+        Get the (cached) JSONEncoder for the output settings
+        """
+        encoder_key = (bool(pretty), bool(check_circular))
+        encoder = self._encoders.get(encoder_key)
+        if encoder is None:
+            encoder = self._encoders[encoder_key] = JSONEncoder(check_circular=check_circular,
+                                                                allow_nan=False,
+                                                                sort_keys=True,
+                                                                indent=2 if pretty else None,
+                                                                separators=(',', ': ') if pretty else (',', ':'))
+        return encoder
+
+    def encode(self, obj, pretty=False, check_circular=True):
+        """
+        Encode an object as a JSON string
+        """
+        return self.encoder(pretty, check_circular).encode(obj)
+
+    def decode(self, content, encoding='utf-8'):
+        """
+        Decode JSON content bytes (or a string)
+        """
+        if isinstance(content, (bytes, bytearray)) and \
+                (not self._loads_bytes or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8')):
+            content = content.decode(encoding)
+        return self._loads(content)
+
+
 class _TZUTC(tzinfo):
     """
     GMT tzinfo class (from Python docs)
@@ -166,9 +222,12 @@ def parse_iso8601_datetime(string):
             timedelta(hours=offhour, minutes=offmin))
 
 
-def load_modules(module_path, module_ext='.py', exclude_submodules=None):
+def load_modules(module_path, module_ext='.py', exclude_submodules=None, module_stats=None):
     """
     Recursively load Python modules
+
+    If module_stats is provided, it is updated with the [modification time (ns), size] of each directory searched and each
+    module file loaded (e.g. to validate a module manifest).
     """
 
     # Does the path exist?
@@ -203,6 +262,8 @@ def load_modules(module_path, module_ext='.py', exclude_submodules=None):
         # Skip Python 3.x cache directories
         if os.path.basename(dirpath) == '__pycache__':
             continue
+        if module_stats is not None:
+            module_stats[dirpath] = path_stat(dirpath)
 
         # Is the sub-package excluded?
         subpackage_parts = dirpath.split(os.sep)
@@ -230,4 +291,14 @@ def load_modules(module_path, module_ext='.py', exclude_submodules=None):
                 continue
 
             # Load the sub-module
+            if module_stats is not None:
+                module_stats[os.path.join(dirpath, filename)] = path_stat(os.path.join(dirpath, filename))
             yield __import__(submodule_name, globals(), locals(), ['.'])
+
+
+def path_stat(path):
+    """
+    Get the [modification time (ns), size] of a file or directory
+    """
+    path_stat_ = os.stat(path)
+    return [path_stat_.st_mtime_ns, path_stat_.st_size]
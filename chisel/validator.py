@@ -0,0 +1,380 @@
+#
+# Copyright (C) 2012-2016 Craig Hobbs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+from decimal import Decimal
+from math import isnan, isinf
+from operator import ge, gt, le, lt, ne
+
+from .model import IMMUTABLE_VALIDATION_MODES, VALIDATE_QUERY_STRING, ValidationError, StructMemberAttributes, \
+    Typedef, TypeStruct, TypeArray, TypeDict, TypeEnum, _TypeString, _TypeInt, _TypeFloat, _TypeBool, _TypeObject
+
+
+def compile_validator(type_, mode):
+    """
+    Compile a type model into a validation function specialized for the validation mode
+
+    The returned function has the signature "validate(value, _member=())" and behaves exactly like
+    "type_.validate(value, mode, _member)". The type model must be finalized (e.g. all base types resolved) since member
+    lists are captured at compile time.
+    """
+    return _ValidatorCompiler(mode).compile(type_)
+
+
+class _ValidatorCompiler(object):
+    __slots__ = ('mode', 'immutable', 'query_string', '_validators')
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.immutable = mode in IMMUTABLE_VALIDATION_MODES
+        self.query_string = mode == VALIDATE_QUERY_STRING
+        self._validators = {}
+
+    def compile(self, type_):
+        validator = self._validators.get(id(type_))
+        if validator is None:
+
+            # Register a forwarding validator while compiling to support recursive types
+            validator_cell = []
+            def validate_forward(value, _member=()):
+                return validator_cell[0](value, _member)
+            self._validators[id(type_)] = validate_forward
+
+            compile_fn = _COMPILE_FUNCTIONS.get(type(type_), _ValidatorCompiler._compile_generic)
+            validator = compile_fn(self, type_)
+            validator_cell.append(validator)
+            self._validators[id(type_)] = validator
+
+        return validator
+
+    def _compile_generic(self, type_):
+        validate = type_.validate
+        mode = self.mode
+
+        def validate_generic(value, _member=()):
+            return validate(value, mode, _member)
+
+        return validate_generic
+
+    def _compile_typedef(self, type_):
+        validate_type = self.compile(type_.type)
+        validate_attr = compile_attr(type_.attr)
+        if validate_attr is None:
+            return validate_type
+
+        def validate_typedef(value, _member=()):
+            result = validate_type(value, _member)
+            validate_attr(result, _member)
+            return result
+
+        return validate_typedef
+
+    def _compile_struct(self, type_):
+        query_string = self.query_string
+        immutable = self.immutable
+        union = type_.union
+        members = tuple(
+            (
+                member.name,
+                member.optional,
+                member.nullable,
+                member.nullable and query_string and not isinstance(member.type, _TypeString),
+                self.compile(member.type),
+                compile_attr(member.attr)
+            )
+            for member in type_.members()
+        )
+        member_names = frozenset(member[0] for member in members)
+        member_syntax = ValidationError.member_syntax
+        member_error = ValidationError.member_error
+
+        def validate_struct(value, _member=()):
+
+            # Validate and translate the value
+            if isinstance(value, dict):
+                value_x = value
+            elif query_string and value == '':
+                value_x = {}
+            else:
+                raise member_error(type_, value, _member)
+
+            # Valid union?
+            if union and len(value_x) != 1:
+                raise member_error(type_, value, _member)
+
+            # Validate all member values
+            value_copy = None if immutable else {}
+            member_count = 0
+            for member_name, optional, nullable, nullable_string, validate_member, validate_member_attr in members:
+                if member_name not in value_x:
+                    if not optional:
+                        raise ValidationError("Required member '" + member_syntax((_member, member_name)) + "' missing")
+                    continue
+                member_count += 1
+                member_value = value_x[member_name]
+                if nullable and (member_value is None or (nullable_string and member_value == 'null')):
+                    member_value_x = None
+                else:
+                    member_path = (_member, member_name)
+                    member_value_x = validate_member(member_value, member_path)
+                    if validate_member_attr is not None:
+                        validate_member_attr(member_value_x, member_path)
+                if value_copy is not None:
+                    value_copy[member_name] = member_value_x
+
+            # Any unknown members?
+            if member_count != len(value_x):
+                unknown_value_name = next(value_name for value_name in value_x.keys() if value_name not in member_names)
+                raise ValidationError("Unknown member '" + member_syntax((_member, unknown_value_name)) + "'")
+
+            return value if value_copy is None else value_copy
+
+        return validate_struct
+
+    def _compile_array(self, type_):
+        query_string = self.query_string
+        immutable = self.immutable
+        validate_value = self.compile(type_.type)
+        validate_value_attr = compile_attr(type_.attr)
+        member_error = ValidationError.member_error
+
+        def validate_array(value, _member=()):
+
+            # Validate and translate the value
+            if isinstance(value, (list, tuple)):
+                value_x = value
+            elif query_string and value == '':
+                value_x = []
+            else:
+                raise member_error(type_, value, _member)
+
+            # Validate the list contents
+            value_copy = None if immutable else []
+            for ix_array_value, array_value in enumerate(value_x):
+                member_path = (_member, ix_array_value)
+                array_value_x = validate_value(array_value, member_path)
+                if validate_value_attr is not None:
+                    validate_value_attr(array_value_x, member_path)
+                if value_copy is not None:
+                    value_copy.append(array_value_x)
+
+            return value if value_copy is None else value_copy
+
+        return validate_array
+
+    def _compile_dict(self, type_):
+        query_string = self.query_string
+        immutable = self.immutable
+        validate_key = self.compile(type_.key_type)
+        validate_key_attr = compile_attr(type_.key_attr)
+        validate_value = self.compile(type_.type)
+        validate_value_attr = compile_attr(type_.attr)
+        member_error = ValidationError.member_error
+
+        def validate_dict(value, _member=()):
+
+            # Validate and translate the value
+            if isinstance(value, dict):
+                value_x = value
+            elif query_string and value == '':
+                value_x = {}
+            else:
+                raise member_error(type_, value, _member)
+
+            # Validate the dict key/value pairs
+            value_copy = None if immutable else {}
+            for dict_key, dict_value in value_x.items():
+                member_path = (_member, dict_key)
+
+                # Validate the key
+                dict_key_x = validate_key(dict_key, member_path)
+                if validate_key_attr is not None:
+                    validate_key_attr(dict_key_x, member_path)
+
+                # Validate the value
+                dict_value_x = validate_value(dict_value, member_path)
+                if validate_value_attr is not None:
+                    validate_value_attr(dict_value_x, member_path)
+
+                # Result a copy?
+                if value_copy is not None:
+                    value_copy[dict_key_x] = dict_value_x
+
+            return value if value_copy is None else value_copy
+
+        return validate_dict
+
+    def _compile_enum(self, type_): # pylint: disable=no-self-use
+        values = frozenset(value.value for value in type_.values())
+        member_error = ValidationError.member_error
+
+        def validate_enum(value, _member=()):
+            try:
+                is_valid = value in values
+            except TypeError:
+                is_valid = False
+            if not is_valid:
+                raise member_error(type_, value, _member)
+            return value
+
+        return validate_enum
+
+    def _compile_string(self, type_): # pylint: disable=no-self-use
+        member_error = ValidationError.member_error
+
+        def validate_string(value, _member=()):
+            if not isinstance(value, str):
+                raise member_error(type_, value, _member)
+            return value
+
+        return validate_string
+
+    def _compile_int(self, type_):
+        query_string = self.query_string
+        immutable = self.immutable
+        member_error = ValidationError.member_error
+
+        def validate_int(value, _member=()):
+
+            # Validate and translate the value
+            if isinstance(value, int) and not isinstance(value, bool):
+                return value
+            elif isinstance(value, (float, Decimal)):
+                value_x = int(value)
+                if value_x != value:
+                    raise member_error(type_, value, _member)
+            elif query_string and isinstance(value, str):
+                try:
+                    value_x = int(value)
+                except:
+                    raise member_error(type_, value, _member)
+            else:
+                raise member_error(type_, value, _member)
+
+            return value if immutable else value_x
+
+        return validate_int
+
+    def _compile_float(self, type_):
+        query_string = self.query_string
+        immutable = self.immutable
+        member_error = ValidationError.member_error
+
+        def validate_float(value, _member=()):
+
+            # Validate and translate the value
+            if isinstance(value, float):
+                return value
+            elif isinstance(value, (int, Decimal)) and not isinstance(value, bool):
+                value_x = float(value)
+            elif query_string and isinstance(value, str):
+                try:
+                    value_x = float(value)
+                    if isnan(value_x) or isinf(value_x):
+                        raise ValueError()
+                except:
+                    raise member_error(type_, value, _member)
+            else:
+                raise member_error(type_, value, _member)
+
+            return value if immutable else value_x
+
+        return validate_float
+
+    def _compile_bool(self, type_):
+        query_string = self.query_string
+        bool_values = type_.VALUES
+        member_error = ValidationError.member_error
+
+        def validate_bool(value, _member=()):
+            if isinstance(value, bool):
+                return value
+            elif query_string and isinstance(value, str):
+                try:
+                    return bool_values[value]
+                except:
+                    raise member_error(type_, value, _member)
+            else:
+                raise member_error(type_, value, _member)
+
+        return validate_bool
+
+    def _compile_object(self, type_): # pylint: disable=no-self-use
+        member_error = ValidationError.member_error
+
+        def validate_object(value, _member=()):
+            if value is not None:
+                return value
+            else:
+                raise member_error(type_, value, _member)
+
+        return validate_object
+
+
+# Validator compile functions by model type
+_COMPILE_FUNCTIONS = {
+    Typedef: _ValidatorCompiler._compile_typedef, # pylint: disable=protected-access
+    TypeStruct: _ValidatorCompiler._compile_struct, # pylint: disable=protected-access
+    TypeArray: _ValidatorCompiler._compile_array, # pylint: disable=protected-access
+    TypeDict: _ValidatorCompiler._compile_dict, # pylint: disable=protected-access
+    TypeEnum: _ValidatorCompiler._compile_enum, # pylint: disable=protected-access
+    _TypeString: _ValidatorCompiler._compile_string, # pylint: disable=protected-access
+    _TypeInt: _ValidatorCompiler._compile_int, # pylint: disable=protected-access
+    _TypeFloat: _ValidatorCompiler._compile_float, # pylint: disable=protected-access
+    _TypeBool: _ValidatorCompiler._compile_bool, # pylint: disable=protected-access
+    _TypeObject: _ValidatorCompiler._compile_object # pylint: disable=protected-access
+}
+
+
+# Type attribute checks, in StructMemberAttributes.validate order - (attribute, is length, is invalid fn, syntax)
+_ATTR_CHECKS = (
+    ('op_lt', False, ge, '< '),
+    ('op_lte', False, gt, '<= '),
+    ('op_gt', False, le, '> '),
+    ('op_gte', False, lt, '>= '),
+    ('op_eq', False, ne, '== '),
+    ('op_len_lt', True, ge, 'len < '),
+    ('op_len_lte', True, gt, 'len <= '),
+    ('op_len_gt', True, le, 'len > '),
+    ('op_len_gte', True, lt, 'len >= '),
+    ('op_len_eq', True, ne, 'len == ')
+)
+
+
+def compile_attr(attr):
+    """
+    Compile a type attributes object into a validation function - returns None if there are no attributes
+    """
+    if attr is None:
+        return None
+
+    format_float = StructMemberAttributes._format_float # pylint: disable=protected-access
+    checks = tuple((is_len, invalid_fn, getattr(attr, attr_name), syntax + format_float(getattr(attr, attr_name)))
+                   for attr_name, is_len, invalid_fn, syntax in _ATTR_CHECKS if getattr(attr, attr_name) is not None)
+    if not checks:
+        return None
+
+    def validate_attr(value, _member=()):
+        for is_len, invalid_fn, op_value, constraint_syntax in checks:
+            if invalid_fn(len(value) if is_len else value, op_value):
+                raise ValidationError.member_error(None, value, _member, constraint_syntax=constraint_syntax)
+
+    return validate_attr
@@ -42,7 +42,7 @@ setup(
         'Programming Language :: Python :: 3.4',
         'Programming Language :: Python :: 3.5',
     ],
-    packages=['chisel'],
+    packages=['chisel', 'chisel.bench'],
     test_suite='chisel.tests',
     tests_require=TESTS_REQUIRE,
     extras_require={